@@ -372,14 +372,15 @@ nsmap = {{
         s += '}\n'
         s += '\n'
 
-        # Mapping of s.g. heads to members
+        # Mapping of s.g. heads to members, transitively: tag(k) in members[x]
+        # is a set lookup
         s += '# Mapping of substitution group heads to members\n'
         s += 'members = {\n'
         for k, v in self.sg_members.items():
-            s += f"{ind}'{k}': [\n"
-            for m in v:
+            s += f"{ind}'{k}': frozenset([\n"
+            for m in sorted(v):
                 s += f"{ind*2}'{m}',\n"
-            s += f"{ind}],\n"
+            s += f"{ind}]),\n"
         s += '}\n'
 
         s += super().epilogue()
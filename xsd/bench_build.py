@@ -0,0 +1,55 @@
+# bench_build.py - micro-benchmark of the Xsd*.build() factories
+
+"""\
+Time the construction of the schema model from already-parsed XML trees, so
+that only the build() factories (and their child element dispatch) are
+measured, not lxml parsing.
+
+"""
+
+import os
+import sys
+import time
+import lxml.etree as et
+from lxml import objectify
+
+from parse_xsd import XMLSchema, build_schema
+
+schemas = [
+    'samples/docbook/xsd/docbook.xsd',
+    'samples/collada/xsd/collada_schema_1_4_1.xsd',
+]
+
+#-------------------------------------------------------------------------------
+
+def bench(filepath, repeat):
+    # Parse every document of the schema once
+    p = et.XMLParser(remove_comments=True)
+    roots = []
+    for location in build_schema(filepath).locations():
+        root = objectify.parse(location, parser=p).getroot()
+        dirpath, schema_location = os.path.split(location)
+        roots.append((root, dirpath, schema_location))
+
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for root, dirpath, schema_location in roots:
+            XMLSchema.build(root, dirpath, schema_location)
+        t = time.perf_counter() - t0
+        best = t if best is None or t < best else best
+    return best
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) > 2:
+        print(f'Usage: {sys.argv[0]} [<repeat>]')
+        exit(-1)
+    repeat = int(sys.argv[1]) if len(sys.argv) == 2 else 10
+
+    for filepath in schemas:
+        t = bench(filepath, repeat)
+        print(f'{os.path.basename(filepath):30} {t*1000:8.1f} ms'
+              f' (best of {repeat})')
@@ -0,0 +1,87 @@
+# bench_content_model.py - stress benchmark of the content model compiler
+
+"""\
+Compile a synthetic complex type with big occurrence bounds (maxOccurs="N")
+and check a content of N children against it, with the repetitions unrolled
+(a DFA) and with counters (a CountingModel). Unrolling is only attempted for
+the smallest bounds, past that the subset construction explodes.
+
+"""
+
+import sys
+import time
+import tracemalloc
+import lxml.etree as et
+
+from parse_xsd import XMLSchema
+from content_model import Compiler
+
+tns = 'http://example.com/bench'
+
+#-------------------------------------------------------------------------------
+
+def schema(n):
+    s = f'''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+        targetNamespace="{tns}" elementFormDefault="qualified">
+      <xs:complexType name="T">
+        <xs:sequence>
+          <xs:element name="head" type="xs:string"/>
+          <xs:element name="a" type="xs:string" maxOccurs="{n}"/>
+          <xs:sequence minOccurs="2" maxOccurs="{n}">
+            <xs:element name="b" type="xs:string"/>
+            <xs:element name="c" type="xs:string" minOccurs="0"/>
+          </xs:sequence>
+          <xs:choice maxOccurs="{n}">
+            <xs:element name="d" type="xs:string"/>
+            <xs:element name="e" type="xs:string" maxOccurs="16"/>
+          </xs:choice>
+        </xs:sequence>
+      </xs:complexType>
+    </xs:schema>'''
+    xsd = XMLSchema.build(et.fromstring(s), None, 'bench.xsd')
+    xsd.assemble()
+    return xsd
+
+def content(n):
+    names = ['head'] + ['a']*n + ['b', 'c']*(n//2) + ['b']*(n//2) + \
+        ['d', 'e', 'e']*(n//3)
+    return [f'{{{tns}}}{x}' for x in names]
+
+def bench(n, unroll_limit):
+    xsd = schema(n)
+    t = xsd.types[f'{{{tns}}}T']
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    model = Compiler(xsd, unroll_limit).type_model(t)
+    t_compile = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    names = content(n)
+    t0 = time.perf_counter()
+    state = model.initial
+    for q in names:
+        state = model.step(state, q)
+    ok = state is not None and model.is_final(state)
+    t_check = time.perf_counter() - t0
+
+    print(f'{n:>8} {model.__class__.__name__:>14} {len(model):>8}'
+          f' {t_compile*1000:>10.1f} {size/1024:>10.0f}'
+          f' {len(names):>9} {t_check*1000:>9.1f} {"ok" if ok else "FAIL"}')
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) > 2:
+        print(f'Usage: {sys.argv[0]} [<max unrolled bound>]')
+        exit(-1)
+    max_unrolled = int(sys.argv[1]) if len(sys.argv) == 2 else 10
+
+    print(f'{"maxOccurs":>8} {"model":>14} {"states":>8} {"compile ms":>10}'
+          f' {"KiB":>10} {"children":>9} {"check ms":>9}')
+    for n in [10, 100, 1000, 10000]:
+        if n <= max_unrolled:
+            bench(n, 10**9)
+        bench(n, 32)
@@ -0,0 +1,86 @@
+# bench_incremental.py - incremental revalidation against full revalidation
+
+"""\
+Edit one task of a BPMN model, like an editor would (rename it, add it a
+documentation, and undo), revalidating the document after every change:
+once with a full validation of the tree, once with the IncrementalValidator
+that only revalidates the task and its parent's content.
+
+"""
+
+import sys
+import time
+import lxml.etree as et
+
+from parse_xsd import load_schema
+from validator import Validator
+from incremental import IncrementalValidator
+
+bpmn_ns = 'http://www.omg.org/spec/BPMN/20100524/MODEL'
+xsd_filepath = 'samples/bpmn/xsd/BPMN20.xsd'
+
+#-------------------------------------------------------------------------------
+
+def edits(task):
+    """Generate the successive edits of 'task', yield the modified
+    element after each one.
+
+    """
+    name = task.get('name', '')
+    task.set('name', name + ' (edited)')
+    yield task
+    doc = et.Element(f'{{{bpmn_ns}}}documentation')
+    doc.text = 'Edited'
+    task.insert(0, doc)
+    yield task
+    task.remove(doc)
+    yield task
+    task.set('name', name)
+    yield task
+
+def bench(xml_filepath, repeat):
+    v = Validator(load_schema(xsd_filepath))
+    tree = et.parse(xml_filepath)
+    task = next(tree.getroot().iter(f'{{{bpmn_ns}}}task'))
+    iv = IncrementalValidator(v, tree)
+
+    t0 = time.perf_counter()
+    errors = iv.validate()
+    t_first = time.perf_counter() - t0
+
+    # Full revalidation after every edit
+    t0 = time.perf_counter()
+    n = 0
+    for _ in range(repeat):
+        for _ in edits(task):
+            errors = IncrementalValidator(v, tree).validate()
+            n += 1
+    t_full = (time.perf_counter() - t0) / n
+    full_errors = len(errors)
+
+    # Incremental revalidation
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for elem in edits(task):
+            errors = iv.revalidate([elem])
+    t_inc = (time.perf_counter() - t0) / n
+
+    print(f'{xml_filepath}: {len(iv.entries)} elements,'
+          f' first validation {t_first*1000:.1f} ms')
+    print(f'{"revalidation":>14} {"ms":>8} {"errors":>7}')
+    print(f'{"full":>14} {t_full*1000:>8.2f} {full_errors:>7}')
+    print(f'{"incremental":>14} {t_inc*1000:>8.2f} {len(errors):>7}')
+    print(f'speed-up: {t_full/t_inc:.1f}x')
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) > 3:
+        print(f'Usage: {sys.argv[0]} [<bpmn filepath> [<repeat>]]')
+        exit(-1)
+    xml_filepath = sys.argv[1] if len(sys.argv) > 1 \
+        else 'samples/bpmn/xml/EmailVoting2.bpmn'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    bench(xml_filepath, repeat)
@@ -0,0 +1,51 @@
+# bench_memory.py - memory used by the schema model of each sample schema
+
+"""\
+Load each bundled sample schema (with its includes and imports) and report, as
+measured by tracemalloc:
+  - peak: the peak of python allocations during the load
+  - model: the memory still held by the model once loaded
+
+Only allocations made through python's allocator are traced, the memory held
+by lxml's own C structures is not counted.
+
+"""
+
+import os
+import sys
+import glob
+import tracemalloc
+
+from parse_xsd import build_schema
+
+#-------------------------------------------------------------------------------
+
+def measure(filepath):
+    tracemalloc.start()
+    try:
+        xsd = build_schema(filepath)
+        model, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return model, peak
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) > 2:
+        print(f'Usage: {sys.argv[0]} [<samples dirpath>]')
+        exit(-1)
+    dirpath = sys.argv[1] if len(sys.argv) == 2 else 'samples'
+
+    paths = sorted(glob.glob(os.path.join(dirpath, '**', '*.xsd'),
+                             recursive=True))
+    print(f'{"schema":56} {"peak KiB":>10} {"model KiB":>10}')
+    for path in paths:
+        name = os.path.relpath(path, dirpath)
+        try:
+            model, peak = measure(path)
+        except Exception as e:
+            print(f'{name:56} {"failed":>10}   {e.__class__.__name__}: {e}')
+            continue
+        print(f'{name:56} {peak/1024:10.0f} {model/1024:10.0f}')
@@ -0,0 +1,81 @@
+# bench_tree.py - TreeSet construction and queries, as the forests grow
+
+"""\
+Build forests of 1k, 10k and 100k edges with TreeSet.add_edge() and with
+TreeSet.from_edges(), and query them with child_of() and ancestry(). The
+edges of each forest come in a random order: most subtrees start as trees of
+their own and are moved under their parent later, as when a schema declares a
+derived type before its base.
+
+With the Nodes indexed by payload, the time per edge stays the same as the
+forest grows.
+
+"""
+
+import sys
+import time
+import random
+
+from tree import TreeSet
+
+#-------------------------------------------------------------------------------
+
+def forest(n, trees, rng):
+    """Return the edges of a random forest of 'n' edges and 'trees' trees, in
+    a random order.
+
+    """
+    edges = []
+    for i in range(trees, n + trees):
+        edges.append((f'T{rng.randrange(i)}', f'T{i}'))
+    rng.shuffle(edges)
+    return edges
+
+def bench(n, rng):
+    edges = forest(n, max(n//100, 1), rng)
+    ts = TreeSet()
+    t0 = time.perf_counter()
+    for parent, child in edges:
+        ts.add_edge(parent, child)
+    t_add = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    bulk = TreeSet.from_edges(edges)
+    t_bulk = time.perf_counter() - t0
+    assert bulk.traverse() == ts.traverse()
+
+    sample = rng.sample(edges, min(n, 10000))
+    t0 = time.perf_counter()
+    for parent, child in sample:
+        assert ts.child_of(child, parent)
+    t_child = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    depth = 0
+    for _, child in sample:
+        depth += len(ts.ancestry(child))
+    t_anc = time.perf_counter() - t0
+
+    k = len(sample)
+    print(f'{n:>8} {len(ts.trees):>6} {t_add*1000:>10.1f}'
+          f' {t_add/n*1e6:>8.2f} {t_bulk/n*1e6:>8.2f}'
+          f' {t_child/k*1e6:>10.2f}'
+          f' {t_anc/k*1e6:>10.2f} {depth/k:>6.1f}')
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) > 2:
+        print(f'Usage: {sys.argv[0]} [<max edges>]')
+        exit(-1)
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    rng = random.Random(0)
+    print(f'{"edges":>8} {"trees":>6} {"build ms":>10} {"us/edge":>8}'
+          f' {"bulk us":>8} {"child_of us":>10} {"ancestry us":>10}'
+          f' {"depth":>6}')
+    n = 1000
+    while n <= top:
+        bench(n, rng)
+        n *= 10
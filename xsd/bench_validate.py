@@ -0,0 +1,345 @@
+# bench_validate.py - validation benchmark over the sample corpora
+
+"""\
+Validate the documents of the bundled corpora (samples/bpmn, samples/collada,
+samples/docbook) against their schemas, as they are and scaled up 10, 100 and
+1000 times, with both engines: lxml (libxml2's validation of the parsed
+tree) and native (the streaming validator, see validator.py).
+
+A document is scaled by repeating the children of its root element that its
+content model allows to repeat (process, collaboration, library_*, sect1,
+...), the copies have their id's renamed (as well as the references to them)
+so that a valid document stays valid. The scaled copies are written to a
+temporary directory, removed at the end.
+
+Each measurement runs in a new process, for its peak memory to be that of the
+document alone, and reports as JSON:
+  - schema_s: the time to compile (or load) the schema
+  - parse_s: the time to read the document with the engine's parser: into a
+    tree for lxml, through iterparse for the native validator
+  - validate_s: the time to validate, without the parse
+  - total_s: parse and validation, as the engine runs them
+  - mb_per_s, elements_per_s: the throughput, over total_s
+  - schema_rss_kib, peak_rss_kib: the peak resident memory of the process,
+    once the schema is loaded and at the end
+
+The times are the best of --repeat runs. The native validator compiles the
+types of the elements as it meets them: with a single run, the times of the
+small documents are mostly this compilation.
+
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import platform
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.etree as et
+
+import validate
+from parse_xsd import load_schema
+from validator import Validator
+
+corpora = {
+    'bpmn': ('samples/bpmn/xsd/BPMN20.xsd', 'samples/bpmn/xml'),
+    'collada': ('samples/collada/xsd/collada_schema_1_4_1.xsd',
+                'samples/collada/xml'),
+    'docbook': ('samples/docbook/xsd/docbook.xsd', 'samples/docbook/xml'),
+}
+
+engines = ('lxml', 'native')
+
+# The attributes whose values are renamed in the copies
+id_attributes = ('id', '{http://www.w3.org/XML/1998/namespace}id')
+
+#-------------------------------------------------------------------------------
+# Scaled copies
+
+def repeatable(validator, root, n):
+    """Return the indexes of the children of 'root' that can each be
+    repeated 'n' times, all together, with the content model of the root
+    element still matching.
+
+    """
+    etype = validator.root(root, [])
+    if etype is None or etype.model is None:
+        return []
+    model = etype.model
+    tags = [k.tag for k in root if isinstance(k.tag, str)]
+
+    def matches(indexes):
+        state = model.initial
+        for i, tag in enumerate(tags):
+            for _ in range(n if i in indexes else 1):
+                state = model.step(state, tag)
+                if state is None:
+                    return False
+        return model.is_final(state)
+
+    if not matches(set()):
+        return []
+    indexes = set()
+    for i in range(len(tags)):
+        if matches(indexes | {i}):
+            indexes.add(i)
+    return indexes
+
+def rename(value, ids, suffix):
+    """Return 'value' with its tokens that are id's (possibly prefixed with
+    '#' or 'prefix:') suffixed, None if there are none.
+
+    """
+    tokens = value.split()
+    changed = False
+    for i, tok in enumerate(tokens):
+        pos = tok.find(':') + 1 if ':' in tok else (1 if tok[:1] == '#' else 0)
+        if tok[pos:] in ids:
+            tokens[i] = tok + suffix
+            changed = True
+    if not changed:
+        return None
+    if len(tokens) == 1:
+        # Keep the surrounding whitespace
+        return value.replace(value.strip(), tokens[0])
+    return ' '.join(tokens)
+
+def renamed(elem, ids, suffix):
+    """Return a copy of the subtree of 'elem', with its id's and their
+    references renamed.
+
+    """
+    copy = et.fromstring(et.tostring(elem, with_tail=False))
+    copy.tail = elem.tail
+    for e in copy.iter(tag=et.Element):
+        for name, value in e.attrib.items():
+            if name in id_attributes:
+                e.set(name, value + suffix)
+            else:
+                s = rename(value, ids, suffix)
+                if s is not None:
+                    e.set(name, s)
+        if e.text is not None and len(e) == 0:
+            s = rename(e.text, ids, suffix)
+            if s is not None:
+                e.text = s
+    return copy
+
+def scale(xml_filepath, validator, n, out_filepath):
+    """Write to 'out_filepath' the document of 'xml_filepath' scaled 'n'
+    times. Raise RuntimeError if its root element has nothing to repeat.
+
+    """
+    root = et.parse(xml_filepath).getroot()
+    indexes = repeatable(validator, root, n)
+    if len(indexes) == 0:
+        m = f'{xml_filepath}: no child of the root element can be repeated'
+        raise RuntimeError(m)
+
+    elems = [k for k in root if isinstance(k.tag, str)]
+    ids = set()
+    for i in indexes:
+        for e in elems[i].iter(tag=et.Element):
+            for name in id_attributes:
+                if name in e.attrib:
+                    ids.add(e.get(name))
+
+    # The children are serialized inside an empty copy of the root element,
+    # whose namespace declarations they don't repeat
+    shell = et.Element(root.tag, dict(root.attrib), nsmap=root.nsmap)
+    shell.text = root.text
+    s = et.tostring(shell, encoding='utf-8', xml_declaration=False)
+    start, end = s.index(b'>') + 1, s.rindex(b'<')
+    shell.text = None
+
+    def inner(elem):
+        shell.append(elem)
+        s = et.tostring(shell, encoding='utf-8', xml_declaration=False)
+        shell.remove(elem)
+        return s[start:s.rindex(b'<')]
+
+    with open(out_filepath, 'wb') as f:
+        f.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write(s[:end])
+        for k in list(root):
+            i = elems.index(k) if isinstance(k.tag, str) else None
+            f.write(inner(k))
+            if i in indexes:
+                for j in range(1, n):
+                    f.write(inner(renamed(k, ids, f'.{j}')))
+        f.write(s[end:])
+
+#-------------------------------------------------------------------------------
+# Measurements, in a new process each
+
+def peak_rss():
+    """Return the peak resident memory of the process, in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_lxml(xsd_filepath, xml_filepath, repeat):
+    t0 = time.perf_counter()
+    xsd = validate.compile_schema(xsd_filepath)
+    d = {'schema_s': time.perf_counter() - t0, 'schema_rss_kib': peak_rss()}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        doc = et.parse(xml_filepath, et.XMLParser(huge_tree=True))
+        t1 = time.perf_counter()
+        valid = xsd.validate(doc)
+        t2 = time.perf_counter()
+        d['elements'] = sum(1 for _ in doc.iter(tag=et.Element))
+        d['error_count'] = 0 if valid else len(xsd.error_log)
+        del doc
+        best(d, 'parse_s', t1 - t0)
+        best(d, 'validate_s', t2 - t1)
+        best(d, 'total_s', t2 - t0)
+    return d
+
+def run_native(xsd_filepath, xml_filepath, repeat):
+    t0 = time.perf_counter()
+    v = Validator(load_schema(xsd_filepath))
+    d = {'schema_s': time.perf_counter() - t0, 'schema_rss_kib': peak_rss()}
+    for _ in range(repeat):
+        # The bare parse, with the validator's options
+        t0 = time.perf_counter()
+        count = 0
+        for _, elem in et.iterparse(xml_filepath, remove_comments=True,
+                                    remove_pis=True, huge_tree=True):
+            elem.clear(keep_tail=True)
+            count += 1
+        t1 = time.perf_counter()
+        errs = v.collect(xml_filepath)
+        t2 = time.perf_counter()
+        d['elements'] = count
+        d['error_count'] = errs.count
+        best(d, 'parse_s', t1 - t0)
+        best(d, 'total_s', t2 - t1)
+    d['validate_s'] = max(d['total_s'] - d['parse_s'], 0.0)
+    return d
+
+def best(d, key, t):
+    d[key] = min(d.get(key, t), t)
+
+def measure(engine, xsd_filepath, xml_filepath, repeat):
+    """Validate a document 'repeat' times, return the measures as a dict."""
+    run = run_lxml if engine == 'lxml' else run_native
+    try:
+        d = run(xsd_filepath, xml_filepath, repeat)
+    except (OSError, RuntimeError, et.LxmlError) as e:
+        return {'failure': f'{e.__class__.__name__}: {e}'}
+    d['peak_rss_kib'] = peak_rss()
+    size = os.path.getsize(xml_filepath)
+    t = d['total_s']
+    d['mb_per_s'] = round(size/1e6/t, 3) if t > 0 else None
+    d['elements_per_s'] = round(d['elements']/t) if t > 0 else None
+    for key in ('schema_s', 'parse_s', 'validate_s', 'total_s'):
+        d[key] = round(d[key], 6)
+    return d
+
+def measure_apart(engine, xsd_filepath, xml_filepath, repeat):
+    """Run measure() in a new process."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(measure, engine, xsd_filepath, xml_filepath,
+                           repeat).result()
+
+#-------------------------------------------------------------------------------
+
+def bench(names, scales, engine_names, repeat=1, log=sys.stderr):
+    """Run the benchmark on corpora 'names', return the report as a dict."""
+    results = []
+    tmp_dirpath = tempfile.mkdtemp(prefix='bench_validate_')
+    try:
+        for name in names:
+            xsd_filepath, dirpath = corpora[name]
+            validator = Validator(load_schema(xsd_filepath))
+            for xml_filepath in sorted(glob.glob(f'{dirpath}/*')):
+                for n in scales:
+                    d = {'corpus': name, 'file': xml_filepath, 'scale': n}
+                    filepath = xml_filepath
+                    try:
+                        if n > 1:
+                            base = os.path.basename(xml_filepath)
+                            filepath = os.path.join(tmp_dirpath,
+                                                    f'{n}x_{base}')
+                            scale(xml_filepath, validator, n, filepath)
+                        d['bytes'] = os.path.getsize(filepath)
+                    except (RuntimeError, et.LxmlError) as e:
+                        d['failure'] = f'{e.__class__.__name__}: {e}'
+                        results.append(d)
+                        print(f'{xml_filepath} x{n}: {d["failure"]}',
+                              file=log)
+                        continue
+                    for engine in engine_names:
+                        r = dict(d, engine=engine)
+                        r.update(measure_apart(engine, xsd_filepath,
+                                               filepath, repeat))
+                        results.append(r)
+                        print(f'{xml_filepath} x{n} {engine}: '
+                              + (r['failure'] if 'failure' in r else
+                                 f'{r["total_s"]:.3f}s,'
+                                 f' {r["mb_per_s"]} MB/s,'
+                                 f' {r["peak_rss_kib"]} KiB'), file=log)
+                    if filepath != xml_filepath:
+                        os.remove(filepath)
+    finally:
+        shutil.rmtree(tmp_dirpath)
+
+    return {
+        'python': platform.python_version(),
+        'lxml': et.__version__,
+        'libxml2': '.'.join(str(x) for x in et.LIBXML_VERSION),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line arguments: options only
+    args = sys.argv[1:]
+    names = list(corpora)
+    scales = [1, 10, 100, 1000]
+    engine_names = list(engines)
+    repeat = 1
+    out_filepath = None
+    while len(args) > 0:
+        opt = args.pop(0)
+        if opt == '--corpus' and len(args) > 0:
+            names = args.pop(0).split(',')
+        elif opt == '--scales' and len(args) > 0:
+            scales = [int(x) for x in args.pop(0).split(',')]
+        elif opt == '--engines' and len(args) > 0:
+            engine_names = args.pop(0).split(',')
+        elif opt == '--repeat' and len(args) > 0:
+            repeat = int(args.pop(0))
+        elif opt == '-o' and len(args) > 0:
+            out_filepath = args.pop(0)
+        else:
+            print(f'Usage: {sys.argv[0]} [--corpus <names>]'
+                  ' [--scales <n,...>] [--engines lxml,native]'
+                  ' [--repeat <n>] [-o <json filepath>]')
+            exit(-1)
+    for name in names:
+        if name not in corpora:
+            print(f'Unknown corpus "{name}", expected one of:'
+                  f' {", ".join(corpora)}')
+            exit(-1)
+    for engine in engine_names:
+        if engine not in engines:
+            print(f'Unknown engine "{engine}", expected one of:'
+                  f' {", ".join(engines)}')
+            exit(-1)
+
+    report = bench(names, scales, engine_names, repeat)
+    if out_filepath is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(out_filepath, 'w') as f:
+            json.dump(report, f, indent=2)
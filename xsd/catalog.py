@@ -0,0 +1,172 @@
+# catalog.py - offline resolution of schema locations, OASIS catalog style
+
+"""\
+Schemas often import well-known schemas by URL, for example:
+
+    <xs:import namespace="http://www.w3.org/XML/1998/namespace"
+               schemaLocation="http://www.w3.org/2001/xml.xsd"/>
+
+Downloading them on every run is slow, and impossible in a sandboxed build.
+A catalog maps schema URLs (system identifiers) and namespace URIs to local
+files, it's consulted before any network access.
+
+The default catalog is seeded with the copies bundled in xml_namespace/, an
+OASIS XML catalog file there (catalog.xml) maps their URLs to them. More
+entries can be loaded from the catalog files listed in the XML_CATALOG_FILES
+environment variable (the same one used by libxml2), they take precedence
+over the bundled ones. Setting SCHEMAX_OFFLINE=1 forbids all network access.
+
+"""
+
+import os
+import sys
+import requests
+import lxml.etree as et
+
+catalog_ns = 'urn:oasis:names:tc:entity:xmlns:xml:catalog'
+
+bundled_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'xml_namespace')
+
+#-------------------------------------------------------------------------------
+
+def is_url(location):
+    return location.startswith(('http://', 'https://'))
+
+def cat_tag(name):
+    return et.QName(catalog_ns, name).text
+
+#-------------------------------------------------------------------------------
+
+class Catalog:
+    """Maps schema URLs and namespace URIs to local files.
+
+    Both resolve() and fetch() are memoized, a location is resolved (or
+    downloaded) at most once per catalog.
+
+    """
+    def __init__(self, offline=False):
+        self.offline = offline
+
+        self.systems = {}        # URL => local file path
+        self.uris = {}           # namespace URI => local file path
+        self.rewrites = []       # (URL prefix, local path prefix)
+
+        self.resolved = {}       # (location, namespace) => path or None
+        self.downloads = {}      # URL => bytes
+
+    def add_system(self, url, path):
+        self.systems[url] = path
+        self.resolved = {}
+
+    def add_uri(self, uri, path):
+        self.uris[uri] = path
+        self.resolved = {}
+
+    def add_rewrite(self, prefix, path_prefix):
+        self.rewrites.append((prefix, path_prefix))
+        self.resolved = {}
+
+    def add_catalog(self, filepath):
+        """Load the entries of an OASIS XML catalog file.
+
+        Supported entries: system, uri, rewriteSystem, rewriteURI and
+        nextCatalog. Relative references are resolved against the catalog
+        file's directory.
+
+        """
+        root = et.parse(filepath).getroot()
+        dirpath = os.path.dirname(os.path.abspath(filepath))
+
+        def local(ref):
+            if ref.startswith('file://'):
+                ref = ref[len('file://'):]
+            return os.path.join(dirpath, ref)
+
+        for nd in root.iter():
+            if nd.tag == cat_tag('system'):
+                self.add_system(nd.attrib['systemId'], local(nd.attrib['uri']))
+            elif nd.tag == cat_tag('uri'):
+                self.add_uri(nd.attrib['name'], local(nd.attrib['uri']))
+            elif nd.tag == cat_tag('rewriteSystem'):
+                self.add_rewrite(nd.attrib['systemIdStartString'],
+                                 local(nd.attrib['rewritePrefix']))
+            elif nd.tag == cat_tag('rewriteURI'):
+                self.add_rewrite(nd.attrib['uriStartString'],
+                                 local(nd.attrib['rewritePrefix']))
+            elif nd.tag == cat_tag('nextCatalog'):
+                self.add_catalog(local(nd.attrib['catalog']))
+
+    def resolve(self, location, namespace=None):
+        """Return the local file for a schema location (or, failing that, for
+        a namespace URI), None if the catalog doesn't know about it.
+
+        """
+        key = (location, namespace)
+        if key in self.resolved:
+            return self.resolved[key]
+
+        path = None
+        if location is not None:
+            if location in self.systems:
+                path = self.systems[location]
+            else:
+                # Longest matching prefix wins
+                best = ''
+                for prefix, path_prefix in self.rewrites:
+                    if location.startswith(prefix) and len(prefix) > len(best):
+                        best = prefix
+                        path = path_prefix + location[len(prefix):]
+        if path is None and namespace is not None and namespace in self.uris:
+            path = self.uris[namespace]
+
+        self.resolved[key] = path
+        return path
+
+    def fetch(self, url):
+        """Download a schema that the catalog couldn't resolve."""
+        if url in self.downloads:
+            return self.downloads[url]
+
+        if self.offline:
+            m = f'Offline mode, not downloading "{url}" (add it to an XML' \
+                ' catalog, see XML_CATALOG_FILES)'
+            raise RuntimeError(m)
+
+        print(f'Downloading {url}', file=sys.stderr)
+        r = requests.get(url)
+        if r.status_code >= 400:
+            m = f'Couldn\'t download "{url}", status={r.status_code}'
+            raise RuntimeError(m)
+        self.downloads[url] = r.content
+        return r.content
+
+#-------------------------------------------------------------------------------
+
+_default = None
+
+def default_catalog():
+    """Return the process-wide catalog, created on first use."""
+    global _default
+    if _default is None:
+        offline = os.environ.get('SCHEMAX_OFFLINE', '') not in ['', '0']
+        cat = Catalog(offline=offline)
+        # The user's entries replace the bundled ones
+        cat.add_catalog(os.path.join(bundled_dir, 'catalog.xml'))
+        if 'XML_CATALOG_FILES' in os.environ:
+            for path in os.environ['XML_CATALOG_FILES'].split():
+                cat.add_catalog(path)
+        _default = cat
+    return _default
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) not in [2, 3]:
+        print(f'Usage: {sys.argv[0]} <schema location> [<namespace>]')
+        exit(-1)
+    location = sys.argv[1]
+    namespace = sys.argv[2] if len(sys.argv) == 3 else None
+
+    print(default_catalog().resolve(location, namespace))
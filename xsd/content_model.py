@@ -0,0 +1,827 @@
+# content_model.py - compile content models into deterministic automata
+
+"""\
+The content model of a complex type (its particle tree of xs:sequence,
+xs:choice, xs:all, xs:group, xs:element and xs:any, with their minOccurs and
+maxOccurs) is compiled into an automaton over the expanded names of the child
+elements, so that checking the children of an element takes one transition
+(one dict lookup) per child.
+
+Sequences, choices and repetitions are compiled with the Glushkov (position)
+construction, followed by the subset construction, into a DFA. Small bounded
+repetitions are unrolled, big ones (maxOccurs="10000") would make the
+automaton explode: the model then keeps one copy of the repeated particle
+with a counter, see CountingModel. Element references are expanded with the members
+of their substitution group, wildcards match on the child's namespace.
+
+xs:all can't be compiled that way without blowing up (any order of n elements
+needs 2^n states), it's tracked with a bitmask of the elements already seen.
+
+All the models have the same interface, a state is an opaque value:
+
+    state = model.initial
+    for qname in children:
+        state = model.step(state, qname)     # None if not allowed
+    model.is_final(state)
+
+"""
+
+import sys
+import lxml.etree as et
+
+from parse_xsd import XsdElement, XsdComplexType, XsdSimpleType, \
+    XsdSimpleContent, XsdComplexContent, XsdExtensionCC, XsdRestrictionCC, \
+    XsdGroup, XsdAll, XsdChoice, XsdSequence, XsdAny, xsd_ns, load_schema
+from substitution import SubstitutionIndex
+
+any_type = f'{{{xsd_ns}}}anyType'
+
+# Namespace class for the namespaces not mentioned by any wildcard
+other_ns = '##other'
+
+#-------------------------------------------------------------------------------
+
+def occurs(p):
+    """Return the (minOccurs, maxOccurs) of particle 'p', maxOccurs is None
+    when unbounded.
+
+    """
+    lo = int(p.minOccurs) if p.minOccurs is not None else 1
+    if p.maxOccurs is None:
+        hi = 1
+    elif p.maxOccurs == 'unbounded':
+        hi = None
+    else:
+        hi = int(p.maxOccurs)
+    return lo, hi
+
+def namespace(qname):
+    """Return the namespace of a name in Clark notation, None if it has
+    none.
+
+    """
+    if qname[0] != '{':
+        return None
+    return qname[1:qname.index('}')]
+
+#-------------------------------------------------------------------------------
+
+class Wildcard:
+    """The namespace constraint of an xs:any."""
+    __slots__ = ('any', 'negated', 'namespaces')
+
+    def __init__(self, namespace, target):
+        self.any = False
+        self.negated = False
+        self.namespaces = set()
+
+        tokens = namespace.split() if namespace is not None else ['##any']
+        for t in tokens:
+            if t == '##any':
+                self.any = True
+            elif t == '##other':
+                # Neither the target namespace, nor absent
+                self.negated = True
+                self.namespaces = {target, None}
+            elif t == '##targetNamespace':
+                self.namespaces.add(target)
+            elif t == '##local':
+                self.namespaces.add(None)
+            else:
+                self.namespaces.add(t)
+
+    def matches(self, ns):
+        """Does the constraint allow namespace 'ns' (None if absent)? ns may
+        also be other_ns, standing for the namespaces the constraint doesn't
+        mention.
+
+        """
+        if self.any:
+            return True
+        return (ns in self.namespaces) != self.negated
+
+    def __str__(self):
+        if self.any:
+            return '{##any}*'
+        ns = ' '.join(sorted(x if x is not None else '##local'
+                             for x in self.namespaces))
+        return f'{{{"not " if self.negated else ""}{ns}}}*'
+
+#-------------------------------------------------------------------------------
+
+class Term:
+    """What a child element matched: an element declaration (decl is an
+    XsdElement), or a wildcard (decl is an XsdAny). 'sch' is the schema
+    document where decl appears, its QName-valued attributes are resolved
+    there.
+
+    """
+    __slots__ = ('qname', 'decl', 'sch', 'wildcard')
+
+    def __init__(self, qname, decl, sch, wildcard=None):
+        self.qname = qname
+        self.decl = decl
+        self.sch = sch
+        self.wildcard = wildcard
+
+    def __str__(self):
+        return self.qname if self.wildcard is None else str(self.wildcard)
+
+#-------------------------------------------------------------------------------
+
+class Dfa:
+    """A deterministic automaton. States are numbered from 0 (the initial
+    state).
+
+    For each state, trans maps an element name to (next state, Term), and
+    wild maps a namespace to (next state, Term) for the names matched by a
+    wildcard only. The namespaces that no wildcard mentions share the
+    other_ns entry.
+
+    """
+    initial = 0
+
+    def __init__(self, trans, wild, final, namespaces):
+        self.trans = trans
+        self.wild = wild
+        self.final = final
+        self.namespaces = namespaces
+
+    def transition(self, state, qname):
+        """Return (next state, Term) for a child named 'qname', None if it
+        isn't allowed there.
+
+        """
+        t = self.trans[state].get(qname)
+        if t is None and self.wild[state] is not None:
+            ns = namespace(qname)
+            t = self.wild[state].get(ns if ns in self.namespaces else other_ns)
+        return t
+
+    def step(self, state, qname):
+        t = self.transition(state, qname)
+        return t[0] if t is not None else None
+
+    def is_final(self, state):
+        return self.final[state]
+
+    def expected(self, state):
+        """Return the names (and wildcards) allowed in 'state'."""
+        arr = sorted(self.trans[state])
+        if self.wild[state] is not None:
+            arr += sorted({str(t.wildcard)
+                           for _, t in self.wild[state].values()})
+        return arr
+
+    def __len__(self):
+        return len(self.trans)
+
+#-------------------------------------------------------------------------------
+
+class AllModel:
+    """An xs:all group, the state is the bitmask of the elements seen so far.
+
+    index maps each element name (substitution group members included) to
+    (bit, Term).
+
+    """
+    initial = 0
+
+    def __init__(self, index, required, emptiable):
+        self.index = index
+        self.required = required
+        self.emptiable = emptiable
+
+    def transition(self, state, qname):
+        t = self.index.get(qname)
+        if t is None or state & t[0]:
+            return None
+        return state | t[0], t[1]
+
+    def step(self, state, qname):
+        t = self.transition(state, qname)
+        return t[0] if t is not None else None
+
+    def is_final(self, state):
+        if state == 0 and self.emptiable:
+            return True
+        return state & self.required == self.required
+
+    def expected(self, state):
+        return sorted(q for q, (bit, _) in self.index.items()
+                      if not state & bit)
+
+    def __len__(self):
+        return 1
+
+#-------------------------------------------------------------------------------
+
+class CountingModel:
+    """A position automaton with counters, for the repetitions too big to be
+    unrolled. It's simulated rather than made deterministic: the state is
+    the set of the configurations (position, counter values) the children
+    seen so far can lead to, usually there's only one.
+
+    A follow edge (q, k, inc) from position p to q:
+      - exits the counters around p beyond the k-th, their min must be
+        reached
+      - if inc, loops on the k-th counter (around both p and q), its max
+        must not be reached yet
+      - enters the counters around q beyond the k-th, they start at 1
+
+    The compile time and the size of the model don't depend on the bounds.
+
+    """
+    def __init__(self, terms, paths, counters, by_name, wild, last,
+                 nullable):
+        self.terms = terms
+        self.paths = paths
+        self.mins = [lo for lo, _ in counters]
+        self.maxs = [hi for _, hi in counters]
+        self.by_name = by_name
+        self.wild = wild
+        self.last = last
+        self.nullable = nullable
+
+        # The start position is the one after the last real one
+        self.initial = frozenset([(len(terms), ())])
+
+    def follow(self, pos, values, edge):
+        """Return the counter values after following 'edge' from (pos,
+        values), None if the counters don't allow it.
+
+        """
+        q, k, inc = edge
+        path = self.paths[pos]
+        for i in range(k, len(path)):
+            if values[i] < self.mins[path[i]]:
+                return None
+        values = list(values[:k])
+        if inc:
+            c = path[k - 1]
+            hi = self.maxs[c]
+            if hi is None:
+                # Past min, the count doesn't matter anymore
+                values[k - 1] = min(values[k - 1] + 1, self.mins[c])
+            elif values[k - 1] < hi:
+                values[k - 1] += 1
+            else:
+                return None
+        return tuple(values) + (1,)*(len(self.paths[q]) - k)
+
+    def transition(self, state, qname):
+        ns = None
+        nxt = set()
+        term = None
+        for pos, values in state:
+            edges = self.by_name[pos].get(qname, [])
+            if len(self.wild[pos]) > 0:
+                if ns is None:
+                    ns = namespace(qname)
+                edges = edges + [e for e in self.wild[pos]
+                                 if self.terms[e[0]].wildcard.matches(ns)]
+            for e in edges:
+                v = self.follow(pos, values, e)
+                if v is not None:
+                    nxt.add((e[0], v))
+                    if term is None:
+                        term = self.terms[e[0]]
+        if len(nxt) == 0:
+            return None
+        if len(nxt) > 1:
+            nxt = self.prune(nxt)
+        return frozenset(nxt), term
+
+    def prune(self, configs):
+        """Drop the configurations that can't accept anything another one
+        can't: at the same position, with counter values that are either
+        equal or all past their min, and all greater or equal.
+
+        Without this, an ambiguous repetition like (a | b{1,16}){1,10000}
+        makes the number of configurations grow with the counts.
+
+        """
+        groups = {}
+        for pos, values in configs:
+            path = self.paths[pos]
+            key = (pos, tuple(v if v < self.mins[c] else -1
+                              for c, v in zip(path, values)))
+            groups.setdefault(key, []).append(values)
+
+        arr = []
+        for (pos, _), group in groups.items():
+            for v in group:
+                if not any(w != v and all(x <= y for x, y in zip(w, v))
+                           for w in group):
+                    arr.append((pos, v))
+        return arr
+
+    def step(self, state, qname):
+        t = self.transition(state, qname)
+        return t[0] if t is not None else None
+
+    def is_final(self, state):
+        for pos, values in state:
+            if pos == len(self.terms):
+                if self.nullable:
+                    return True
+            elif pos in self.last and \
+                 all(v >= self.mins[c] for c, v in zip(self.paths[pos],
+                                                        values)):
+                return True
+        return False
+
+    def expected(self, state):
+        arr = set()
+        for pos, values in state:
+            for q, edges in self.by_name[pos].items():
+                if any(self.follow(pos, values, e) is not None
+                       for e in edges):
+                    arr.add(q)
+            for e in self.wild[pos]:
+                if self.follow(pos, values, e) is not None:
+                    arr.add(str(self.terms[e[0]].wildcard))
+        return sorted(arr)
+
+    def __len__(self):
+        return len(self.terms) + 1
+
+#-------------------------------------------------------------------------------
+
+class Frag:
+    """A fragment of the position automaton: is it nullable, and its first
+    and last positions.
+
+    """
+    __slots__ = ('nullable', 'first', 'last')
+
+    def __init__(self, nullable, first, last):
+        self.nullable = nullable
+        self.first = first
+        self.last = last
+
+class Glushkov:
+    """Builds the position automaton of a particle tree, then its DFA (or
+    its counting automaton).
+
+    Repetitions whose bounds would multiply the size of the automaton by
+    more than unroll_limit aren't unrolled, they get a counter instead. The
+    follow edges are then annotated with what they do to the counters, see
+    CountingModel.
+
+    """
+    def __init__(self, compiler, unroll_limit):
+        self.compiler = compiler
+        self.unroll_limit = unroll_limit
+
+        # Position => Term
+        self.terms = []
+
+        # Position => set of (following position, k, inc), where k is the
+        # number of counters around the operator that created the edge, and
+        # inc tells if it's the loop of the k-th counter
+        self.follow = []
+
+        # Position => tuple of the counters around it, outermost first
+        self.paths = []
+
+        # Counter => (min, max), max is None when unbounded
+        self.counters = []
+
+        # Counters around the fragment being built, and by how much the
+        # enclosing unrolled repetitions multiply its size
+        self.stack = []
+        self.scale = 1
+
+    # Regular expression operators, on fragments
+
+    def symbol(self, term):
+        pos = len(self.terms)
+        self.terms.append(term)
+        self.follow.append(set())
+        self.paths.append(tuple(self.stack))
+        return Frag(False, {pos}, {pos})
+
+    def empty(self):
+        return Frag(True, set(), set())
+
+    def link(self, src, dst, inc=False):
+        edges = {(y, len(self.stack), inc) for y in dst}
+        for x in src:
+            self.follow[x] |= edges
+
+    def seq(self, a, b):
+        self.link(a.last, b.first)
+        first = a.first | b.first if a.nullable else a.first
+        last = a.last | b.last if b.nullable else b.last
+        return Frag(a.nullable and b.nullable, first, last)
+
+    def alt(self, a, b):
+        return Frag(a.nullable or b.nullable, a.first | b.first,
+                    a.last | b.last)
+
+    def plus(self, a):
+        self.link(a.last, a.first)
+        return a
+
+    def opt(self, a):
+        return Frag(True, a.first, a.last)
+
+    # Particles
+
+    def repeat(self, make, lo, hi):
+        """Return the fragment for lo to hi (None: unbounded) occurrences,
+        make() returns a fresh copy of the repeated fragment.
+
+        """
+        n = max(lo, hi if hi is not None else 1)
+        if n > 1 and self.scale*n > self.unroll_limit:
+            return self.count(make, lo, hi)
+
+        self.scale *= n
+        try:
+            return self.unroll(make, lo, hi)
+        finally:
+            self.scale //= n
+
+    def count(self, make, lo, hi):
+        """One copy of the repeated fragment, with a counter."""
+        c = len(self.counters)
+        self.counters.append(None)
+        self.stack.append(c)
+        try:
+            body = make()
+            # The loop increments the counter
+            self.link(body.last, body.first, True)
+        finally:
+            self.stack.pop()
+
+        # Empty iterations can make up for the missing ones
+        if body.nullable:
+            lo = 0
+        self.counters[c] = (lo, hi)
+        return Frag(lo == 0, body.first, body.last)
+
+    def unroll(self, make, lo, hi):
+        frag = self.empty()
+        for i in range(lo):
+            if hi is None and i == lo - 1:
+                return self.seq(frag, self.plus(make()))
+            frag = self.seq(frag, make())
+        if hi is None:
+            return self.seq(frag, self.opt(self.plus(make())))
+
+        # (x (x (x)?)?)? for the optional occurrences
+        tail = self.empty()
+        for _ in range(hi - lo):
+            tail = self.opt(self.seq(make(), tail))
+        return self.seq(frag, tail)
+
+    def particle(self, p, sch):
+        lo, hi = occurs(p)
+        if hi == 0:
+            return self.empty()
+        if type(p) == XsdElement:
+            return self.repeat(lambda: self.element(p, sch), lo, hi)
+        if type(p) == XsdAny:
+            return self.repeat(lambda: self.wildcard(p, sch), lo, hi)
+        if type(p) == XsdGroup:
+            group, gsch = self.compiler.group(p, sch)
+            return self.repeat(lambda: self.particle(group, gsch), lo, hi)
+        if type(p) == XsdSequence:
+            return self.repeat(lambda: self.sequence(p, sch), lo, hi)
+        if type(p) == XsdChoice:
+            return self.repeat(lambda: self.choice(p, sch), lo, hi)
+        if type(p) == XsdAll:
+            m = 'xs:all is only allowed as the whole content model of a type'
+            raise RuntimeError(m)
+        m = f'Unexpected particle {p.__class__.__name__}'
+        raise RuntimeError(m)
+
+    def element(self, p, sch):
+        frag = None
+        for term in self.compiler.element_terms(p, sch):
+            x = self.symbol(term)
+            frag = x if frag is None else self.alt(frag, x)
+        return frag if frag is not None else self.empty()
+
+    def wildcard(self, p, sch):
+        w = Wildcard(p.namespace, sch.namespace)
+        return self.symbol(Term(None, p, sch, w))
+
+    def sequence(self, p, sch):
+        frag = self.empty()
+        for k in p.elems:
+            if self.compiler.is_particle(k):
+                frag = self.seq(frag, self.particle(k, sch))
+        return frag
+
+    def choice(self, p, sch):
+        frag = None
+        for k in p.elems:
+            if self.compiler.is_particle(k):
+                x = self.particle(k, sch)
+                frag = x if frag is None else self.alt(frag, x)
+        # An empty choice matches nothing
+        return frag if frag is not None else Frag(False, set(), set())
+
+    # Subset construction
+
+    def namespaces(self):
+        """Return the namespaces that the wildcards tell apart."""
+        namespaces = set()
+        wildcards = [t.wildcard for t in self.terms if t.wildcard is not None]
+        for w in wildcards:
+            namespaces |= w.namespaces
+        if len(wildcards) > 0:
+            namespaces |= {namespace(t.qname) for t in self.terms
+                           if t.wildcard is None}
+        return namespaces
+
+    def model(self, frag):
+        if len(self.counters) > 0:
+            return self.counting(frag)
+        return self.dfa(frag)
+
+    def counting(self, frag):
+        # Index the follow edges by element name
+        start = len(self.terms)
+        by_name = []
+        wild = []
+        for pos in range(start + 1):
+            if pos == start:
+                edges = {(y, 0, False) for y in frag.first}
+            else:
+                edges = self.follow[pos]
+            d = {}
+            w = []
+            for e in sorted(edges):
+                term = self.terms[e[0]]
+                if term.wildcard is None:
+                    d.setdefault(term.qname, []).append(e)
+                else:
+                    w.append(e)
+            by_name.append(d)
+            wild.append(w)
+
+        return CountingModel(self.terms, self.paths + [()], self.counters,
+                             by_name, wild, frag.last, frag.nullable)
+
+    def dfa(self, frag):
+        # The initial state of the position automaton is -1
+        start = -1
+        terms = self.terms
+        namespaces = self.namespaces()
+
+        # States are numbered in the order they're discovered, and processed
+        # in the same order
+        init = frozenset([start])
+        states = {init: 0}
+        todo = [init]
+
+        def target(positions):
+            T = frozenset(positions)
+            if T not in states:
+                states[T] = len(todo)
+                todo.append(T)
+            # The first position wins when the model isn't deterministic
+            # (i.e. violates the Unique Particle Attribution rule)
+            return states[T], terms[min(positions)]
+
+        trans, wild, final = [], [], []
+        i = 0
+        while i < len(todo):
+            S = todo[i]
+            i += 1
+            final.append((start in S and frag.nullable) or
+                         len(S & frag.last) > 0)
+
+            nxt = set()
+            for pos in S:
+                if pos == start:
+                    nxt |= frag.first
+                else:
+                    nxt |= {y for y, _, _ in self.follow[pos]}
+
+            # Group the following positions by element name
+            by_name = {}
+            wild_pos = []
+            for p in sorted(nxt):
+                if terms[p].wildcard is None:
+                    by_name.setdefault(terms[p].qname, []).append(p)
+                else:
+                    wild_pos.append(p)
+
+            tr = {}
+            for q, positions in by_name.items():
+                ns = namespace(q)
+                tr[q] = target(positions + [p for p in wild_pos
+                                            if terms[p].wildcard.matches(ns)])
+            trans.append(tr)
+
+            if len(wild_pos) == 0:
+                wild.append(None)
+                continue
+            wd = {}
+            for ns in list(namespaces) + [other_ns]:
+                positions = [p for p in wild_pos
+                             if terms[p].wildcard.matches(ns)]
+                if len(positions) > 0:
+                    wd[ns] = target(positions)
+            wild.append(wd)
+
+        return Dfa(trans, wild, final, namespaces)
+
+#-------------------------------------------------------------------------------
+
+class Compiler:
+    """Compiles (and memoizes) the content models of an assembled schema.
+
+    Repetitions are unrolled as long as they make the automaton at most
+    unroll_limit times bigger, bigger ones are compiled into a
+    CountingModel.
+
+    """
+    def __init__(self, xsd, unroll_limit=32):
+        self.xsd = xsd
+        self.unroll_limit = unroll_limit
+        self.models = {}
+
+        # Substitution group heads => the elements that can take their place
+        self.substitutions = SubstitutionIndex(xsd)
+
+    def is_particle(self, x):
+        return type(x) in [XsdElement, XsdAny, XsdGroup, XsdSequence,
+                           XsdChoice, XsdAll]
+
+    def group(self, ref, sch):
+        """Return the model group (all, choice or sequence) of the named group
+        referenced by 'ref', and the schema document it's declared in.
+
+        """
+        g = self.xsd.get_group(ref.ref, sch)
+        if g is None:
+            m = f'Group "{ref.ref}" not found ({sch.schema_location})'
+            raise RuntimeError(m)
+        gsch = self.xsd.owner(g)
+        for k in g.elems:
+            if self.is_particle(k):
+                # The occurrence is the reference's, not the group's
+                return k, gsch
+        return XsdSequence(), gsch
+
+    def element_terms(self, p, sch):
+        """Return the Terms that element particle 'p' can match: the element
+        itself, and the members of its substitution group if it's a
+        reference.
+
+        """
+        if p.ref is None:
+            qualified = p.form == 'qualified' if p.form is not None \
+                else sch.elementFormDefault == 'qualified'
+            ns = sch.namespace if qualified else None
+            return [Term(et.QName(ns, p.name).text, p, sch)]
+
+        qname = sch.expand(p.ref)
+        decl = self.xsd.elements.get(qname)
+        if decl is None:
+            return [Term(qname, None, sch)]
+
+        # The head first, if it's allowed, then its members
+        members = self.substitutions.members(qname)
+        arr = [Term(qname, decl, self.xsd.owner(decl))] \
+            if qname in members else []
+        for q in sorted(members - {qname}):
+            e = self.xsd.elements[q]
+            arr.append(Term(q, e, self.xsd.owner(e)))
+        return arr
+
+    def particles(self, ctype, sch):
+        """Return the list of (particle, schema document) making up the
+        content of complex type 'ctype': those of its base type first when
+        it's an extension.
+
+        """
+        for k in ctype.elems:
+            if type(k) == XsdSimpleContent:
+                return []
+            if type(k) == XsdComplexContent:
+                for d in k.elems:
+                    if type(d) == XsdRestrictionCC:
+                        return [(x, sch) for x in d.elems
+                                if self.is_particle(x)]
+                    if type(d) == XsdExtensionCC:
+                        arr = self.base_particles(d.base, sch)
+                        return arr + [(x, sch) for x in d.elems
+                                      if self.is_particle(x)]
+                return []
+            if self.is_particle(k):
+                return [(k, sch)]
+        return []
+
+    def base_particles(self, base, sch):
+        t = self.xsd.get_type(base, sch)
+        if type(t) == XsdComplexType:
+            return self.particles(t, self.xsd.owner(t))
+        if t is None and sch.expand(base) == any_type:
+            return [(self.any_particle(), sch)]
+        return []
+
+    def any_particle(self):
+        return XsdAny(minOccurs='0', maxOccurs='unbounded', namespace='##any',
+                      processContents='lax')
+
+    def all_model(self, p, sch):
+        index = {}
+        required = 0
+        for i, k in enumerate(x for x in p.elems if type(x) == XsdElement):
+            bit = 1 << i
+            lo, hi = occurs(k)
+            if lo > 0:
+                required |= bit
+            for term in self.element_terms(k, sch):
+                index[term.qname] = (bit, term)
+        lo, _ = occurs(p)
+        return AllModel(index, required, lo == 0)
+
+    def compile(self, parts):
+        """Compile a list of (particle, schema document) into a model."""
+        # Look through group references, for xs:all
+        if len(parts) == 1 and type(parts[0][0]) == XsdGroup:
+            p, sch = parts[0]
+            g, gsch = self.group(p, sch)
+            if type(g) == XsdAll:
+                parts = [(g, gsch)]
+        if len(parts) == 1 and type(parts[0][0]) == XsdAll:
+            return self.all_model(*parts[0])
+
+        g = Glushkov(self, self.unroll_limit)
+        frag = g.empty()
+        for p, sch in parts:
+            frag = g.seq(frag, g.particle(p, sch))
+        return g.model(frag)
+
+    def type_model(self, ctype, sch=None):
+        """Return the content model of complex type 'ctype', declared in
+        schema document 'sch' (by default, the owner of a global type).
+
+        """
+        if ctype not in self.models:
+            if sch is None:
+                sch = self.xsd.owner(ctype)
+            self.models[ctype] = self.compile(self.particles(ctype, sch))
+        return self.models[ctype]
+
+    def element_model(self, decl, sch=None):
+        """Return the content model of the elements declared by 'decl', None
+        if they have a simple type (no child elements allowed).
+
+        """
+        if sch is None:
+            sch = self.xsd.owner(decl)
+        for k in decl.elems:
+            if type(k) == XsdComplexType:
+                return self.type_model(k, sch)
+            if type(k) == XsdSimpleType:
+                return None
+
+        if decl.type_ is not None:
+            t = self.xsd.get_type(decl.type_, sch)
+            if type(t) == XsdComplexType:
+                return self.type_model(t)
+            if t is not None or sch.expand(decl.type_) != any_type:
+                return None
+        elif decl.substitutionGroup is not None:
+            head = self.xsd.get_element(decl.substitutionGroup, sch)
+            if head is not None:
+                return self.element_model(head)
+
+        return self.any_model()
+
+    def any_model(self):
+        """Return the content model of xs:anyType."""
+        if any_type not in self.models:
+            self.models[any_type] = self.compile([(self.any_particle(),
+                                                   self.xsd)])
+        return self.models[any_type]
+
+    def compile_all(self):
+        """Compile the models of all the global complex types, return a dict
+        type name => model.
+
+        """
+        return {q: self.type_model(t) for q, t in self.xsd.types.items()
+                if type(t) == XsdComplexType}
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line argument
+    if len(sys.argv) != 2:
+        print(f'Usage: {sys.argv[0]} <xsd filepath>')
+        exit(-1)
+    filepath = sys.argv[1]
+
+    xsd = load_schema(filepath)
+    for q, model in sorted(Compiler(xsd).compile_all().items()):
+        print(f'{q}: {model.__class__.__name__}, {len(model)} states')
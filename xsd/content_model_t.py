@@ -0,0 +1,199 @@
+# content_model_t.py
+
+import unittest
+from parse_xsd import build_schema
+from content_model import Compiler, Dfa, AllModel, CountingModel
+from schema_t_util import schema, q
+
+def accepts(model, names):
+    state = model.initial
+    for name in names:
+        state = model.step(state, name)
+        if state is None:
+            return False
+    return model.is_final(state)
+
+#-------------------------------------------------------------------------------
+
+class DfaTest(unittest.TestCase):
+
+    def model(self, content, name='T'):
+        xsd = schema(content)
+        return Compiler(xsd).type_model(xsd.get_type(name))
+
+    def test_000_sequence(self):
+        m = self.model('''
+          <xs:complexType name="T"><xs:sequence>
+            <xs:element name="a" type="xs:string"/>
+            <xs:element name="b" type="xs:string" minOccurs="0"
+                        maxOccurs="2"/>
+            <xs:element name="c" type="xs:string" maxOccurs="unbounded"/>
+          </xs:sequence></xs:complexType>''')
+        self.assertIsInstance(m, Dfa)
+        self.assertTrue(accepts(m, [q('a'), q('c')]))
+        self.assertTrue(accepts(m, [q('a'), q('b'), q('b'), q('c'), q('c')]))
+        self.assertFalse(accepts(m, [q('a'), q('b'), q('b'), q('b'), q('c')]))
+        self.assertFalse(accepts(m, [q('a')]))
+        self.assertFalse(accepts(m, [q('c')]))
+        self.assertEqual([q('b'), q('c')], m.expected(m.step(0, q('a'))))
+
+    def test_001_choice(self):
+        m = self.model('''
+          <xs:complexType name="T">
+            <xs:choice minOccurs="0" maxOccurs="unbounded">
+              <xs:element name="a" type="xs:string"/>
+              <xs:sequence>
+                <xs:element name="b" type="xs:string"/>
+                <xs:element name="c" type="xs:string"/>
+              </xs:sequence>
+            </xs:choice>
+          </xs:complexType>''')
+        self.assertTrue(accepts(m, []))
+        self.assertTrue(accepts(m, [q('b'), q('c'), q('a'), q('b'), q('c')]))
+        self.assertFalse(accepts(m, [q('b'), q('a')]))
+
+    def test_002_substitution_group(self):
+        xsd = schema('''
+          <xs:element name="head" abstract="true"/>
+          <xs:element name="m1" substitutionGroup="head"/>
+          <xs:element name="m2" substitutionGroup="m1"/>
+          <xs:element name="blocked" block="substitution"/>
+          <xs:element name="m3" substitutionGroup="blocked"/>
+          <xs:complexType name="T"><xs:sequence>
+            <xs:element ref="head" maxOccurs="unbounded"/>
+            <xs:element ref="blocked" minOccurs="0"/>
+          </xs:sequence></xs:complexType>''')
+        m = Compiler(xsd).type_model(xsd.get_type('T'))
+        self.assertTrue(accepts(m, [q('m1'), q('m2'), q('blocked')]))
+        self.assertFalse(accepts(m, [q('head')]))
+        self.assertFalse(accepts(m, [q('m1'), q('m3')]))
+        _, term = m.transition(0, q('m2'))
+        self.assertIs(xsd.get_element('m2'), term.decl)
+
+    def test_003_group_and_extension(self):
+        m = self.model('''
+          <xs:group name="G"><xs:sequence>
+            <xs:element name="a" type="xs:string"/>
+          </xs:sequence></xs:group>
+          <xs:complexType name="B"><xs:sequence>
+            <xs:group ref="G" maxOccurs="2"/>
+          </xs:sequence></xs:complexType>
+          <xs:complexType name="T"><xs:complexContent>
+            <xs:extension base="B"><xs:sequence>
+              <xs:element name="b" type="xs:string"/>
+            </xs:sequence></xs:extension>
+          </xs:complexContent></xs:complexType>''')
+        self.assertTrue(accepts(m, [q('a'), q('a'), q('b')]))
+        self.assertFalse(accepts(m, [q('b')]))
+
+    def test_004_wildcard(self):
+        m = self.model('''
+          <xs:complexType name="T"><xs:sequence>
+            <xs:element name="a" type="xs:string"/>
+            <xs:any namespace="##other" maxOccurs="unbounded"/>
+          </xs:sequence></xs:complexType>''')
+        self.assertTrue(accepts(m, [q('a'), '{http://other}x', '{urn:y}z']))
+        self.assertFalse(accepts(m, [q('a'), q('b')]))
+        self.assertFalse(accepts(m, [q('a'), 'local']))
+        _, term = m.transition(m.step(0, q('a')), '{urn:y}z')
+        self.assertEqual('XsdAny', term.decl.__class__.__name__)
+
+#-------------------------------------------------------------------------------
+
+class CountingModelTest(unittest.TestCase):
+
+    def model(self, content, unroll_limit=32):
+        xsd = schema(content)
+        return Compiler(xsd, unroll_limit).type_model(xsd.get_type('T'))
+
+    def test_000_large_bounds(self):
+        m = self.model('''
+          <xs:complexType name="T"><xs:sequence>
+            <xs:element name="a" type="xs:string" minOccurs="2"
+                        maxOccurs="10000"/>
+            <xs:element name="b" type="xs:string" minOccurs="5000"
+                        maxOccurs="unbounded"/>
+          </xs:sequence></xs:complexType>''')
+        self.assertIsInstance(m, CountingModel)
+        self.assertEqual(3, len(m))
+        self.assertTrue(accepts(m, [q('a')]*10000 + [q('b')]*6000))
+        self.assertFalse(accepts(m, [q('a')]*10001 + [q('b')]*6000))
+        self.assertFalse(accepts(m, [q('a')] + [q('b')]*6000))
+        self.assertFalse(accepts(m, [q('a')]*2 + [q('b')]*4999))
+
+    def test_001_same_as_unrolled(self):
+        content = '''
+          <xs:complexType name="T">
+            <xs:sequence minOccurs="2" maxOccurs="3">
+              <xs:element name="a" type="xs:string" maxOccurs="2"/>
+              <xs:choice minOccurs="0" maxOccurs="2">
+                <xs:element name="a" type="xs:string"/>
+                <xs:element name="b" type="xs:string" maxOccurs="3"/>
+              </xs:choice>
+            </xs:sequence>
+          </xs:complexType>'''
+        d = self.model(content)
+        c = self.model(content, 1)
+        self.assertIsInstance(d, Dfa)
+        self.assertIsInstance(c, CountingModel)
+        words = [[]]
+        for _ in range(8):
+            words = [w + [x] for w in words for x in [q('a'), q('b')]]
+            for w in words:
+                self.assertEqual(accepts(d, w), accepts(c, w), w)
+
+    def test_002_ambiguous(self):
+        # b can continue the inner or the outer repetition, the number of
+        # configurations must stay bounded
+        m = self.model('''
+          <xs:complexType name="T">
+            <xs:choice maxOccurs="10000">
+              <xs:element name="a" type="xs:string"/>
+              <xs:element name="b" type="xs:string" maxOccurs="16"/>
+            </xs:choice>
+          </xs:complexType>''')
+        state = m.initial
+        for x in [q('a'), q('b'), q('b')]*3000:
+            state = m.step(state, x)
+            self.assertTrue(len(state) <= 2)
+        self.assertTrue(m.is_final(state))
+
+#-------------------------------------------------------------------------------
+
+class AllModelTest(unittest.TestCase):
+
+    def test_000_all(self):
+        xsd = schema('''
+          <xs:complexType name="T"><xs:all>
+            <xs:element name="a" type="xs:string"/>
+            <xs:element name="b" type="xs:string" minOccurs="0"/>
+            <xs:element name="c" type="xs:string"/>
+          </xs:all></xs:complexType>''')
+        m = Compiler(xsd).type_model(xsd.get_type('T'))
+        self.assertIsInstance(m, AllModel)
+        self.assertTrue(accepts(m, [q('c'), q('a')]))
+        self.assertTrue(accepts(m, [q('b'), q('c'), q('a')]))
+        self.assertFalse(accepts(m, [q('a'), q('a'), q('c')]))
+        self.assertFalse(accepts(m, [q('a'), q('b')]))
+        self.assertEqual([q('b'), q('c')], m.expected(m.step(0, q('a'))))
+
+#-------------------------------------------------------------------------------
+
+class SchemaTest(unittest.TestCase):
+
+    def test_000_bpmn(self):
+        bpmn = 'http://www.omg.org/spec/BPMN/20100524/MODEL'
+        xsd = build_schema('samples/bpmn/xsd/BPMN20.xsd')
+        c = Compiler(xsd)
+        models = c.compile_all()
+        m = models[f'{{{bpmn}}}tDefinitions']
+        # process and collaboration are in the rootElement substitution group
+        names = [f'{{{bpmn}}}process', f'{{{bpmn}}}collaboration',
+                 f'{{{bpmn}}}process']
+        self.assertTrue(accepts(m, names))
+        self.assertIs(m, c.element_model(xsd.get_element('definitions')))
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
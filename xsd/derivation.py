@@ -0,0 +1,248 @@
+# derivation.py - index of the type derivations of a schema
+
+"""\
+Every type of a schema is derived from a base type, by extension or by
+restriction: complex types with complex or simple content, simple types (a
+list or a union is a restriction of anySimpleType), and the built-in types.
+All of them make up a single tree rooted at xs:anyType.
+
+The tree is numbered once, with a depth-first traversal: each type gets its
+pre-order and post-order numbers, and T is derived from B if and only if
+
+    pre[B] <= pre[T] and post[T] <= post[B]
+
+two integer comparisons instead of a walk up the base types. The ancestors
+of each type are precomputed too, and the number of extension steps from
+the root, so that the methods used to derive T from B come from the depths.
+
+Anonymous types aren't in the tree, they're represented by their nearest
+named base type and the methods used to get there, see named_base().
+
+"""
+
+from parse_xsd import XsdComplexType, XsdSimpleType, XsdSimpleContent, \
+    XsdComplexContent, XsdExtensionSC, XsdExtensionCC, XsdRestrictionSC, \
+    XsdRestrictionCC, XsdRestrictionST, XsdList, XsdUnion, xsd_ns, xs
+from facets import primitives, derived_types, list_types
+
+any_type = f'{{{xsd_ns}}}anyType'
+any_simple_type = f'{{{xsd_ns}}}anySimpleType'
+
+# Derivation methods of complex types
+methods = {XsdExtensionSC: 'extension', XsdExtensionCC: 'extension',
+           XsdRestrictionSC: 'restriction', XsdRestrictionCC: 'restriction'}
+
+#-------------------------------------------------------------------------------
+
+def blocked(value, default):
+    """Return the set of the methods in a block or final attribute, or in
+    the schema's default when it's None.
+
+    """
+    v = value if value is not None else default
+    if v is None:
+        return set()
+    arr = v.split()
+    if '#all' in arr:
+        return {'extension', 'restriction', 'substitution'}
+    return set(arr)
+
+def builtin_bases():
+    """Return the base types of the built-in types: name => (base,
+    method).
+
+    """
+    bases = {any_simple_type: (any_type, 'restriction')}
+    for name in primitives:
+        bases[xs(name)] = (any_simple_type, 'restriction')
+    for name, base, _ in derived_types:
+        # facets.py derives NCName from token, its pattern implies Name's
+        bases[xs(name)] = (xs('Name' if name == 'NCName' else base),
+                           'restriction')
+    for name, _ in list_types:
+        bases[xs(name)] = (any_simple_type, 'restriction')
+    return bases
+
+#-------------------------------------------------------------------------------
+
+class DerivationIndex:
+    """The type derivations of an assembled schema (see
+    parse_xsd.load_schema), the types by expanded name.
+
+    """
+    def __init__(self, xsd):
+        self.xsd = xsd
+
+        # Type => (base type, method)
+        self.bases = builtin_bases()
+        for qname, t in xsd.types.items():
+            b = self.base(t, xsd.owner(t))
+            if b is not None:
+                self.bases[qname] = self.named_base(*b)
+
+        # Derived types of each type, in schema order
+        kids = {}
+        for t, (b, _) in self.bases.items():
+            kids.setdefault(b, []).append(t)
+
+        # Numbering: pre and post-order, depth, extension steps from the root
+        self.pre = {}
+        self.post = {}
+        self.depth = {}
+        self.extensions = {}
+
+        # Type => tuple of its ancestors, the base type first
+        self.ancestry = {}
+
+        self.number(any_type, kids)
+        # Types that aren't reached from anyType: unknown base types, or
+        # derivation cycles (an invalid schema), their trees are numbered
+        # apart
+        for t in list(kids) + list(self.bases):
+            if t not in self.pre:
+                self.number(t, kids)
+
+    def number(self, root, kids):
+        count = len(self.pre) + len(self.post)
+        self.pre[root] = count
+        self.depth[root] = 0
+        self.extensions[root] = 0
+        self.ancestry[root] = ()
+        count += 1
+        # Explicit stack: (type, iterator over its derived types)
+        stack = [(root, iter(kids.get(root, [])))]
+        while len(stack) > 0:
+            t, it = stack[-1]
+            k = next(it, None)
+            while k is not None and k in self.pre:
+                k = next(it, None)
+            if k is None:
+                self.post[t] = count
+                count += 1
+                stack.pop()
+                continue
+            self.pre[k] = count
+            count += 1
+            self.depth[k] = self.depth[t] + 1
+            ext = self.bases[k][1] == 'extension'
+            self.extensions[k] = self.extensions[t] + (1 if ext else 0)
+            self.ancestry[k] = (t,) + self.ancestry[t]
+            stack.append((k, iter(kids.get(k, []))))
+
+    #---------------------------------------------------------------------------
+    # Queries
+
+    def is_derived(self, t, b):
+        """True if type 't' is 'b' or is derived from it (expanded names)."""
+        if t == b:
+            return True
+        pt = self.pre.get(t)
+        pb = self.pre.get(b)
+        if pt is None or pb is None:
+            return False
+        return pb < pt and self.post[t] < self.post[b]
+
+    def ancestors(self, t):
+        """Return the tuple of the ancestors of type 't', from its base type
+        up to the root.
+
+        """
+        return self.ancestry.get(t, ())
+
+    def methods(self, t, b):
+        """Return the set of the methods used to derive type 't' from type
+        'b'. If 't' isn't derived from 'b', those used to derive it from the
+        root.
+
+        """
+        if t not in self.depth:
+            return set()
+        if b not in self.depth or not self.is_derived(t, b):
+            steps, ext = self.depth[t], self.extensions[t]
+        else:
+            steps = self.depth[t] - self.depth[b]
+            ext = self.extensions[t] - self.extensions[b]
+        arr = set()
+        if ext > 0:
+            arr.add('extension')
+        if steps > ext:
+            arr.add('restriction')
+        return arr
+
+    #---------------------------------------------------------------------------
+    # Type definitions
+
+    def base(self, t, sch):
+        """Return the base type of type definition 't' and the derivation
+        method, the base is an expanded name or (anonymous type, schema
+        document). None for a simple type without a base.
+
+        """
+        if type(t) == XsdComplexType:
+            for k in t.elems:
+                if type(k) in [XsdSimpleContent, XsdComplexContent]:
+                    for d in k.elems:
+                        if type(d) in methods:
+                            return sch.expand(d.base), methods[type(d)]
+            return any_type, 'restriction'
+        for k in t.elems:
+            if type(k) == XsdRestrictionST:
+                if k.base is not None:
+                    return sch.expand(k.base), 'restriction'
+                for x in k.elems:
+                    if type(x) == XsdSimpleType:
+                        return (x, sch), 'restriction'
+            elif type(k) in [XsdList, XsdUnion]:
+                return any_simple_type, 'restriction'
+        return None
+
+    def named_base(self, t, method):
+        """Follow the anonymous base types of a derivation: return the first
+        named one, and the method (restriction if there were several steps,
+        only simple types have an anonymous base).
+
+        """
+        while type(t) == tuple:
+            b = self.base(*t)
+            if b is None:
+                return any_simple_type, 'restriction'
+            t, method = b[0], 'restriction'
+        return t, method
+
+    def element_type(self, decl, sch):
+        """Return the type of element declaration 'decl', found in schema
+        document 'sch': an expanded name, or (anonymous type, schema
+        document). Without one, it's the type of the head of its
+        substitution group.
+
+        """
+        seen = set()
+        while decl is not None and id(decl) not in seen:
+            seen.add(id(decl))
+            for k in decl.elems:
+                if type(k) in [XsdComplexType, XsdSimpleType]:
+                    return k, sch
+            if decl.type_ is not None:
+                return sch.expand(decl.type_)
+            if decl.substitutionGroup is None:
+                break
+            decl = self.xsd.get_element(decl.substitutionGroup, sch)
+            if decl is not None:
+                sch = self.xsd.owner(decl)
+        return any_type
+
+    def derivation(self, t, b):
+        """Return the set of the methods used to derive type 't' from type
+        'b', both as returned by element_type().
+
+        """
+        if t == b:
+            return set()
+        arr = set()
+        if type(t) == tuple:
+            bt = self.base(*t)
+            if bt is None:
+                return arr
+            t, method = self.named_base(*bt)
+            arr.add(method)
+        return arr | self.methods(t, b)
@@ -0,0 +1,83 @@
+# derivation_t.py
+
+import unittest
+from parse_xsd import build_schema, xs
+from derivation import DerivationIndex, any_type
+from schema_t_util import schema, q
+
+#-------------------------------------------------------------------------------
+
+class DerivationTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.d = DerivationIndex(schema('''
+          <xs:complexType name="Base"/>
+          <xs:complexType name="Ext">
+            <xs:complexContent><xs:extension base="Base"/></xs:complexContent>
+          </xs:complexType>
+          <xs:complexType name="ExtRes">
+            <xs:complexContent>
+              <xs:restriction base="Ext"/>
+            </xs:complexContent>
+          </xs:complexType>
+          <xs:complexType name="Other"/>
+          <xs:simpleType name="Small">
+            <xs:restriction>
+              <xs:simpleType>
+                <xs:restriction base="xs:int"/>
+              </xs:simpleType>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:complexType name="Price">
+            <xs:simpleContent>
+              <xs:extension base="Small"/>
+            </xs:simpleContent>
+          </xs:complexType>
+          <xs:simpleType name="Smalls">
+            <xs:list itemType="Small"/>
+          </xs:simpleType>'''))
+
+    def test_000_is_derived(self):
+        d = self.d
+        self.assertTrue(d.is_derived(q('ExtRes'), q('Base')))
+        self.assertTrue(d.is_derived(q('Ext'), q('Ext')))
+        self.assertFalse(d.is_derived(q('Base'), q('Ext')))
+        self.assertFalse(d.is_derived(q('Other'), q('Base')))
+        self.assertTrue(d.is_derived(q('Price'), xs('integer')))
+        self.assertTrue(d.is_derived(q('Smalls'), xs('anySimpleType')))
+        self.assertFalse(d.is_derived(q('Smalls'), xs('int')))
+        self.assertTrue(d.is_derived(xs('NCName'), xs('Name')))
+        self.assertTrue(d.is_derived(q('Base'), any_type))
+        self.assertFalse(d.is_derived(q('Nope'), any_type))
+
+    def test_001_ancestors(self):
+        self.assertEqual((q('Ext'), q('Base'), any_type),
+                         self.d.ancestors(q('ExtRes')))
+        self.assertEqual((xs('int'), xs('long'), xs('integer'), xs('decimal'),
+                          xs('anySimpleType'), any_type),
+                         self.d.ancestors(q('Small')))
+        self.assertEqual((), self.d.ancestors(any_type))
+
+    def test_002_methods(self):
+        d = self.d
+        self.assertEqual({'extension', 'restriction'},
+                         d.methods(q('ExtRes'), q('Base')))
+        self.assertEqual({'restriction'}, d.methods(q('ExtRes'), q('Ext')))
+        self.assertEqual(set(), d.methods(q('Ext'), q('Ext')))
+        self.assertEqual({'extension'}, d.methods(q('Price'), q('Small')))
+        self.assertEqual({'extension', 'restriction'},
+                         d.methods(q('Price'), xs('int')))
+
+    def test_003_samples(self):
+        d = DerivationIndex(build_schema('samples/bpmn/xsd/BPMN20.xsd'))
+        ns = '{http://www.omg.org/spec/BPMN/20100524/MODEL}'
+        self.assertTrue(d.is_derived(f'{ns}tUserTask', f'{ns}tBaseElement'))
+        self.assertEqual(f'{ns}tTask', d.ancestors(f'{ns}tUserTask')[0])
+        self.assertTrue(d.is_derived(f'{ns}tFormalExpression',
+                                     f'{ns}tExpression'))
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
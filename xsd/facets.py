@@ -0,0 +1,776 @@
+# facets.py - compile the facets of simple types into value checkers
+
+"""\
+Each simple type is compiled once into a Facets object, check(value) then
+validates a lexical value in a single call:
+
+  - white space handling (preserve, replace, collapse) is resolved to a
+    function when the type is compiled
+  - patterns are translated from the XML Schema regular expression syntax to
+    Python's, and compiled; the compiled patterns are shared by all the types
+    that use the same ones
+  - enumerations become frozensets of values, numeric bounds are converted to
+    Decimal (or float for float and double) ahead of time
+
+Derivation by restriction copies the Facets of the base type and applies the
+new facets on top of them: the patterns of each derivation step must all
+match, the other facets replace those of the base type.
+
+The built-in types are defined the same way, from the primitive types. The
+bounds of the non numeric types (dates, durations) aren't checked, neither
+are the QName and NOTATION values against the namespaces in scope.
+
+"""
+
+import re
+import sys
+import copy
+import unicodedata
+from decimal import Decimal
+
+from parse_xsd import XsdSimpleType, XsdRestrictionST, XsdList, XsdUnion, \
+    XsdComplexType, XsdSimpleContent, XsdRestrictionSC, XsdExtensionSC, \
+    XsdPattern, XsdEnumeration, XsdMaxExclusive, XsdMaxInclusive, \
+    XsdMaxLength, XsdMinLength, XsdMinExclusive, XsdMinInclusive, XsdLength, \
+    XsdTotalDigits, XsdFractionDigits, XsdWhiteSpace, xsd_ns
+
+#-------------------------------------------------------------------------------
+# Regular expressions
+
+# Name characters, from XML 1.0 fifth edition
+name_start = r':A-Z_a-z\xc0-\xd6\xd8-\xf6\xf8-\u02ff\u0370-\u037d' \
+    r'\u037f-\u1fff\u200c-\u200d\u2070-\u218f\u2c00-\u2fef' \
+    r'\u3001-\ud7ff\uf900-\ufdcf\ufdf0-\ufffd\U00010000-\U000effff'
+name_char = name_start + r'\-.0-9\xb7\u0300-\u036f\u203f-\u2040'
+
+# Unicode blocks for \p{IsBlock}, the most common ones
+blocks = {
+    'BasicLatin': (0x0000, 0x007f),
+    'Latin-1Supplement': (0x0080, 0x00ff),
+    'LatinExtended-A': (0x0100, 0x017f),
+    'LatinExtended-B': (0x0180, 0x024f),
+    'IPAExtensions': (0x0250, 0x02af),
+    'SpacingModifierLetters': (0x02b0, 0x02ff),
+    'CombiningDiacriticalMarks': (0x0300, 0x036f),
+    'Greek': (0x0370, 0x03ff),
+    'Cyrillic': (0x0400, 0x04ff),
+    'Armenian': (0x0530, 0x058f),
+    'Hebrew': (0x0590, 0x05ff),
+    'Arabic': (0x0600, 0x06ff),
+    'Devanagari': (0x0900, 0x097f),
+    'Thai': (0x0e00, 0x0e7f),
+    'LatinExtendedAdditional': (0x1e00, 0x1eff),
+    'GreekExtended': (0x1f00, 0x1fff),
+    'GeneralPunctuation': (0x2000, 0x206f),
+    'SuperscriptsandSubscripts': (0x2070, 0x209f),
+    'CurrencySymbols': (0x20a0, 0x20cf),
+    'LetterlikeSymbols': (0x2100, 0x214f),
+    'NumberForms': (0x2150, 0x218f),
+    'Arrows': (0x2190, 0x21ff),
+    'MathematicalOperators': (0x2200, 0x22ff),
+    'BoxDrawing': (0x2500, 0x257f),
+    'GeometricShapes': (0x25a0, 0x25ff),
+    'MiscellaneousSymbols': (0x2600, 0x26ff),
+    'CJKSymbolsandPunctuation': (0x3000, 0x303f),
+    'Hiragana': (0x3040, 0x309f),
+    'Katakana': (0x30a0, 0x30ff),
+    'CJKUnifiedIdeographs': (0x4e00, 0x9fff),
+    'HangulSyllables': (0xac00, 0xd7a3),
+    'PrivateUse': (0xe000, 0xf8ff),
+    'AlphabeticPresentationForms': (0xfb00, 0xfb4f),
+    'HalfwidthandFullwidthForms': (0xff00, 0xffef),
+    'Specials': (0xfff0, 0xffff),
+}
+
+# General category => character class contents, computed on first use
+categories = None
+
+def char_range(lo, hi):
+    return f'\\U{lo:08x}' if lo == hi else f'\\U{lo:08x}-\\U{hi:08x}'
+
+def category_class(name):
+    """Return the contents of the character class for Unicode general
+    category 'name' (one letter for a group of categories, e.g. 'L').
+
+    """
+    global categories
+    if categories is None:
+        # One pass over the code points, for all the categories
+        ranges = {}
+        cat, lo = None, 0
+        for cp in range(sys.maxunicode + 2):
+            c = unicodedata.category(chr(cp)) if cp <= sys.maxunicode \
+                else None
+            if c != cat:
+                if cat is not None:
+                    for k in [cat, cat[0]]:
+                        ranges.setdefault(k, []).append(char_range(lo, cp-1))
+                cat, lo = c, cp
+        categories = {k: ''.join(v) for k, v in ranges.items()}
+    return categories.get(name, '')
+
+def property_class(name, pattern):
+    """Return the contents of the character class for \\p{name}."""
+    if name.startswith('Is'):
+        if name[2:] not in blocks:
+            m = f'Unknown block "{name}" in pattern "{pattern}"'
+            raise RuntimeError(m)
+        return char_range(*blocks[name[2:]])
+    if len(name) not in [1, 2] or name[0] not in 'LMNPZSC':
+        m = f'Unknown category "{name}" in pattern "{pattern}"'
+        raise RuntimeError(m)
+    return category_class(name)
+
+def class_char(c):
+    """Escape a character inside a Python character class."""
+    return '\\' + c if c in '\\]^-[' else c
+
+# Single character escapes
+char_escapes = {'n': '\n', 'r': '\r', 't': '\t'}
+for c in '\\|.-^?*+{}()[]':
+    char_escapes[c] = c
+
+def escape(pattern, i):
+    """Read the escape at pattern[i] (a backslash). Return the character set
+    (contents of a character class, negated, the character if it's a single
+    one) and the index that follows.
+
+    """
+    c = pattern[i+1] if i+1 < len(pattern) else ''
+    if c in char_escapes:
+        x = char_escapes[c]
+        return (class_char(x), False, x), i + 2
+    if c in 'sS':
+        return (' \\t\\n\\r', c == 'S', None), i + 2
+    if c in 'iI':
+        return (name_start, c == 'I', None), i + 2
+    if c in 'cC':
+        return (name_char, c == 'C', None), i + 2
+    if c in 'dD':
+        return ('\\d', c == 'D', None), i + 2
+    if c in 'wW':
+        # All the characters but punctuation, separators and others
+        pzc = property_class('P', pattern) + property_class('Z', pattern) + \
+            property_class('C', pattern)
+        return (pzc, c == 'w', None), i + 2
+    if c in 'pP' and pattern[i+2:i+3] == '{':
+        j = pattern.find('}', i)
+        if j > 0:
+            cls = property_class(pattern[i+3:j], pattern)
+            return (cls, c == 'P', None), j + 1
+    m = f'Invalid escape "\\{c}" in pattern "{pattern}"'
+    raise RuntimeError(m)
+
+def char_set(contents, negated):
+    """Return the expression for one character of a set."""
+    if contents == '':
+        return '(?!)' if not negated else '[\\s\\S]'
+    return f'[^{contents}]' if negated else f'[{contents}]'
+
+def char_class(pattern, i):
+    """Translate the character class at pattern[i] (a '['), return the
+    expression and the index that follows.
+
+    """
+    j = i + 1
+    negated = pattern[j:j+1] == '^'
+    if negated:
+        j += 1
+    positive, negatives, subtracted = [], [], None
+    start = j
+    while True:
+        if j >= len(pattern):
+            m = f'Unterminated character class in pattern "{pattern}"'
+            raise RuntimeError(m)
+        c = pattern[j]
+        if c == ']' and j > start:
+            j += 1
+            break
+        if c == '-' and pattern[j+1:j+2] == '[' and j > start:
+            subtracted, j = char_class(pattern, j + 1)
+            if pattern[j:j+1] != ']':
+                m = f'Invalid class subtraction in pattern "{pattern}"'
+                raise RuntimeError(m)
+            j += 1
+            break
+        if c == '\\':
+            (contents, neg, x), j = escape(pattern, j)
+        else:
+            contents, neg, x = class_char(c), False, c
+            j += 1
+        if x is not None and pattern[j:j+1] == '-' and \
+           pattern[j+1:j+2] not in ['[', ']', '']:
+            # A range
+            if pattern[j+1] == '\\':
+                (_, _, y), j = escape(pattern, j + 1)
+                if y is None:
+                    m = f'Invalid range in pattern "{pattern}"'
+                    raise RuntimeError(m)
+            else:
+                y, j = pattern[j+1], j + 2
+            contents = f'{class_char(x)}-{class_char(y)}'
+        if neg:
+            negatives.append(contents)
+        else:
+            positive.append(contents)
+
+    if len(negatives) == 0:
+        expr = char_set(''.join(positive), negated)
+    else:
+        # A union of sets, some of them negated
+        sets = [char_set(''.join(positive), False)] if positive else []
+        sets += [char_set(x, True) for x in negatives]
+        expr = f'(?:{"|".join(sets)})'
+        if negated:
+            expr = f'(?!{expr})[\\s\\S]'
+    if subtracted is not None:
+        expr = f'(?:(?!{subtracted}){expr})'
+    return expr, j
+
+def translate(pattern):
+    """Translate XML Schema regular expression 'pattern' to Python's syntax.
+    The pattern is implicitly anchored, it's meant for re.fullmatch().
+
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            (contents, neg, x), i = escape(pattern, i)
+            out.append(re.escape(x) if x is not None else
+                       char_set(contents, neg))
+        elif c == '[':
+            expr, i = char_class(pattern, i)
+            out.append(expr)
+        elif c == '.':
+            out.append('[^\\n\\r]')
+            i += 1
+        elif c in '^$':
+            # Not anchors, plain characters
+            out.append('\\' + c)
+            i += 1
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out)
+
+# Patterns of a derivation step (a tuple) => compiled regular expression
+patterns = {}
+
+# Class subtraction costs a lookahead per character, the NCName pattern (used
+# by all the ID and QName values) is translated by hand. name_start and
+# name_char both start with ':'
+ncname = f'[{name_start[1:]}][{name_char[1:]}]*'
+patterns[('[\\i-[:]][\\c-[:]]*',)] = re.compile(ncname)
+patterns[('([\\i-[:]][\\c-[:]]*:)?[\\i-[:]][\\c-[:]]*',)] = \
+    re.compile(f'({ncname}:)?{ncname}')
+
+def compile_patterns(values):
+    """Return the compiled regular expression matching any of the XML Schema
+    patterns 'values' (those of a single derivation step).
+
+    """
+    key = tuple(values)
+    if key not in patterns:
+        try:
+            s = '|'.join(f'(?:{translate(x)})' for x in values)
+            patterns[key] = re.compile(s)
+        except re.error as e:
+            m = f'Invalid pattern "{"|".join(values)}": {e}'
+            raise RuntimeError(m)
+    return patterns[key]
+
+#-------------------------------------------------------------------------------
+# White space
+
+ws_runs = re.compile('[ \t\n\r]+')
+ws_table = str.maketrans('\t\n\r', '   ')
+
+def preserve(value):
+    return value
+
+def replace(value):
+    return value.translate(ws_table)
+
+def collapse(value):
+    if '\t' in value or '\n' in value or '\r' in value or '  ' in value or \
+       value[:1] == ' ' or value[-1:] == ' ':
+        return ws_runs.sub(' ', value).strip(' ')
+    return value
+
+whitespace = {'preserve': preserve, 'replace': replace, 'collapse': collapse}
+
+#-------------------------------------------------------------------------------
+# Primitive types
+
+def to_bool(value):
+    # None: the attribute isn't there. xs:boolean's whiteSpace is collapse
+    return value is not None and collapse(value) in ['true', '1']
+
+def hex_length(value):
+    return len(value)//2
+
+def base64_length(value):
+    n = len(value.replace(' ', ''))
+    return n*3//4 - value.count('=')
+
+date_tz = '(Z|[+\\-][0-9]{2}:[0-9]{2})?'
+year = '-?[0-9]{4,}'
+time = '[0-9]{2}:[0-9]{2}:[0-9]{2}(\\.[0-9]+)?'
+b64 = '[A-Za-z0-9+/] ?'
+
+# name => (lexical pattern, value conversion, length, ordered)
+primitives = {
+    'string': (None, str, len, False),
+    'boolean': ('true|false|1|0', to_bool, None, False),
+    'decimal': ('[+\\-]?([0-9]+(\\.[0-9]*)?|\\.[0-9]+)', Decimal, None, True),
+    'float': ('[+\\-]?([0-9]+(\\.[0-9]*)?|\\.[0-9]+)([Ee][+\\-]?[0-9]+)?'
+              '|[+\\-]?INF|NaN', float, None, True),
+    'double': ('[+\\-]?([0-9]+(\\.[0-9]*)?|\\.[0-9]+)([Ee][+\\-]?[0-9]+)?'
+               '|[+\\-]?INF|NaN', float, None, True),
+    'duration': ('-?P(([0-9]+Y)?([0-9]+M)?([0-9]+D)?'
+                 '(T([0-9]+H)?([0-9]+M)?([0-9]+(\\.[0-9]+)?S)?)?)',
+                 str, None, False),
+    'dateTime': (f'{year}-[0-9]{{2}}-[0-9]{{2}}T{time}{date_tz}', str, None,
+                 False),
+    'time': (f'{time}{date_tz}', str, None, False),
+    'date': (f'{year}-[0-9]{{2}}-[0-9]{{2}}{date_tz}', str, None, False),
+    'gYearMonth': (f'{year}-[0-9]{{2}}{date_tz}', str, None, False),
+    'gYear': (f'{year}{date_tz}', str, None, False),
+    'gMonthDay': (f'--[0-9]{{2}}-[0-9]{{2}}{date_tz}', str, None, False),
+    'gDay': (f'---[0-9]{{2}}{date_tz}', str, None, False),
+    'gMonth': (f'--[0-9]{{2}}{date_tz}', str, None, False),
+    'hexBinary': ('([0-9a-fA-F]{2})*', str, hex_length, False),
+    'base64Binary': (f'(({b64}){{4}})*(({b64}){{3}}[A-Za-z0-9+/]'
+                     f'|({b64}){{2}}[AEIMQUYcgkosw048] ?='
+                     '|[A-Za-z0-9+/] ?[AQgw] ?= ?=)?', str, base64_length,
+                     False),
+    'anyURI': (None, str, len, False),
+    'QName': ('([\\i-[:]][\\c-[:]]*:)?[\\i-[:]][\\c-[:]]*', str, None, False),
+    'NOTATION': ('([\\i-[:]][\\c-[:]]*:)?[\\i-[:]][\\c-[:]]*', str, None,
+                 False),
+}
+
+# The derived built-in types: name, base, facets
+derived_types = [
+    ('normalizedString', 'string', {'whiteSpace': 'replace'}),
+    ('token', 'normalizedString', {'whiteSpace': 'collapse'}),
+    ('language', 'token', {'pattern': ['[a-zA-Z]{1,8}(-[a-zA-Z0-9]{1,8})*']}),
+    ('NMTOKEN', 'token', {'pattern': ['\\c+']}),
+    ('Name', 'token', {'pattern': ['\\i\\c*']}),
+    # NCName is derived from Name, but its pattern implies Name's
+    ('NCName', 'token', {'pattern': ['[\\i-[:]][\\c-[:]]*']}),
+    ('ID', 'NCName', {}),
+    ('IDREF', 'NCName', {}),
+    ('ENTITY', 'NCName', {}),
+    ('integer', 'decimal', {'fractionDigits': '0',
+                            'pattern': ['[\\-+]?[0-9]+']}),
+    ('nonPositiveInteger', 'integer', {'maxInclusive': '0'}),
+    ('negativeInteger', 'nonPositiveInteger', {'maxInclusive': '-1'}),
+    ('long', 'integer', {'minInclusive': '-9223372036854775808',
+                         'maxInclusive': '9223372036854775807'}),
+    ('int', 'long', {'minInclusive': '-2147483648',
+                     'maxInclusive': '2147483647'}),
+    ('short', 'int', {'minInclusive': '-32768', 'maxInclusive': '32767'}),
+    ('byte', 'short', {'minInclusive': '-128', 'maxInclusive': '127'}),
+    ('nonNegativeInteger', 'integer', {'minInclusive': '0'}),
+    ('unsignedLong', 'nonNegativeInteger',
+     {'maxInclusive': '18446744073709551615'}),
+    ('unsignedInt', 'unsignedLong', {'maxInclusive': '4294967295'}),
+    ('unsignedShort', 'unsignedInt', {'maxInclusive': '65535'}),
+    ('unsignedByte', 'unsignedShort', {'maxInclusive': '255'}),
+    ('positiveInteger', 'nonNegativeInteger', {'minInclusive': '1'}),
+]
+
+# The built-in list types: name, item type
+list_types = [('NMTOKENS', 'NMTOKEN'), ('IDREFS', 'IDREF'),
+              ('ENTITIES', 'ENTITY')]
+
+# Facet element class => facet name
+facet_names = {
+    XsdPattern: 'pattern', XsdEnumeration: 'enumeration',
+    XsdMaxExclusive: 'maxExclusive', XsdMaxInclusive: 'maxInclusive',
+    XsdMinExclusive: 'minExclusive', XsdMinInclusive: 'minInclusive',
+    XsdLength: 'length', XsdMinLength: 'minLength', XsdMaxLength: 'maxLength',
+    XsdTotalDigits: 'totalDigits', XsdFractionDigits: 'fractionDigits',
+    XsdWhiteSpace: 'whiteSpace',
+}
+
+# Facets that have several values
+multi_facets = ['pattern', 'enumeration']
+
+# Facet name => Facets attribute, for the integer and bound facets
+int_facets = {'length': 'length', 'minLength': 'min_length',
+              'maxLength': 'max_length', 'totalDigits': 'total_digits',
+              'fractionDigits': 'fraction_digits'}
+bound_facets = {'minInclusive': 'min_inclusive',
+                'minExclusive': 'min_exclusive',
+                'maxInclusive': 'max_inclusive',
+                'maxExclusive': 'max_exclusive'}
+
+def facet_values(elems):
+    """Return the facets found in 'elems' as a dict: facet name => value,
+    a list of values for patterns and enumerations.
+
+    """
+    facets = {}
+    for k in elems:
+        name = facet_names.get(type(k))
+        if name in multi_facets:
+            facets.setdefault(name, []).append(k.value)
+        elif name is not None:
+            facets[name] = k.value
+    return facets
+
+def digits(d):
+    """Return the total digits and fraction digits of Decimal 'd'."""
+    _, ds, exp = d.as_tuple()
+    if not isinstance(exp, int):
+        return 0, 0
+    if exp >= 0:
+        return len(ds) + exp, 0
+    # Without the trailing zeros of the fraction
+    _, ds, exp = d.normalize().as_tuple()
+    fraction = -exp if exp < 0 else 0
+    total = len(ds) + exp if exp > 0 else max(len(ds), fraction)
+    return total, fraction
+
+#-------------------------------------------------------------------------------
+
+class Facets:
+    """The compiled checker of a simple type.
+
+    variety: 'atomic', 'list' or 'union'
+    primitive: name of the primitive type (atomic types)
+    normalize: white space handling, a function
+    lexical: compiled lexical pattern of the primitive type, or None
+    convert: lexical value => value, for enumerations and bounds
+    measure: value => length, None if the length facets don't apply
+    ordered: the bounds are checked
+    patterns: compiled patterns, one per derivation step, all must match
+    enumeration: frozenset of the values, or None
+    item: Facets of the items (list types)
+    members: Facets of the member types (union types)
+    id_kind: 'ID', 'IDREF' or 'IDREFS' for these types and the types derived
+        from them, else None
+
+    """
+    __slots__ = ('name', 'variety', 'primitive', 'normalize', 'lexical',
+                 'convert', 'measure', 'ordered', 'patterns', 'enumeration',
+                 'length', 'min_length', 'max_length', 'min_inclusive',
+                 'min_exclusive', 'max_inclusive', 'max_exclusive',
+                 'total_digits', 'fraction_digits', 'item', 'members',
+                 'id_kind')
+
+    def __init__(self, name, variety='atomic', primitive=None,
+                 normalize=preserve, lexical=None, convert=str, measure=len,
+                 ordered=False, item=None, members=()):
+        self.name = name
+        self.variety = variety
+        self.primitive = primitive
+        self.normalize = normalize
+        self.lexical = lexical
+        self.convert = convert
+        self.measure = measure
+        self.ordered = ordered
+        self.patterns = ()
+        self.enumeration = None
+        self.length = None
+        self.min_length = None
+        self.max_length = None
+        self.min_inclusive = None
+        self.min_exclusive = None
+        self.max_inclusive = None
+        self.max_exclusive = None
+        self.total_digits = None
+        self.fraction_digits = None
+        self.item = item
+        self.members = members
+        self.id_kind = None
+
+    @classmethod
+    def list_of(cls, name, item):
+        f = cls(name, 'list', normalize=collapse, convert=str, measure=None,
+                item=item)
+        if item.id_kind == 'IDREF':
+            f.id_kind = 'IDREFS'
+        return f
+
+    @classmethod
+    def union_of(cls, name, members):
+        return cls(name, 'union', convert=str, measure=None,
+                   members=tuple(members))
+
+    def value(self, lexical):
+        """Convert a facet value (enumeration, bound) of this type."""
+        value = self.normalize(lexical)
+        if self.variety != 'atomic':
+            return value
+        if self.lexical is not None and \
+           self.lexical.fullmatch(value) is None:
+            m = f'Invalid facet value "{lexical}" for type {self.name}'
+            raise RuntimeError(m)
+        return self.convert(value)
+
+    def restrict(self, name, facets):
+        """Return the Facets of a type derived from this one by restriction,
+        'facets' as returned by facet_values().
+
+        """
+        f = copy.copy(self)
+        f.name = name
+        if 'whiteSpace' in facets:
+            ws = facets['whiteSpace']
+            if ws not in whitespace:
+                m = f'Invalid whiteSpace "{ws}" in type {name}'
+                raise RuntimeError(m)
+            f.normalize = whitespace[ws]
+        if 'pattern' in facets:
+            f.patterns = self.patterns + (compile_patterns(facets['pattern']),)
+        if 'enumeration' in facets:
+            f.enumeration = frozenset(f.value(x)
+                                      for x in facets['enumeration'])
+        for k, attr in int_facets.items():
+            if k in facets:
+                setattr(f, attr, int(facets[k]))
+        if f.ordered:
+            for k, attr in bound_facets.items():
+                if k in facets:
+                    setattr(f, attr, f.value(facets[k]))
+        return f
+
+    def accepts_anything(self):
+        """True if check() can't fail and the value is the lexical value
+        itself: callers can skip both.
+
+        """
+        return self.variety == 'atomic' and self.normalize is preserve and \
+            self.lexical is None and \
+            self.patterns == () and self.enumeration is None and \
+            self.length is None and self.min_length is None and \
+            self.max_length is None
+
+    def key(self, lexical):
+        """Return the value of 'lexical', as compared by identity constraints
+        (see identity.py): values of different primitive types are never
+        equal, strings and lists compare as normalized strings.
+
+        """
+        value = self.normalize(lexical)
+        if self.variety == 'union':
+            for t in self.members:
+                if t.check(value) is None:
+                    return t.key(value)
+        elif self.variety == 'atomic' and self.convert is not str and \
+             self.lexical.fullmatch(value) is not None:
+            return self.primitive, self.convert(value)
+        return 'string', value
+
+    def check(self, value):
+        """Check lexical value 'value', return None if it's valid, else
+        (error code, message).
+
+        """
+        value = self.normalize(value)
+        if self.variety == 'atomic':
+            if self.lexical is not None and \
+               self.lexical.fullmatch(value) is None:
+                m = f'"{value}" is not a valid {self.primitive}'
+                return 'cvc-datatype-valid.1.2.1', m
+            v = self.convert(value)
+            n = self.measure(value) if self.measure is not None else None
+        elif self.variety == 'list':
+            items = value.split(' ') if value != '' else []
+            for x in items:
+                err = self.item.check(x)
+                if err is not None:
+                    return err
+            v = value
+            n = len(items)
+        else:
+            for t in self.members:
+                if t.check(value) is None:
+                    break
+            else:
+                m = f'"{value}" is not valid for any member type of' \
+                    f' {self.name}'
+                return 'cvc-datatype-valid.1.2.3', m
+            v = value
+            n = None
+
+        for p in self.patterns:
+            if p.fullmatch(value) is None:
+                m = f'"{value}" doesn\'t match the pattern of {self.name}'
+                return 'cvc-pattern-valid', m
+        if self.enumeration is not None and v not in self.enumeration:
+            m = f'"{value}" is not in the enumeration of {self.name}'
+            return 'cvc-enumeration-valid', m
+        if n is not None:
+            if self.length is not None and n != self.length:
+                m = f'"{value}" has length {n}, expected {self.length}'
+                return 'cvc-length-valid', m
+            if self.min_length is not None and n < self.min_length:
+                m = f'"{value}" has length {n}, the minimum is' \
+                    f' {self.min_length}'
+                return 'cvc-minLength-valid', m
+            if self.max_length is not None and n > self.max_length:
+                m = f'"{value}" has length {n}, the maximum is' \
+                    f' {self.max_length}'
+                return 'cvc-maxLength-valid', m
+        if self.min_inclusive is not None and not v >= self.min_inclusive:
+            m = f'"{value}" is less than {self.min_inclusive}'
+            return 'cvc-minInclusive-valid', m
+        if self.min_exclusive is not None and not v > self.min_exclusive:
+            m = f'"{value}" is not greater than {self.min_exclusive}'
+            return 'cvc-minExclusive-valid', m
+        if self.max_inclusive is not None and not v <= self.max_inclusive:
+            m = f'"{value}" is greater than {self.max_inclusive}'
+            return 'cvc-maxInclusive-valid', m
+        if self.max_exclusive is not None and not v < self.max_exclusive:
+            m = f'"{value}" is not less than {self.max_exclusive}'
+            return 'cvc-maxExclusive-valid', m
+        if self.total_digits is not None or self.fraction_digits is not None:
+            total, fraction = digits(v)
+            if self.total_digits is not None and total > self.total_digits:
+                m = f'"{value}" has {total} digits, the maximum is' \
+                    f' {self.total_digits}'
+                return 'cvc-totalDigits-valid', m
+            if self.fraction_digits is not None and \
+               fraction > self.fraction_digits:
+                m = f'"{value}" has {fraction} fraction digits, the maximum' \
+                    f' is {self.fraction_digits}'
+                return 'cvc-fractionDigits-valid', m
+        return None
+
+#-------------------------------------------------------------------------------
+
+def builtin_types():
+    """Return the built-in simple types: local name => Facets."""
+    types = {'anySimpleType': Facets('anySimpleType')}
+    for name, (lexical, convert, measure, ordered) in primitives.items():
+        ws = preserve if name == 'string' else collapse
+        p = compile_patterns([lexical]) if lexical is not None else None
+        types[name] = Facets(name, 'atomic', name, ws, p, convert, measure,
+                             ordered)
+    for name, base, facets in derived_types:
+        types[name] = types[base].restrict(name, facets)
+    types['ID'].id_kind = 'ID'
+    types['IDREF'].id_kind = 'IDREF'
+    for name, item in list_types:
+        types[name] = Facets.list_of(name, types[item]).restrict(
+            name, {'minLength': '1'})
+    return types
+
+builtins = builtin_types()
+
+#-------------------------------------------------------------------------------
+
+class FacetCompiler:
+    """Compiles the simple types of an assembled schema (see
+    parse_xsd.load_schema), each one once.
+
+    """
+    def __init__(self, xsd):
+        self.xsd = xsd
+
+        # XsdSimpleType, XsdComplexType (simple content) => Facets
+        self.types = {}
+
+    def named_type(self, qname):
+        """Return the Facets of the simple type named 'qname' (Clark
+        notation), None if it's not a simple type. Types that weren't loaded
+        accept any value.
+
+        """
+        t = self.xsd.types.get(qname)
+        if type(t) == XsdSimpleType:
+            return self.simple_type(t, self.xsd.owner(t))
+        if type(t) == XsdComplexType:
+            return None
+        ns, _, name = qname[1:].partition('}') if qname[0] == '{' \
+            else (None, None, qname)
+        if ns == xsd_ns:
+            return builtins.get(name)
+        return builtins['anySimpleType']
+
+    def base_type(self, qname, elems, sch):
+        """Return the Facets of the base type: the nested simpleType in
+        'elems' if there's one, else the type named 'qname'.
+
+        """
+        for k in elems:
+            if type(k) == XsdSimpleType:
+                return self.simple_type(k, sch)
+        if qname is None:
+            return builtins['anySimpleType']
+        f = self.named_type(sch.expand(qname))
+        return f if f is not None else builtins['anySimpleType']
+
+    def simple_type(self, stype, sch):
+        if stype in self.types:
+            return self.types[stype]
+
+        name = stype.name if stype.name is not None else 'anonymous type'
+        f = builtins['anySimpleType']
+        for k in stype.elems:
+            if type(k) == XsdRestrictionST:
+                base = self.base_type(k.base, k.elems, sch)
+                f = base.restrict(name, facet_values(k.elems))
+            elif type(k) == XsdList:
+                item = self.base_type(k.itemType, k.elems, sch)
+                f = Facets.list_of(name, item)
+            elif type(k) == XsdUnion:
+                members = []
+                if k.memberTypes is not None:
+                    members += [self.base_type(x, (), sch)
+                                for x in k.memberTypes.split()]
+                members += [self.simple_type(x, sch) for x in k.elems
+                            if type(x) == XsdSimpleType]
+                f = Facets.union_of(name, members)
+
+        self.types[stype] = f
+        return f
+
+    def simple_content(self, ctype, sch):
+        """Return the Facets of the text of complex type 'ctype', which has
+        simple content.
+
+        """
+        if ctype in self.types:
+            return self.types[ctype]
+
+        name = ctype.name if ctype.name is not None else 'anonymous type'
+        f = builtins['anySimpleType']
+        for k in ctype.elems:
+            if type(k) != XsdSimpleContent:
+                continue
+            for d in k.elems:
+                if type(d) not in [XsdExtensionSC, XsdRestrictionSC]:
+                    continue
+                base = self.xsd.get_type(d.base, sch)
+                if type(base) == XsdComplexType:
+                    f = self.simple_content(base, self.xsd.owner(base))
+                    if type(d) == XsdRestrictionSC:
+                        for x in d.elems:
+                            if type(x) == XsdSimpleType:
+                                f = self.simple_type(x, sch)
+                        f = f.restrict(name, facet_values(d.elems))
+                elif type(d) == XsdRestrictionSC:
+                    f = self.base_type(d.base, d.elems, sch).restrict(
+                        name, facet_values(d.elems))
+                else:
+                    f = self.base_type(d.base, (), sch)
+
+        self.types[ctype] = f
+        return f
+
+    def attribute(self, decl, sch):
+        """Return the Facets of the values of attribute 'decl'."""
+        for k in decl.elems:
+            if type(k) == XsdSimpleType:
+                return self.simple_type(k, sch)
+        if decl.type_ is None:
+            return builtins['anySimpleType']
+        f = self.named_type(sch.expand(decl.type_))
+        return f if f is not None else builtins['anySimpleType']
@@ -0,0 +1,191 @@
+# facets_t.py
+
+import re
+import unittest
+from facets import FacetCompiler, translate, builtins
+from schema_t_util import schema, q
+
+#-------------------------------------------------------------------------------
+
+class RegexTest(unittest.TestCase):
+
+    def matches(self, pattern, value):
+        return re.fullmatch(translate(pattern), value) is not None
+
+    def test_000_syntax(self):
+        self.assertTrue(self.matches('a^b$', 'a^b$'))
+        self.assertFalse(self.matches('.', '\n'))
+        self.assertTrue(self.matches('\\S+( \\S+)*', 'a b'))
+        self.assertFalse(self.matches('\\S+( \\S+)*', 'a  b '))
+        self.assertTrue(self.matches('[\\-+]?[0-9]{2,3}', '-123'))
+
+    def test_001_classes(self):
+        self.assertTrue(self.matches('[^a-c\\s]', 'd'))
+        self.assertFalse(self.matches('[^a-c\\s]', '\t'))
+        self.assertTrue(self.matches('[a-z-[aeiou]]+', 'xyz'))
+        self.assertFalse(self.matches('[a-z-[aeiou]]+', 'xaz'))
+        self.assertTrue(self.matches('[\\i-[:]][\\c-[:]]*', '_a.b-1'))
+        self.assertFalse(self.matches('[\\i-[:]][\\c-[:]]*', 'a:b'))
+        # A negated escape inside a class
+        self.assertTrue(self.matches('[a\\D]', '-'))
+        self.assertFalse(self.matches('[a\\D]', '5'))
+
+    def test_002_properties(self):
+        self.assertTrue(self.matches('\\p{Lu}\\p{Ll}+', 'Éte'))
+        self.assertFalse(self.matches('\\p{Lu}', 'a'))
+        self.assertTrue(self.matches('\\P{N}', 'x'))
+        self.assertTrue(self.matches('\\p{IsGreek}+', 'αβ'))
+        self.assertTrue(self.matches('\\w+', 'a1$'))
+        self.assertFalse(self.matches('\\w', '.'))
+        with self.assertRaises(RuntimeError):
+            translate('\\p{IsNoSuchBlock}')
+        with self.assertRaises(RuntimeError):
+            translate('[ab')
+
+#-------------------------------------------------------------------------------
+
+class BuiltinsTest(unittest.TestCase):
+
+    def test_000_builtins(self):
+        valid = [('int', ' -12 '), ('unsignedByte', '255'), ('boolean', '1'),
+                 ('decimal', '.5'), ('double', '-INF'), ('NCName', 'a.b'),
+                 ('QName', 'x:y'), ('NMTOKENS', 'a  b'), ('language', 'en-GB'),
+                 ('date', '2024-02-29Z'), ('hexBinary', '0aFF'),
+                 ('base64Binary', 'QUJD'), ('string', ' x ')]
+        for name, value in valid:
+            self.assertIsNone(builtins[name].check(value), name)
+        invalid = [('int', '2147483648', 'cvc-maxInclusive-valid'),
+                   ('unsignedByte', '-1', 'cvc-minInclusive-valid'),
+                   ('integer', '1.5', 'cvc-pattern-valid'),
+                   ('boolean', 'yes', 'cvc-datatype-valid.1.2.1'),
+                   ('NCName', 'a:b', 'cvc-pattern-valid'),
+                   ('NMTOKENS', '', 'cvc-minLength-valid'),
+                   ('hexBinary', 'abc', 'cvc-datatype-valid.1.2.1')]
+        for name, value, code in invalid:
+            self.assertEqual(code, builtins[name].check(value)[0], name)
+
+#-------------------------------------------------------------------------------
+
+class FacetsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xsd = schema('''
+          <xs:simpleType name="Code">
+            <xs:restriction base="xs:token">
+              <xs:pattern value="[A-Z]{2}"/>
+              <xs:pattern value="[0-9]{3}"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="EuCode">
+            <xs:restriction base="Code">
+              <xs:enumeration value="FR"/>
+              <xs:enumeration value="DE"/>
+              <xs:enumeration value="250"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="Price">
+            <xs:restriction base="xs:decimal">
+              <xs:minExclusive value="0"/>
+              <xs:maxInclusive value="999.99"/>
+              <xs:totalDigits value="5"/>
+              <xs:fractionDigits value="2"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="Level">
+            <xs:restriction>
+              <xs:simpleType>
+                <xs:restriction base="xs:integer">
+                  <xs:minInclusive value="1"/>
+                </xs:restriction>
+              </xs:simpleType>
+              <xs:enumeration value="1"/>
+              <xs:enumeration value="02"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="Text">
+            <xs:restriction base="xs:string">
+              <xs:whiteSpace value="collapse"/>
+              <xs:length value="3"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="Codes">
+            <xs:list itemType="Code"/>
+          </xs:simpleType>
+          <xs:simpleType name="ShortCodes">
+            <xs:restriction base="Codes">
+              <xs:maxLength value="2"/>
+            </xs:restriction>
+          </xs:simpleType>
+          <xs:simpleType name="CodeOrLevel">
+            <xs:union memberTypes="Code Level"/>
+          </xs:simpleType>
+          <xs:complexType name="Amount">
+            <xs:simpleContent>
+              <xs:extension base="Price">
+                <xs:attribute name="currency" type="EuCode"/>
+              </xs:extension>
+            </xs:simpleContent>
+          </xs:complexType>
+          <xs:complexType name="SmallAmount">
+            <xs:simpleContent>
+              <xs:restriction base="Amount">
+                <xs:maxExclusive value="10"/>
+              </xs:restriction>
+            </xs:simpleContent>
+          </xs:complexType>''')
+        cls.c = FacetCompiler(cls.xsd)
+
+    def check(self, name, value):
+        err = self.c.named_type(q(name)).check(value)
+        return err[0] if err is not None else None
+
+    def test_000_patterns(self):
+        self.assertIsNone(self.check('Code', ' AB '))
+        self.assertIsNone(self.check('Code', '123'))
+        self.assertEqual('cvc-pattern-valid', self.check('Code', 'A1'))
+        # Both steps' patterns apply
+        self.assertIsNone(self.check('EuCode', '250'))
+        self.assertEqual('cvc-enumeration-valid', self.check('EuCode', 'IT'))
+        # Compiled once
+        code = self.c.named_type(q('Code'))
+        self.assertIs(code.patterns[0],
+                      self.c.named_type(q('EuCode')).patterns[0])
+
+    def test_001_numbers(self):
+        self.assertIsNone(self.check('Price', '999.99'))
+        self.assertIsNone(self.check('Price', '12.500'))
+        self.assertEqual('cvc-minExclusive-valid', self.check('Price', '0'))
+        self.assertEqual('cvc-maxInclusive-valid',
+                         self.check('Price', '1000'))
+        self.assertEqual('cvc-fractionDigits-valid',
+                         self.check('Price', '1.125'))
+        # The enumeration holds values, not lexical forms
+        self.assertIsNone(self.check('Level', '2'))
+        self.assertEqual('cvc-enumeration-valid', self.check('Level', '3'))
+
+    def test_002_whitespace_length(self):
+        self.assertIsNone(self.check('Text', '  a\n\tb '))
+        self.assertEqual('cvc-length-valid', self.check('Text', 'abcd'))
+
+    def test_003_list_union(self):
+        self.assertIsNone(self.check('Codes', 'AB 123\nCD'))
+        self.assertEqual('cvc-pattern-valid', self.check('Codes', 'AB x'))
+        self.assertEqual('cvc-maxLength-valid',
+                         self.check('ShortCodes', 'AB CD EF'))
+        self.assertIsNone(self.check('CodeOrLevel', '2'))
+        self.assertIsNone(self.check('CodeOrLevel', 'XY'))
+        self.assertEqual('cvc-datatype-valid.1.2.3',
+                         self.check('CodeOrLevel', 'x'))
+
+    def test_004_simple_content(self):
+        t = self.xsd.get_type('SmallAmount')
+        f = self.c.simple_content(t, self.xsd)
+        self.assertIsNone(f.check('9.5'))
+        self.assertEqual('cvc-maxExclusive-valid', f.check('10')[0])
+        self.assertEqual('cvc-fractionDigits-valid', f.check('1.125')[0])
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -14,7 +14,8 @@ import builtins
 import lxml.etree as et
 from lxml import objectify
 
-from x4b.tree import TreeSet
+import schema_cache
+from x4b.tree import TreeSet, PackedForest
 from xsd import SubstitutionGroups
 from schemax.pyclass.pyclass import PyArg
 from schemax.pyclass.pyclass_xsd import PyClassXsd, PyModuleXsd
@@ -382,12 +383,13 @@ class XMLSchema:
         self.sg_heads = self.sg.heads()
         self.sg_members = self.sg.members()
         
-        # Create the type derivations tree
-        self.t_deriv = self.derivations()
+        # Create the type derivations tree, in compact form (type names): it
+        # goes into the cache
+        self.t_deriv = PackedForest(self.derivations().pack())
         # print(self.t_deriv)
 
         # Missing types: classes without any derivations
-        derived_types = set(c.name for c in self.t_deriv.traverse())
+        derived_types = set(self.t_deriv.pre_order())
         all_types = set(self.types.keys())
         self.missing = all_types - derived_types
 
@@ -396,6 +398,16 @@ class XMLSchema:
         for name, elem in self.elems.items():
             self.map_classes[name] = elem.type_ 
 
+    def __getstate__(self):
+        # The lxml tree is only needed while building, don't cache it
+        d = self.__dict__.copy()
+        d['root'] = None
+        return d
+
+    def locations(self):
+        # Files this model was built from, see schema_cache.py
+        return [self.filepath]
+
     def dictify(self):
         return {
             'types': {k: v.dictify() for k, v in self.types.items()},
@@ -408,7 +420,7 @@ class XMLSchema:
     #---------------------------------------------------------------------------
     
     def derivations(self):
-        ts = TreeSet()
+        ts = TreeSet(key=lambda t: t.name)
         for nd in self.root:
             if tag(nd) == 'complexType':
                 type_name = nd.attrib['name']
@@ -435,8 +447,8 @@ class XMLSchema:
 
         # Get the class names top to bottom (from type derivations tree) to
         # avoid forward references to class declarations.
-        classes = [self.types[c.name].generate_class(self) \
-                   for c in self.t_deriv.traverse()]
+        classes = [self.types[c_name].generate_class(self) \
+                   for c_name in self.t_deriv.pre_order()]
 
         # Add the classes that have no derivations
         classes.extend([self.types[c_name].generate_class(self) \
@@ -457,6 +469,6 @@ if __name__ == '__main__':
         exit(-1)
     filepath = sys.argv[1]
 
-    xsd = XMLSchema(filepath)
+    xsd = schema_cache.load(filepath, XMLSchema, XMLSchema.locations)
     # print(xsd)
     xsd.gen_module()
@@ -0,0 +1,424 @@
+# identity.py - key, keyref and unique constraints in streaming validation
+
+"""\
+The selector and field XPath expressions of an identity constraint are
+compiled into Paths: a sequence of name tests, relative to the element that
+declares the constraint (the scope), maybe preceded by './/'. The XPath
+subset of XML Schema only goes down the tree, a Path is matched against the
+stack of the open elements when an element starts.
+
+While a document is validated, every open scope has a hash table per key or
+unique constraint: field values => where they were found (line and path of
+the element that has them, lexical values). The field values of an element
+selected by a keyref are kept until the end of its scope, where they're
+looked up in the tables of the key they refer to.
+The tables of a key are moved up to the enclosing scope when some keyref
+refers to that key. Field values moved up from two inner scopes are a
+conflict: they're kept with a None entry, no keyref can match them (the
+scope's own values take precedence). Memory use is proportional to the
+number of keys and keyrefs, not to the size of the document.
+
+Values are compared by value, see facets.Facets.key().
+
+"""
+
+import re
+import lxml.etree as et
+
+from parse_xsd import XsdUnique, XsdKey, XsdKeyref, XsdSelector, XsdField, \
+    xml_ns
+
+# Name test of a step: QName, prefix:* or *
+name_test_re = re.compile(r'(?:[^\W\d][\w.-]*:)?(?:[^\W\d][\w.-]*|\*)$')
+
+# Identity constraint class => kind
+kinds = {XsdUnique: 'unique', XsdKey: 'key', XsdKeyref: 'keyref'}
+
+#-------------------------------------------------------------------------------
+
+def local(qname):
+    return qname.rpartition('}')[2]
+
+class Path:
+    """A path of the XPath subset: name tests of the successive child
+    elements, each one a tag in Clark notation, '*' or '{namespace}*'.
+
+    deep: the path starts with './/', the steps may start at any depth
+    attribute: name test of the attribute at the end of a field path, or None
+
+    """
+    __slots__ = ('deep', 'steps', 'attribute')
+
+    def __init__(self, deep, steps, attribute=None):
+        self.deep = deep
+        self.steps = steps
+        self.attribute = attribute
+
+    def match(self, stack, depth):
+        """True if the path leads from stack[depth] to the element at the
+        top of the stack (a list of Frames).
+
+        """
+        n = len(stack) - 1 - depth
+        if n != len(self.steps) and not (self.deep and n > len(self.steps)):
+            return False
+        i = len(stack) - 1
+        for test in reversed(self.steps):
+            if not name_test(test, stack[i].tag):
+                return False
+            i -= 1
+        return True
+
+def name_test(test, name):
+    if test == name or test == '*':
+        return True
+    return test[-1] == '*' and name.startswith(test[:-1])
+
+def compile_xpath(xpath, sch, field):
+    """Compile the XPath expression of a selector, or of a field, found in
+    schema document 'sch'. Return a tuple of Paths, one per alternative.
+
+    """
+    paths = []
+    for alt in xpath.split('|'):
+        s = alt.strip()
+        deep = s.startswith('.//')
+        if deep:
+            s = s[3:]
+        steps = []
+        attribute = None
+        parts = [x.strip() for x in s.split('/')]
+        for i, part in enumerate(parts):
+            if part.startswith('child::'):
+                part = part[7:].strip()
+            elif part.startswith('attribute::'):
+                part = '@' + part[11:].strip()
+            if part == '.':
+                continue
+            last_attribute = part.startswith('@') and field and \
+                i == len(parts) - 1
+            name = part[1:].strip() if last_attribute else part
+            if not name_test_re.match(name):
+                m = f'Unsupported XPath expression "{xpath}"' \
+                    f' ({sch.schema_location})'
+                raise RuntimeError(m)
+            if last_attribute:
+                attribute = qname_test(name, sch, xpath)
+            else:
+                steps.append(qname_test(name, sch, xpath))
+        paths.append(Path(deep, tuple(steps), attribute))
+    return tuple(paths)
+
+def qname_test(name, sch, xpath):
+    """Return the name test for 'name', a QName, 'prefix:*' or '*'.
+    Unprefixed names are in no namespace, as in XPath 1.0.
+
+    """
+    if name == '*':
+        return name
+    prefix, _, local_name = name.rpartition(':')
+    if prefix == '':
+        return local_name
+    ns = xml_ns if prefix == 'xml' else sch.nsmap.get(prefix)
+    if ns is None:
+        m = f'Undeclared namespace prefix "{prefix}" in "{xpath}"' \
+            f' ({sch.schema_location})'
+        raise RuntimeError(m)
+    return f'{{{ns}}}*' if local_name == '*' else et.QName(ns, local_name).text
+
+#-------------------------------------------------------------------------------
+
+class Constraint:
+    """A compiled identity constraint.
+
+    kind: 'key', 'unique' or 'keyref'
+    name: expanded name of the constraint
+    selector: tuple of Paths
+    fields: tuple of tuples of Paths, one per field
+    refer: expanded name of the key or unique constraint (keyref)
+
+    """
+    __slots__ = ('kind', 'name', 'selector', 'fields', 'refer')
+
+    def __init__(self, kind, name, selector, fields, refer=None):
+        self.kind = kind
+        self.name = name
+        self.selector = selector
+        self.fields = fields
+        self.refer = refer
+
+class ConstraintCompiler:
+    """Compiles the identity constraints of element declarations, each one
+    once.
+
+    """
+    def __init__(self):
+        # XsdElement => tuple of Constraints
+        self.constraints = {}
+
+        # Names of the constraints that keyrefs refer to
+        self.referred = set()
+
+    def compile(self, decl, sch):
+        """Return the Constraints of element declaration 'decl', found in
+        schema document 'sch'.
+
+        """
+        if decl in self.constraints:
+            return self.constraints[decl]
+
+        cs = []
+        for k in decl.elems:
+            if type(k) not in kinds:
+                continue
+            selector = None
+            fields = []
+            for x in k.elems:
+                if type(x) == XsdSelector:
+                    selector = compile_xpath(x.xpath, sch, False)
+                elif type(x) == XsdField:
+                    fields.append(compile_xpath(x.xpath, sch, True))
+            name = et.QName(sch.namespace, k.name).text
+            if selector is None or len(fields) == 0:
+                m = f'Identity constraint "{k.name}" needs a selector and' \
+                    f' fields ({sch.schema_location})'
+                raise RuntimeError(m)
+            refer = None
+            if type(k) == XsdKeyref:
+                refer = sch.expand(k.refer)
+                self.referred.add(refer)
+            cs.append(Constraint(kinds[type(k)], name, selector,
+                                 tuple(fields), refer))
+
+        self.constraints[decl] = tuple(cs)
+        return self.constraints[decl]
+
+#-------------------------------------------------------------------------------
+
+class Scope:
+    """An open element that declares identity constraints.
+
+    tables: constraint name => {field values => (line, path, lexical
+        values)}, for keys and unique constraints, including the tables moved
+        up from the inner scopes (None: values found in two of them)
+    inherited: constraint name => set of the field values in its table that
+        were moved up from the inner scopes
+    refs: (Constraint, field values, lexical values, line, path) of the
+        elements selected by keyrefs
+
+    """
+    __slots__ = ('depth', 'constraints', 'tables', 'inherited', 'refs')
+
+    def __init__(self, depth, constraints):
+        self.depth = depth
+        self.constraints = constraints
+        self.tables = {}
+        self.inherited = {}
+        self.refs = []
+
+class Target:
+    """An open element selected by a constraint, its field values.
+
+    values: for each field, the value, None if not found yet
+    counts: for each field, the number of nodes it matched
+
+    """
+    __slots__ = ('constraint', 'scope', 'depth', 'line', 'path', 'values',
+                 'lexicals', 'counts')
+
+    def __init__(self, constraint, scope, depth, line, path):
+        self.constraint = constraint
+        self.scope = scope
+        self.depth = depth
+        self.line = line
+        self.path = path
+        n = len(constraint.fields)
+        self.values = [None]*n
+        self.lexicals = [None]*n
+        self.counts = [0]*n
+
+    def set(self, i, facets, lexical):
+        self.counts[i] += 1
+        self.values[i] = facets.key(lexical) if facets is not None \
+            else ('string', lexical)
+        self.lexicals[i] = lexical
+
+#-------------------------------------------------------------------------------
+
+class IdentityState:
+    """The identity constraints of the document being validated. The
+    validator calls start() and end() for each element, while the element is
+    at the top of its stack of Frames.
+
+    """
+    def __init__(self, compiler, error):
+        self.compiler = compiler
+
+        # Makes the errors: (line, path, message, code) => ValidationError
+        self.error = error
+
+        self.scopes = []
+        self.targets = []
+
+        # Depth => (Target, field index) of the element fields waiting for
+        # the text of the element open at that depth
+        self.pending = {}
+
+    def path(self, stack):
+        return '/' + '/'.join(local(f.tag) for f in stack)
+
+    def start(self, elem, stack, errors):
+        depth = len(stack) - 1
+        frame = stack[-1]
+
+        # A new scope, its selectors may select the element itself
+        if len(frame.etype.constraints) > 0:
+            self.scopes.append(Scope(depth, frame.etype.constraints))
+
+        # New targets, selected from the open scopes
+        for scope in self.scopes:
+            for c in scope.constraints:
+                if any(p.match(stack, scope.depth) for p in c.selector):
+                    self.targets.append(Target(c, scope, depth,
+                                               elem.sourceline,
+                                               self.path(stack)))
+
+        # This element may hold fields of the open targets
+        for t in self.targets:
+            for i, paths in enumerate(t.constraint.fields):
+                for p in paths:
+                    if not p.match(stack, t.depth):
+                        continue
+                    if p.attribute is None:
+                        self.pending.setdefault(depth, []).append((t, i))
+                        continue
+                    for name, value in elem.attrib.items():
+                        if name_test(p.attribute, name):
+                            a = frame.etype.attributes.get(name)
+                            t.set(i, a[2] if a is not None else None, value)
+
+    def end(self, elem, stack, text, errors):
+        """The element at the top of the stack ends, 'text' is its text
+        content (None if there's none).
+
+        """
+        depth = len(stack) - 1
+        frame = stack[-1]
+
+        # Element fields
+        for t, i in self.pending.pop(depth, []):
+            if frame.nil or len(elem) > 0:
+                # Not a value: counted, but no value
+                t.counts[i] += 1
+                continue
+            value = text if text is not None else ''
+            if value == '' and frame.etype.default is not None:
+                value = frame.etype.default
+            t.set(i, frame.etype.facets, value)
+
+        # Complete targets
+        while len(self.targets) > 0 and self.targets[-1].depth == depth:
+            self.complete(self.targets.pop(), errors)
+
+        # Close the scope
+        if len(self.scopes) > 0 and self.scopes[-1].depth == depth:
+            self.close(self.scopes.pop(), errors)
+
+    def complete(self, t, errors):
+        c = t.constraint
+        for i, n in enumerate(t.counts):
+            if n > 1:
+                m = f'Field {i + 1} of "{local(c.name)}" matches more than' \
+                    ' one node'
+                errors.append(self.error(t.line, t.path, m,
+                                         'cvc-identity-constraint.3'))
+                return
+        if None in t.values:
+            if c.kind == 'key':
+                m = f'Missing field value for key "{local(c.name)}"'
+                errors.append(self.error(t.line, t.path, m,
+                                         'cvc-identity-constraint.4.2.1'))
+            return
+
+        values = tuple(t.values)
+        lexicals = ', '.join(t.lexicals)
+        if c.kind == 'keyref':
+            t.scope.refs.append((c, values, lexicals, t.line, t.path))
+            return
+        self.add(t.scope, c, values, (t.line, t.path, lexicals), errors)
+
+    def add(self, scope, c, values, entry, errors):
+        """Add the values of key or unique constraint 'c' to its table in
+        'scope', unless they're found there already. They replace values
+        moved up from an inner scope.
+
+        """
+        table = scope.tables.setdefault(c.name, {})
+        inherited = scope.inherited.get(c.name, ())
+        if values in inherited:
+            inherited.discard(values)
+            table[values] = entry
+        elif values in table:
+            line, path, lexicals = entry
+            code = 'cvc-identity-constraint.4.2.2' if c.kind == 'key' \
+                else 'cvc-identity-constraint.4.1'
+            m = f'Duplicate value ({lexicals}) for {c.kind}' \
+                f' "{local(c.name)}", first found at line {table[values][0]}'
+            errors.append(self.error(line, path, m, code))
+        else:
+            table[values] = entry
+
+    def inherit(self, scope, name, values, entry):
+        """Add to 'scope' values of the table of constraint 'name' in an
+        inner scope (entry None: a conflict there already).
+
+        """
+        table = scope.tables.setdefault(name, {})
+        inherited = scope.inherited.setdefault(name, set())
+        if values not in table:
+            table[values] = entry
+            inherited.add(values)
+        elif values in inherited:
+            # Found in another inner scope
+            table[values] = None
+
+    def merge(self, scope, tables, refs, errors):
+        """Add to 'scope' the tables and keyref values found in a part of its
+        content that was validated apart (see validate_parallel.py). refs
+        name the keyrefs instead of holding their Constraints.
+
+        """
+        own = {c.name: c for c in scope.constraints}
+        for name, table in tables.items():
+            c = own.get(name)
+            for values, entry in table.items():
+                if c is None:
+                    # Moved up from an inner scope
+                    self.inherit(scope, name, values, entry)
+                else:
+                    self.add(scope, c, values, entry, errors)
+        for name, values, lexicals, line, path in refs:
+            scope.refs.append((own[name], values, lexicals, line, path))
+
+    def close(self, scope, errors):
+        for c, values, lexicals, line, path in scope.refs:
+            table = scope.tables.get(c.refer, {})
+            if values not in table:
+                m = f'No match for ({lexicals}) of keyref "{local(c.name)}"' \
+                    f' in "{local(c.refer)}"'
+            elif table[values] is None:
+                m = f'More than one match for ({lexicals}) of keyref' \
+                    f' "{local(c.name)}" in "{local(c.refer)}"'
+            else:
+                continue
+            errors.append(self.error(line, path, m,
+                                     'cvc-identity-constraint.4.3'))
+
+        # Move up the tables that keyrefs refer to
+        if len(self.scopes) > 0:
+            outer = self.scopes[-1]
+            for name, table in scope.tables.items():
+                if name not in self.compiler.referred:
+                    continue
+                for values, entry in table.items():
+                    self.inherit(outer, name, values, entry)
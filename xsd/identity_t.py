@@ -0,0 +1,198 @@
+# identity_t.py
+
+import io
+import unittest
+from identity import compile_xpath
+from validator import Validator
+from schema_t_util import tns, schema, q
+
+#-------------------------------------------------------------------------------
+
+class XPathTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sch = schema('', prefix=True)
+
+    def test_000_selector(self):
+        paths = compile_xpath('.//t:a/t:b | child::t:c | t:*', self.sch,
+                              False)
+        self.assertEqual([(True, (q('a'), q('b'))), (False, (q('c'),)),
+                          (False, (f'{{{tns}}}*',))],
+                         [(p.deep, p.steps) for p in paths])
+        # Unprefixed names are in no namespace
+        self.assertEqual(('a',), compile_xpath('a', self.sch, False)[0].steps)
+
+    def test_001_field(self):
+        p = compile_xpath('t:a/@id', self.sch, True)[0]
+        self.assertEqual(((q('a'),), 'id'), (p.steps, p.attribute))
+        p = compile_xpath('./attribute::xml:lang', self.sch, True)[0]
+        self.assertEqual(((), '{http://www.w3.org/XML/1998/namespace}lang'),
+                         (p.steps, p.attribute))
+
+    def test_002_errors(self):
+        for xpath, field in [('@id', False), ('x:a', False),
+                             ('a/@id/b', True), ('a[1]', False)]:
+            with self.assertRaises(RuntimeError, msg=xpath):
+                compile_xpath(xpath, self.sch, field)
+
+#-------------------------------------------------------------------------------
+
+class IdentityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.v = Validator(schema('''
+          <xs:element name="library">
+            <xs:complexType><xs:sequence>
+              <xs:element name="book" maxOccurs="unbounded">
+                <xs:complexType>
+                  <xs:sequence>
+                    <xs:element name="isbn" type="xs:string" minOccurs="0"/>
+                    <xs:element name="title" type="xs:string"/>
+                  </xs:sequence>
+                  <xs:attribute name="id" type="xs:int"/>
+                </xs:complexType>
+              </xs:element>
+              <xs:element name="loan" minOccurs="0" maxOccurs="unbounded">
+                <xs:complexType>
+                  <xs:attribute name="book" type="xs:int"/>
+                </xs:complexType>
+              </xs:element>
+            </xs:sequence></xs:complexType>
+            <xs:key name="bookId">
+              <xs:selector xpath="t:book"/>
+              <xs:field xpath="@id"/>
+            </xs:key>
+            <xs:unique name="isbn">
+              <xs:selector xpath=".//t:book"/>
+              <xs:field xpath="t:isbn"/>
+            </xs:unique>
+            <xs:keyref name="loanBook" refer="t:bookId">
+              <xs:selector xpath="t:loan"/>
+              <xs:field xpath="@book"/>
+            </xs:keyref>
+          </xs:element>''', prefix=True))
+
+    def errors(self, doc):
+        doc = f'<library xmlns="{tns}">\n{doc}\n</library>'
+        return self.v.validate(io.BytesIO(doc.encode()))
+
+    def test_000_valid(self):
+        errs = self.errors('<book id="1"><isbn>x</isbn><title/></book>\n'
+                           '<book id="2"><title/></book>\n'
+                           '<book id="3"><title/></book>\n'
+                           '<loan book="1"/>\n<loan book=" 02"/>')
+        self.assertEqual([], [str(e) for e in errs])
+
+    def test_001_key(self):
+        errs = self.errors('<book id="1"><title/></book>\n'
+                           '<book id="01"><title/></book>\n'
+                           '<book><title/></book>')
+        self.assertEqual([(3, 'cvc-identity-constraint.4.2.2'),
+                          (4, 'cvc-identity-constraint.4.2.1')],
+                         [(e.line, e.code) for e in errs])
+        self.assertIn('first found at line 2', errs[0].message)
+
+    def test_002_unique(self):
+        # Missing isbn: not checked
+        errs = self.errors('<book id="1"><isbn>x</isbn><title/></book>\n'
+                           '<book id="2"><title/></book>\n'
+                           '<book id="3"><isbn>x</isbn><title/></book>')
+        self.assertEqual([(4, 'cvc-identity-constraint.4.1')],
+                         [(e.line, e.code) for e in errs])
+
+    def test_003_keyref(self):
+        errs = self.errors('<book id="1"><title/></book>\n'
+                           '<loan book="2"/>')
+        self.assertEqual([(3, 'cvc-identity-constraint.4.3',
+                           '/library/loan')],
+                         [(e.line, e.code, e.path) for e in errs])
+
+#-------------------------------------------------------------------------------
+
+class ScopeTest(unittest.TestCase):
+
+    def test_000_nested(self):
+        # Keys of the inner scopes are visible to the keyref of the outer one
+        v = Validator(schema('''
+          <xs:element name="db">
+            <xs:complexType><xs:sequence>
+              <xs:element name="table" maxOccurs="unbounded">
+                <xs:complexType><xs:sequence>
+                  <xs:element name="row" maxOccurs="unbounded">
+                    <xs:complexType>
+                      <xs:attribute name="id" type="xs:string"/>
+                    </xs:complexType>
+                  </xs:element>
+                </xs:sequence></xs:complexType>
+                <xs:key name="rowId">
+                  <xs:selector xpath="t:row"/>
+                  <xs:field xpath="@id"/>
+                </xs:key>
+              </xs:element>
+              <xs:element name="ref" type="xs:string" minOccurs="0"
+                          maxOccurs="unbounded"/>
+            </xs:sequence></xs:complexType>
+            <xs:keyref name="refRow" refer="t:rowId">
+              <xs:selector xpath="t:ref"/>
+              <xs:field xpath="."/>
+            </xs:keyref>
+          </xs:element>''', prefix=True))
+        doc = f'<db xmlns="{tns}">\n' \
+            '<table><row id="a"/><row id="b"/></table>\n' \
+            '<table><row id="a"/><row id="c"/></table>\n' \
+            '<ref>c</ref>\n<ref>d</ref>\n</db>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual([(5, 'cvc-identity-constraint.4.3')],
+                         [(e.line, e.code) for e in errs])
+        # Duplicates within one table
+        doc = f'<db xmlns="{tns}"><table><row id="a"/><row id="a"/></table>' \
+            '</db>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual(['cvc-identity-constraint.4.2.2'],
+                         [e.code for e in errs])
+
+    def test_001_conflict(self):
+        # The same key in two inner scopes: no keyref can match it
+        v = Validator(schema('''
+          <xs:element name="r">
+            <xs:complexType><xs:sequence>
+              <xs:element name="g" maxOccurs="unbounded">
+                <xs:complexType><xs:sequence>
+                  <xs:element name="i" maxOccurs="unbounded">
+                    <xs:complexType><xs:sequence>
+                      <xs:element name="k" type="xs:string"/>
+                    </xs:sequence></xs:complexType>
+                  </xs:element>
+                </xs:sequence></xs:complexType>
+                <xs:key name="K">
+                  <xs:selector xpath="t:i"/>
+                  <xs:field xpath="t:k"/>
+                </xs:key>
+              </xs:element>
+              <xs:element name="ref" minOccurs="0" maxOccurs="unbounded">
+                <xs:complexType>
+                  <xs:attribute name="to" type="xs:string"/>
+                </xs:complexType>
+              </xs:element>
+            </xs:sequence></xs:complexType>
+            <xs:keyref name="R" refer="t:K">
+              <xs:selector xpath="t:ref"/>
+              <xs:field xpath="@to"/>
+            </xs:keyref>
+          </xs:element>''', prefix=True))
+        doc = f'<r xmlns="{tns}">\n' \
+            '<g><i><k>1</k></i><i><k>2</k></i></g>\n' \
+            '<g><i><k>1</k></i></g>\n' \
+            '<g><i><k>1</k></i></g>\n' \
+            '<ref to="1"/>\n<ref to="2"/>\n</r>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual([(5, 'cvc-identity-constraint.4.3')],
+                         [(e.line, e.code) for e in errs])
+        self.assertIn('More than one match for (1)', errs[0].message)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
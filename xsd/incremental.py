@@ -0,0 +1,296 @@
+# incremental.py - revalidate an edited document, only where it changed
+
+"""\
+An editor keeps a document in memory, as an lxml tree, and revalidates it
+after every change. Validating the whole document again costs a full pass,
+the IncrementalValidator keeps what validating each element found instead:
+its ElementType, whether it's nil, its child elements, and its own errors
+(attributes, text, content model of its children). After an edit, only the
+modified subtrees are validated again, and the content models of their
+parents rerun over their children: a sibling that the content model now
+matches differently (its type changes) is validated again too. The elements
+above the parents don't need anything, their children haven't changed.
+
+Identity constraints are checked per scope: each outermost element that
+declares key, keyref or unique constraints keeps the errors found in its
+subtree, only the scopes that contain a modified subtree are checked again.
+
+    iv = IncrementalValidator(validator, tree)
+    errors = iv.validate()
+    ... edit the tree ...
+    errors = iv.revalidate([task])
+
+The modified elements are those whose attributes, text or children changed:
+when a child element is inserted or removed, that's its parent. The checks
+are those of the streaming validator (see validator.py), the tree itself is
+left untouched, except for the xs:ID and IDREF checks: an edit anywhere can
+make them fail or pass anywhere else, they aren't done here.
+
+"""
+
+import sys
+import time
+import lxml.etree as et
+
+from validator import Validator, ValidationError, Frame
+from identity import IdentityState
+from parse_xsd import load_schema
+
+#-------------------------------------------------------------------------------
+
+class Entry:
+    """What validating an element found.
+
+    errors: the errors of the element itself, and of its children against its
+        content model
+    children: the child elements, when it was validated
+
+    """
+    __slots__ = ('etype', 'nil', 'errors', 'children')
+
+    def __init__(self, etype, nil, errors, children):
+        self.etype = etype
+        self.nil = nil
+        self.errors = errors
+        self.children = children
+
+#-------------------------------------------------------------------------------
+
+class IncrementalValidator:
+    """Validates an lxml tree against the schema of 'validator', keeps the
+    results per element to revalidate the parts that change.
+
+    """
+    def __init__(self, validator, tree):
+        self.validator = validator
+        self.root = tree.getroot() if hasattr(tree, 'getroot') else tree
+
+        # Element => Entry, for the elements that were validated
+        self.entries = {}
+
+        # Elements whose Entry has errors
+        self.invalid = set()
+
+        # The errors about the root element itself (not declared)
+        self.root_errors = []
+
+        # Elements that declare identity constraints => errors found in their
+        # subtree, for the outermost ones
+        self.scopes = {}
+
+        # Elements validated by the current pass
+        self.checked = set()
+
+    #---------------------------------------------------------------------------
+
+    def validate(self):
+        """Validate the whole document, return the list of its errors."""
+        self.entries = {}
+        self.invalid = set()
+        self.scopes = {}
+        self.checked = set()
+        self.root_errors = []
+        etype = self.validator.root(self.root, self.root_errors)
+        if etype is not None:
+            self.check(self.root, etype, [], True, set())
+        self.check_scopes([self.root])
+        return self.errors()
+
+    def revalidate(self, modified):
+        """The subtrees rooted at the 'modified' elements have changed,
+        validate them and their parents' content, return the list of the
+        errors of the whole document.
+
+        """
+        modified = set(modified)
+        if self.root in modified:
+            return self.validate()
+
+        # The parents whose content must be checked again, outermost first
+        self.checked = set()
+        parents = {}
+        for elem in modified:
+            p = elem.getparent()
+            if p is not None and p not in parents and p in self.entries:
+                parents[p] = self.depth(p)
+        for p in sorted(parents, key=lambda x: parents[x]):
+            if any(a in self.checked for a in p.iterancestors()):
+                # Inside a subtree validated already
+                continue
+            self.check(p, self.entries[p].etype, self.frames(p), False,
+                       modified)
+        self.check_scopes(modified)
+        return self.errors()
+
+    def errors(self):
+        """Return the errors of the document, element by element in
+        document order, then those of the identity constraints.
+
+        """
+        arr = list(self.root_errors)
+        if len(self.invalid) > 0:
+            for elem in self.root.iter(tag=et.Element):
+                if elem in self.invalid:
+                    arr.extend(self.entries[elem].errors)
+        for errors in self.scopes.values():
+            arr.extend(errors)
+        return arr
+
+    #---------------------------------------------------------------------------
+
+    def depth(self, elem):
+        return sum(1 for _ in elem.iterancestors())
+
+    def frames(self, elem):
+        """Return the Frames of the ancestors of 'elem', root first."""
+        arr = []
+        for a in elem.iterancestors():
+            entry = self.entries[a]
+            arr.append(Frame(a.tag, a.sourceline, entry.etype, None,
+                             entry.nil))
+        arr.reverse()
+        return arr
+
+    def drop(self, elem):
+        """Forget what was found in the subtree of 'elem'."""
+        stack = [elem]
+        while len(stack) > 0:
+            elem = stack.pop()
+            entry = self.entries.pop(elem, None)
+            if entry is not None:
+                self.invalid.discard(elem)
+                stack.extend(entry.children)
+
+    def check(self, elem, etype, stack, deep, modified):
+        """Validate 'elem', of type 'etype', below the Frames of its
+        ancestors. deep: validate its whole subtree, else only the children
+        that were modified or whose type changed.
+
+        """
+        v = self.validator
+        old = self.entries.get(elem)
+        self.checked.add(elem)
+        errors = []
+        frame = v.start(elem, etype, stack, errors)
+        stack.append(frame)
+
+        children = []
+        text = elem.text
+        for k in elem:
+            if not isinstance(k.tag, str):
+                # Comment or processing instruction, the text goes on
+                if k.tail is not None:
+                    text = k.tail if text is None else text + k.tail
+                continue
+            v.check_between(text, frame, errors, stack)
+            text = k.tail
+            children.append(k)
+            ktype = v.child(k, stack, errors)
+            entry = self.entries.get(k)
+            if ktype is None:
+                self.drop(k)
+            elif deep or k in modified or entry is None or \
+                 entry.etype is not ktype:
+                self.drop(k)
+                self.check(k, ktype, stack, True, modified)
+        v.finish(text, len(children) == 0, stack, errors)
+        stack.pop()
+
+        # Children that were removed
+        if old is not None:
+            kept = set(children)
+            for k in old.children:
+                if k not in kept:
+                    self.drop(k)
+        self.entries[elem] = Entry(etype, frame.nil, errors, children)
+        if len(errors) > 0:
+            self.invalid.add(elem)
+        else:
+            self.invalid.discard(elem)
+
+    #---------------------------------------------------------------------------
+    # Identity constraints
+
+    def outermost_scopes(self):
+        """Return the outermost elements that declare identity constraints,
+        among those that were validated.
+
+        """
+        arr = []
+        it = et.iterwalk(self.root, events=('start',))
+        for _, elem in it:
+            entry = self.entries.get(elem)
+            if entry is None:
+                it.skip_subtree()
+            elif len(entry.etype.constraints) > 0:
+                arr.append(elem)
+                it.skip_subtree()
+        return arr
+
+    def check_scopes(self, modified):
+        """Check the identity constraints of the scopes that contain, or are
+        inside, the modified elements.
+
+        """
+        if not any(len(c) > 0
+                   for c in self.validator.constraints.constraints.values()):
+            self.scopes = {}
+            return
+        marks = set(self.checked)
+        for elem in modified:
+            marks.add(elem)
+            marks.update(elem.iterancestors())
+        scopes = {}
+        for s in self.outermost_scopes():
+            if s in marks or s not in self.scopes:
+                scopes[s] = self.check_identity(s)
+            else:
+                scopes[s] = self.scopes[s]
+        self.scopes = scopes
+
+    def check_identity(self, scope):
+        """Return the identity constraint errors found in the subtree of
+        'scope'.
+
+        """
+        state = IdentityState(self.validator.constraints, ValidationError)
+        errors = []
+        stack = self.frames(scope)
+        it = et.iterwalk(scope, events=('start', 'end'))
+        for event, elem in it:
+            entry = self.entries.get(elem)
+            if entry is None:
+                # Not validated, neither is its subtree
+                if event == 'start':
+                    it.skip_subtree()
+                continue
+            if event == 'start':
+                stack.append(Frame(elem.tag, elem.sourceline, entry.etype,
+                                   None, entry.nil))
+                state.start(elem, stack, errors)
+            else:
+                text = elem.text if len(entry.children) == 0 else None
+                state.end(elem, stack, text, errors)
+                stack.pop()
+        return errors
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line arguments
+    if len(sys.argv) != 3:
+        print(f'Usage: {sys.argv[0]} <xsd filepath> <xml filepath>')
+        exit(-1)
+    xsd_filepath = sys.argv[1]
+    xml_filepath = sys.argv[2]
+
+    v = Validator(load_schema(xsd_filepath))
+    tree = et.parse(xml_filepath)
+    t0 = time.perf_counter()
+    errors = IncrementalValidator(v, tree).validate()
+    for err in errors:
+        print(err)
+    n = len(errors)
+    print(f'{xml_filepath}: {"valid" if n == 0 else f"{n} error(s)"}'
+          f' ({time.perf_counter() - t0:.3f}s)')
+    exit(0 if n == 0 else 1)
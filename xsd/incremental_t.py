@@ -0,0 +1,122 @@
+# incremental_t.py
+
+import unittest
+import lxml.etree as et
+from parse_xsd import build_schema
+from validator import Validator
+from incremental import IncrementalValidator
+from schema_t_util import tns, schema, q
+
+def codes(errors):
+    return [e.code for e in errors]
+
+#-------------------------------------------------------------------------------
+
+class IncrementalTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.v = Validator(schema('''
+          <xs:element name="list">
+            <xs:complexType><xs:sequence>
+              <xs:element name="a" type="xs:int"/>
+              <xs:element name="a" type="xs:string" minOccurs="0"/>
+              <xs:element name="b" maxOccurs="unbounded">
+                <xs:complexType>
+                  <xs:attribute name="id" type="xs:int"/>
+                </xs:complexType>
+              </xs:element>
+            </xs:sequence></xs:complexType>
+            <xs:key name="bId">
+              <xs:selector xpath="t:b"/>
+              <xs:field xpath="@id"/>
+            </xs:key>
+          </xs:element>''', prefix=True))
+
+    def tree(self):
+        doc = f'<list xmlns="{tns}">\n<a>x</a>\n<b id="1"/>\n<b id="2"/>\n' \
+            '</list>'
+        return et.ElementTree(et.fromstring(doc))
+
+    def full(self, tree):
+        return codes(IncrementalValidator(self.v, tree).validate())
+
+    def test_000_attribute(self):
+        tree = self.tree()
+        iv = IncrementalValidator(self.v, tree)
+        self.assertEqual(['cvc-datatype-valid.1.2.1'], codes(iv.validate()))
+        b = tree.getroot()[1]
+        b.set('id', 'many')
+        errs = iv.revalidate([b])
+        self.assertEqual(['cvc-datatype-valid.1.2.1']*2, codes(errs))
+        self.assertEqual(self.full(tree), codes(errs))
+        b.set('id', '3')
+        tree.getroot()[0].text = '7'
+        self.assertEqual([], codes(iv.revalidate([b, tree.getroot()[0]])))
+
+    def test_001_sibling_type(self):
+        # Inserting an "a" makes the existing one the second, a string
+        tree = self.tree()
+        iv = IncrementalValidator(self.v, tree)
+        iv.validate()
+        a = et.Element(q('a'))
+        a.text = '1'
+        tree.getroot().insert(0, a)
+        self.assertEqual([], codes(iv.revalidate([a])))
+        # Removing it again: the parent was modified
+        tree.getroot().remove(a)
+        errs = iv.revalidate([tree.getroot()])
+        self.assertEqual(['cvc-datatype-valid.1.2.1'], codes(errs))
+        self.assertNotIn(a, iv.entries)
+
+    def test_002_content_model(self):
+        tree = self.tree()
+        iv = IncrementalValidator(self.v, tree)
+        iv.validate()
+        root = tree.getroot()
+        c = et.SubElement(root, q('c'))
+        errs = iv.revalidate([c])
+        # The errors of the parent first
+        self.assertEqual(['cvc-complex-type.2.4.a', 'cvc-datatype-valid.1.2.1'],
+                         codes(errs))
+        self.assertEqual(self.full(tree), codes(errs))
+        root.remove(c)
+        for b in root.findall(q('b')):
+            root.remove(b)
+        errs = iv.revalidate([root])
+        self.assertEqual(['cvc-complex-type.2.4.b', 'cvc-datatype-valid.1.2.1'],
+                         codes(errs))
+
+    def test_003_identity(self):
+        tree = self.tree()
+        iv = IncrementalValidator(self.v, tree)
+        iv.validate()
+        b = tree.getroot()[2]
+        b.set('id', '01')
+        errs = iv.revalidate([b])
+        self.assertEqual(['cvc-datatype-valid.1.2.1',
+                          'cvc-identity-constraint.4.2.2'], codes(errs))
+        self.assertEqual(self.full(tree), codes(errs))
+        del b.attrib['id']
+        self.assertEqual(['cvc-datatype-valid.1.2.1',
+                          'cvc-identity-constraint.4.2.1'],
+                         codes(iv.revalidate([b])))
+
+    def test_004_bpmn(self):
+        v = Validator(build_schema('samples/bpmn/xsd/BPMN20.xsd'))
+        tree = et.parse('samples/bpmn/xml/EmailVoting2.bpmn')
+        iv = IncrementalValidator(v, tree)
+        self.assertEqual([], iv.validate())
+        ns = '{http://www.omg.org/spec/BPMN/20100524/MODEL}'
+        task = next(tree.getroot().iter(f'{ns}task'))
+        task.set('bogus', '1')
+        errs = iv.revalidate([task])
+        self.assertEqual([(task.sourceline, 'cvc-complex-type.3.2.2')],
+                         [(e.line, e.code) for e in errs])
+        del task.attrib['bogus']
+        self.assertEqual([], iv.revalidate([task]))
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -2,18 +2,75 @@
 
 import os
 import sys
+import io
 import json
-import requests
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import lxml.etree as et
 from lxml import objectify
 
+import catalog
+import schema_cache
+from catalog import is_url
+
 lbl_sz = 12
 
+# Namespace bound to the 'xml:' prefix by definition, it never appears in an
+# nsmap.
+xml_ns = 'http://www.w3.org/XML/1998/namespace'
+
+xsd_ns = 'http://www.w3.org/2001/XMLSchema'
+
+# How xs:annotation elements are loaded, see SchemaLoader
+annotation_modes = ['full', 'lines', 'skip']
+
 #-------------------------------------------------------------------------------
 
 def tag(nd):
     return et.QName(nd).localname
 
+def get_attr(nd, name):
+    """Return the value of attribute 'name', or None. The values are interned,
+    schemas repeat the same type names, refs and facet values a lot.
+
+    """
+    value = nd.get(name)
+    return sys.intern(value) if value is not None else None
+
+def xs(name):
+    """Return the tag of an XML Schema element, in Clark notation."""
+    return f'{{{xsd_ns}}}{name}'
+
+def elems_tuple(elems):
+    """Return the sub-elements of a component as a tuple. Most components
+    have none: they all share the empty tuple, instead of one list each.
+
+    """
+    return tuple(elems) if elems else ()
+
+def dispatch(**kwargs):
+    """Return a dispatch table: tag (in Clark notation) => Xsd* class."""
+    return {xs(k): v for k, v in kwargs.items()}
+
+def build_elems(cls, nd, what):
+    """Build the sub-elements of 'nd', using cls.children to find the class
+    that handles each tag (one dict lookup per child). 'what' names the
+    parent element in error messages.
+
+    """
+    elems = []
+    for k in nd:
+        if k.tag not in cls.children:
+            m = f'Unexpected tag "{tag(k)}" inside an xs:{what}'
+            raise RuntimeError(m)
+        klass = cls.children[k.tag]
+        if klass is None:
+            m = f'Support for tag "{tag(k)}" not implemented'
+            print(m, file=sys.stderr)
+            continue
+        elems.append(klass.build(k))
+    return elems
+
 #-------------------------------------------------------------------------------
 
 class XsdAppinfo:
@@ -23,6 +80,8 @@ class XsdAppinfo:
     Content: ({any})*
 
     """
+    __slots__ = ('source', 'content')
+
     def __init__(self, source=None, content=None):
         self.source = source
         self.content = content
@@ -30,14 +89,14 @@ class XsdAppinfo:
     @classmethod
     def build(cls, nd):
         # Attributes
-        source = nd.attrib['source'] if 'source' in nd.attrib else None
+        source = get_attr(nd, 'source')
         
         # Sub-elements
-        content = nd.text.strip()
+        content = nd.text.strip() if nd.text is not None else None
 
         return cls(source, content)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.source is not None:
@@ -55,6 +114,8 @@ class XsdDocumentation:
     Content: ({any})*
 
     """
+    __slots__ = ('source', 'lang', 'content')
+
     def __init__(self, source=None, lang=None, content=None):
         self.source = source
         self.lang = lang
@@ -63,15 +124,15 @@ class XsdDocumentation:
     @classmethod
     def build(cls, nd):
         # Attributes
-        source = nd.attrib['source'] if 'source' in nd.attrib else None
-        lang = nd.attrib['lang'] if 'lang' in nd.attrib else None
+        source = get_attr(nd, 'source')
+        lang = get_attr(nd, 'lang')
         
         # Sub-elements
-        content = nd.text.strip()
+        content = nd.text.strip() if nd.text is not None else None
 
         return cls(source, lang, content)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.source is not None:
@@ -88,36 +149,42 @@ class XsdAnnotation:
     """Defines an annotation.
 
     Content: (appinfo | documentation)*
+
+    line is the annotation's line number in its schema document. When the
+    schema is loaded in 'lines' mode, the appinfo and documentation elements
+    are not loaded, see XMLSchema.load_annotation().
+
     """
-    def __init__(self, id_=None, elems=None):
+    __slots__ = ('id_', 'elems', 'line')
+
+    def __init__(self, id_=None, elems=None, line=None):
         self.id_ = id_
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
+
+        self.line = line
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
         
-        # Sub-elements
+        # Sub-elements, other tags are ignored
         elems = []
         for k in nd:
-            if tag(k) == 'appinfo':
-                elems.append(XsdAppinfo.build(k))
-            elif tag(k) == 'documentation':
-                elems.append(XsdDocumentation.build(k))
+            klass = cls.children.get(k.tag)
+            if klass is not None:
+                elems.append(klass.build(k))
 
-        return cls(id_, elems)
+        return cls(id_, elems, nd.sourceline)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
             d['id'] = self.id_
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -129,34 +196,26 @@ class XsdList:
     Content: (annotation?, (simpleType?))
 
     """
+    __slots__ = ('id_', 'itemType', 'elems')
+
     def __init__(self, id_=None, itemType=None, elems=None):
         self.id_ = id_
         self.itemType = itemType
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        itemType = nd.attrib['itemType'] if 'itemType' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        itemType = get_attr(nd, 'itemType')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'simpleType':
-                elems.append(XsdSimpleType.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:list'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'list')
 
         return cls(id_=id_, itemType=itemType, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -164,7 +223,7 @@ class XsdList:
         if self.itemType is not None:
             d['itemType'] = self.itemType
          # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -176,32 +235,26 @@ class XsdPattern:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'elems')
+
     def __init__(self, id_=None, value=None, elems=None):
         self.id_ = id_
         self.value = value
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:pattern'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'pattern')
 
         return cls(id_=id_, value=value, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -209,7 +262,7 @@ class XsdPattern:
         if self.value is not None:
             d['value'] = self.value           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -221,32 +274,26 @@ class XsdEnumeration:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'elems')
+
     def __init__(self, id_=None, value=None, elems=None):
         self.id_ = id_
         self.value = value
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:enumeration'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'enumeration')
 
         return cls(id_=id_, value=value, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -254,7 +301,7 @@ class XsdEnumeration:
         if self.value is not None:
             d['value'] = self.value           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -266,34 +313,28 @@ class XsdMaxExclusive:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:maxExclusive'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'maxExclusive')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -303,7 +344,7 @@ class XsdMaxExclusive:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -315,34 +356,28 @@ class XsdMaxInclusive:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:maxInclusive'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'maxInclusive')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -352,7 +387,7 @@ class XsdMaxInclusive:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -364,34 +399,28 @@ class XsdMaxLength:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:maxLength'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'maxLength')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -401,7 +430,7 @@ class XsdMaxLength:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -413,34 +442,28 @@ class XsdMinLength:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:minLength'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'minLength')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -450,7 +473,7 @@ class XsdMinLength:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -462,34 +485,28 @@ class XsdMinExclusive:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:minExclusive'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'minExclusive')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -499,7 +516,7 @@ class XsdMinExclusive:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -511,34 +528,201 @@ class XsdMinInclusive:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
     def __init__(self, id_=None, value=None, fixed=None, elems=None):
         self.id_ = id_
         self.value = value
         self.fixed = fixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        value = nd.attrib['value'] if 'value' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:minInclusive'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'minInclusive')
+
+        return cls(id_=id_, value=value, fixed=fixed, elems=elems)
+        
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.value is not None:
+            d['value'] = self.value           
+        if self.fixed is not None:
+            d['fixed'] = self.fixed           
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdLength:
+    """Facet to define an exact length.
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
+    def __init__(self, id_=None, value=None, fixed=None, elems=None):
+        self.id_ = id_
+        self.value = value
+        self.fixed = fixed
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
+
+        # Elements
+        elems = build_elems(cls, nd, 'length')
+
+        return cls(id_=id_, value=value, fixed=fixed, elems=elems)
+        
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.value is not None:
+            d['value'] = self.value           
+        if self.fixed is not None:
+            d['fixed'] = self.fixed           
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdTotalDigits:
+    """Facet to define the maximum number of digits.
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
+    def __init__(self, id_=None, value=None, fixed=None, elems=None):
+        self.id_ = id_
+        self.value = value
+        self.fixed = fixed
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
+
+        # Elements
+        elems = build_elems(cls, nd, 'totalDigits')
+
+        return cls(id_=id_, value=value, fixed=fixed, elems=elems)
+        
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.value is not None:
+            d['value'] = self.value           
+        if self.fixed is not None:
+            d['fixed'] = self.fixed           
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdFractionDigits:
+    """Facet to define the maximum number of digits in the fraction part.
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
+    def __init__(self, id_=None, value=None, fixed=None, elems=None):
+        self.id_ = id_
+        self.value = value
+        self.fixed = fixed
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
+
+        # Elements
+        elems = build_elems(cls, nd, 'fractionDigits')
+
+        return cls(id_=id_, value=value, fixed=fixed, elems=elems)
+        
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.value is not None:
+            d['value'] = self.value           
+        if self.fixed is not None:
+            d['fixed'] = self.fixed           
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdWhiteSpace:
+    """Facet to define how white space is normalized (preserve, replace,
+    collapse).
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'value', 'fixed', 'elems')
+
+    def __init__(self, id_=None, value=None, fixed=None, elems=None):
+        self.id_ = id_
+        self.value = value
+        self.fixed = fixed
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        value = get_attr(nd, 'value')
+        fixed = get_attr(nd, 'fixed')
+
+        # Elements
+        elems = build_elems(cls, nd, 'whiteSpace')
 
         return cls(id_=id_, value=value, fixed=fixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -548,7 +732,7 @@ class XsdMinInclusive:
         if self.fixed is not None:
             d['fixed'] = self.fixed           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -562,54 +746,26 @@ class XsdRestrictionST:
     minLength | maxLength | enumeration | whiteSpace | pattern)*))
 
     """
+    __slots__ = ('id_', 'base', 'elems')
+
     def __init__(self, id_=None, base=None, elems=None):
         self.id_ = id_
         self.base = base
-        self.elems = elems
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        base = nd.attrib['base'] if 'base' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        base = get_attr(nd, 'base')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'enumeration':
-                elems.append(XsdEnumeration.build(k))
-            elif tag(k) == 'maxExclusive':
-                elems.append(XsdMaxExclusive.build(k))
-            elif tag(k) == 'maxInclusive':
-                elems.append(XsdMaxInclusive.build(k))
-            elif tag(k) == 'maxLength':
-                elems.append(XsdMaxLength.build(k))
-            elif tag(k) == 'minExclusive':
-                elems.append(XsdMinExclusive.build(k))
-            elif tag(k) == 'minInclusive':
-                elems.append(XsdMinInclusive.build(k))
-            elif tag(k) == 'minLength':
-                elems.append(XsdMinLength.build(k))
-            elif tag(k) == 'pattern':
-                elems.append(XsdPattern.build(k))
-            elif tag(k) in ['fractionDigits', 'length', 'simpleType',
-                            'totalDigits', 'whiteSpace']:
-                m = f'Support for tag "{tag(k)}" not implemented'
-                print(m, file=sys.stderr)
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:restriction' \
-                    ' (simpleType)'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'restriction (simpleType)')
 
         return cls(id_=id_, base=base, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -617,7 +773,7 @@ class XsdRestrictionST:
         if self.base is not None:
             d['base'] = self.base           
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -629,36 +785,27 @@ class XsdUnion:
     Content: (annotation?, (simpleType*))
 
     """
+    __slots__ = ('id_', 'memberTypes', 'elems')
+
     def __init__(self, id_=None, memberTypes=None, elems=None):
         self.id_ = id_
         self.memberTypes = memberTypes
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        memberTypes = nd.attrib['memberTypes'] if 'memberTypes' in nd.attrib \
-            else None
+        id_ = get_attr(nd, 'id')
+        memberTypes = get_attr(nd, 'memberTypes')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'simpleType':
-                elems.append(XsdSimpleType.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:union'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'union')
 
         return cls(id_=id_, memberTypes=memberTypes,
                    elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -666,7 +813,7 @@ class XsdUnion:
         if self.memberTypes is not None:
             d['memberTypes'] = self.memberTypes
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -679,44 +826,32 @@ class XsdSimpleType:
     Content: (annotation?, (restriction | list | union))
 
     """
+    __slots__ = ('id_', 'name', 'final', 'elems')
+
     def __init__(self, id_=None, name=None, final=None, elems=None):
         self.id_ = id_
         self.name = name
         self.final = final
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
-        final = nd.attrib['final'] if 'final' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+        final = get_attr(nd, 'final')
 
         label = 'SimpleType'
         # print(f'{label}{" "*(lbl_sz-len(label))}: name={name}')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'list':
-                elems.append(XsdList.build(k))
-            elif tag(k) == 'restriction':
-                elems.append(XsdRestrictionST.build(k))
-            elif tag(k) == 'union':
-                elems.append(XsdUnion.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:simpleType'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'simpleType')
 
         return cls(id_=id_, name=name, final=final,
                    elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -726,7 +861,7 @@ class XsdSimpleType:
         if self.final is not None:
             d['final'] = self.final
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -741,59 +876,37 @@ class XsdRestrictionSC:
     ((attribute | attributeGroup)*, anyAttribute?))
 
     """
+    __slots__ = ('id_', 'base', 'elems')
+
     def __init__(self, id_=None, base=None, elems=None):
         self.id_ = id_
         self.base = base
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        base = nd.attrib['base'] if 'base' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        base = get_attr(nd, 'base')
 
         # Elements
-        elems= []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'enumeration':
-                elems.append(XsdEnumeration.build(k))
-            elif tag(k) == 'maxExclusive':
-                elems.append(XsdMaxExclusive.build(k))
-            elif tag(k) == 'maxInclusive':
-                elems.append(XsdMaxInclusive.build(k))
-            elif tag(k) == 'maxLength':
-                elems.append(XsdMaxLength.build(k))
-            elif tag(k) == 'minExclusive':
-                elems.append(XsdMinExclusive.build(k))
-            elif tag(k) == 'minInclusive':
-                elems.append(XsdMinInclusive.build(k))
-            elif tag(k) == 'minLength':
-                elems.append(XsdMinLength.build(k))
-            elif tag(k) == 'pattern':
-                elems.append(XsdPattern.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            elif tag(k) in ['fractionDigits', 'length', 'simpleType',
-                            'totalDigits', 'whiteSpace']:
-                m = f'Support for tag "{tag(k)}" not implemented'
-                print(m, file=sys.stderr)
-            # FIXME attribute, attributeGroup
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:restriction' \
-                    ' (simpleContent)'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'restriction (simpleContent)')
 
         return cls(id_=id_, base=base, elems=elems)
 
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.base is not None:
+            d['base'] = self.base
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
 #-------------------------------------------------------------------------------
 
 class XsdExtensionSC:
@@ -804,40 +917,26 @@ class XsdExtensionSC:
     Content: (annotation?, ((attribute | attributeGroup)*, anyAttribute?))
 
     """
+    __slots__ = ('id_', 'base', 'elems')
+
     def __init__(self, id_=None, base=None, elems=None):
         self.id_ = id_
         self.base = base
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        base = nd.attrib['base'] if 'base' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        base = get_attr(nd, 'base')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            # FIXME attributeGroup, anyAttribute
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:extension' \
-                    ' (simpleContent)'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'extension (simpleContent)')
 
         return cls(id_=id_, base=base, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -845,7 +944,7 @@ class XsdExtensionSC:
         if self.base is not None:
             d['base'] = self.base
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -858,40 +957,30 @@ class XsdSimpleContent:
     Content: (annotation?, (restriction | extension))
 
     """
+    __slots__ = ('id_', 'elems')
+
     def __init__(self, id_=None, elems=None):
         self.id_ = id_
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'restriction':
-                elems.append(XsdRestrictionSC.build(k))
-            elif tag(k) == 'extension':
-                elems.append(XsdExtensionSC.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:simpleContent'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'simpleContent')
 
         return cls(id_=id_, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
             d['id'] = self.id_
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -904,46 +993,37 @@ class XsdRestrictionCC:
     attributeGroup)*, anyAttribute?))
 
     """
+    __slots__ = ('id_', 'base', 'elems')
+
     def __init__(self, id_=None, base=None, elems=None):
         self.id_ = id_
         self.base = base
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        base = nd.attrib['base'] if 'base' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        base = get_attr(nd, 'base')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'all':
-                elems.append(XsdAll.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:restriction' \
-                    ' (complexContent)'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'restriction (complexContent)')
 
         return cls(id_=id_, base=base, elems=elems)
 
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.base is not None:
+            d['base'] = self.base
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
 #-------------------------------------------------------------------------------
 
 class XsdExtensionCC:
@@ -953,47 +1033,26 @@ class XsdExtensionCC:
     attributeGroup)*, anyAttribute?)))
 
     """
+    __slots__ = ('id_', 'base', 'elems')
+
     def __init__(self, id_=None, base=None, elems=None):
         self.id_ = id_
         self.base = base
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        base = nd.attrib['base'] if 'base' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        base = get_attr(nd, 'base')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'all':
-                elems.append(XsdAll.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:extension' \
-                    ' (complexContent)'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'extension (complexContent)')
 
         return cls(id_=id_, base=base, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1001,7 +1060,7 @@ class XsdExtensionCC:
         if self.base is not None:
             d['base'] = self.base
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1014,36 +1073,26 @@ class XsdComplexContent:
     Content: (annotation?,  (restriction | extension))
 
     """
+    __slots__ = ('id_', 'mixed', 'elems')
+
     def __init__(self, id_=None, mixed=None, elems=None):
         self.id_ = id_
         self.mixed = mixed
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        mixed = nd.attrib['mixed'] if 'mixed' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        mixed = get_attr(nd, 'mixed')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'restriction':
-                elems.append(XsdRestrictionCC.build(k))
-            elif tag(k) == 'extension':
-                elems.append(XsdExtensionCC.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:complexContent'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'complexContent')
 
         return cls(id_=id_, mixed=mixed, elems=elems)
         
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1051,7 +1100,7 @@ class XsdComplexContent:
         if self.mixed is not None:
             d['mixed'] = self.mixed
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1064,48 +1113,32 @@ class XsdSequence:
     Content: (annotation?, (element | group | choice | sequence | any)*)
 
     """
+    __slots__ = ('id_', 'minOccurs', 'maxOccurs', 'elems')
+
     def __init__(self, id_=None, minOccurs=None, maxOccurs=None,
                  elems=None):
         self.id_ = id_
         self.minOccurs = minOccurs
         self.maxOccurs = maxOccurs
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     # See <xs:complexType name="fx_surface_common"> in collada
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        minOccurs = nd.attrib['minOccurs'] if 'minOccurs' in nd.attrib else None
-        maxOccurs = nd.attrib['maxOccurs'] if 'maxOccurs' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        minOccurs = get_attr(nd, 'minOccurs')
+        maxOccurs = get_attr(nd, 'maxOccurs')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'element':
-                elems.append(XsdElement.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            elif tag(k) == 'any':
-                elems.append(XsdAny.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:sequence'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'sequence')
 
         return cls(id_=id_, minOccurs=minOccurs, maxOccurs=maxOccurs,
                    elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1115,7 +1148,7 @@ class XsdSequence:
         if self.maxOccurs is not None:
             d['maxOccurs'] = self.maxOccurs
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1127,6 +1160,10 @@ class XsdAttribute:
     Content: (annotation?, (simpleType?))
 
     """
+    __slots__ = (
+        'default', 'fixed', 'form', 'id_', 'name', 'ref', 'type_', 'use',
+        'elems')
+
     def __init__(self, default=None, fixed=None, form=None, id_=None,
                  name=None, ref=None, type_=None, use=None, elems=None):
         self.default = default
@@ -1138,37 +1175,27 @@ class XsdAttribute:
         self.type_ = type_
         self.use = use
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        default = nd.attrib['default'] if 'default' in nd.attrib else None
-        fixed = nd.attrib['fixed'] if 'fixed' in nd.attrib else None
-        form = nd.attrib['form'] if 'form' in nd.attrib else None
-        id_ = nd.attrib['id'] if 'id_' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
-        ref = nd.attrib['ref'] if 'ref' in nd.attrib else None
-        type_ = nd.attrib['type'] if 'type' in nd.attrib else None
-        use = nd.attrib['use'] if 'use' in nd.attrib else None
+        default = get_attr(nd, 'default')
+        fixed = get_attr(nd, 'fixed')
+        form = get_attr(nd, 'form')
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+        ref = get_attr(nd, 'ref')
+        type_ = get_attr(nd, 'type')
+        use = get_attr(nd, 'use')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'simpleType':
-                elems.append(XsdSimpleType.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:attribute'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'attribute')
 
         return cls(default=default, fixed=fixed, form=form, id_=id_, name=name,
                    ref=ref, type_=type_, use=use, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.default is not None:
@@ -1190,7 +1217,7 @@ class XsdAttribute:
         if self.default is not None:
             d['default'] = self.default
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1203,40 +1230,28 @@ class XsdAttributeGroup:
     Content: (annotation?), ((attribute | attributeGroup)*, anyAttribute?))
 
     """
+    __slots__ = ('id_', 'name', 'ref', 'elems')
+
     def __init__(self, id_=None, name=None, ref=None, elems=None):
         self.id_ = id_
         self.name = name
         self.ref = ref
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
-        ref = nd.attrib['ref'] if 'ref' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+        ref = get_attr(nd, 'ref')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:attributeGroup'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'attributeGroup')
 
         return cls(id_=id_, name=name, ref=ref, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1246,7 +1261,7 @@ class XsdAttributeGroup:
         if self.ref is not None:
             d['ref'] = self.ref
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1290,37 +1305,30 @@ class XsdAnyAttribute:
     attributes from the specified namespaces.
 
     """
+    __slots__ = ('id_', 'namespace', 'processContents', 'elems')
+
     def __init__(self, id_=None, namespace=None, processContents=None,
                  elems=None):
         self.id_ = id_
         self.namespace = namespace
         self.processContents = processContents
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        namespace = nd.attrib['namespace'] if 'namespace' in nd.attrib else None
-        processContents = nd.attrib['processContents'] \
-            if 'processContents' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        namespace = get_attr(nd, 'namespace')
+        processContents = get_attr(nd, 'processContents')
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:attribute'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'attribute')
 
         return cls(id_=id_, namespace=namespace,
                    processContents=processContents, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1330,7 +1338,7 @@ class XsdAnyAttribute:
         if self.processContents is not None:
             d['processContents'] = self.processContents
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1343,26 +1351,41 @@ class XsdAll:
     Content: (annotation?, element*)
 
     """
-    def __init__(self, elems=None):
+    __slots__ = ('id_', 'minOccurs', 'maxOccurs', 'elems')
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+    def __init__(self, id_=None, minOccurs=None, maxOccurs=None, elems=None):
+        self.id_ = id_
+        self.minOccurs = minOccurs
+        self.maxOccurs = maxOccurs
+
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        minOccurs = get_attr(nd, 'minOccurs')
+        maxOccurs = get_attr(nd, 'maxOccurs')
+
         # Sub-elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'element':
-                elems.append(XsdElement.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:all'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'all')
 
-        return cls(id_=id_, elems=elems)
+        return cls(id_=id_, minOccurs=minOccurs, maxOccurs=maxOccurs,
+                   elems=elems)
+
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.minOccurs is not None:
+            d['minOccurs'] = self.minOccurs
+        if self.maxOccurs is not None:
+            d['maxOccurs'] = self.maxOccurs
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
 
 #-------------------------------------------------------------------------------
 
@@ -1373,45 +1396,29 @@ class XsdChoice:
     Content: (annotation?, (element | group | choice | sequence | any)*)
 
     """
+    __slots__ = ('id_', 'minOccurs', 'maxOccurs', 'elems')
+
     def __init__(self, id_=None, minOccurs=None, maxOccurs=None, elems=None):
         self.id_ = id_
         self.minOccurs = minOccurs
         self.maxOccurs = maxOccurs
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        minOccurs = nd.attrib['minOccurs'] if 'minOccurs' in nd.attrib else None
-        maxOccurs = nd.attrib['maxOccurs'] if 'maxOccurs' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        minOccurs = get_attr(nd, 'minOccurs')
+        maxOccurs = get_attr(nd, 'maxOccurs')
 
         # Sub-elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'element':
-                elems.append(XsdElement.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            elif tag(k) == 'any':
-                elems.append(XsdAny.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:choice'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'choice')
 
         return cls(id_=id_, minOccurs=minOccurs, maxOccurs=maxOccurs,
                    elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1421,7 +1428,7 @@ class XsdChoice:
         if self.maxOccurs is not None:
             d['maxOccurs'] = self.maxOccurs
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1434,6 +1441,10 @@ class XsdAny:
     Content: (annotation?)
 
     """
+    __slots__ = (
+        'id_', 'minOccurs', 'maxOccurs', 'namespace', 'processContents',
+        'elems')
+
     def __init__(self, id_=None, minOccurs=None, maxOccurs=None,
                  namespace=None, processContents=None, elems=None):
         self.id_ = id_
@@ -1442,34 +1453,25 @@ class XsdAny:
         self.namespace = namespace
         self.processContents = processContents
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        minOccurs = nd.attrib['minOccurs'] if 'minOccurs' in nd.attrib else None
-        maxOccurs = nd.attrib['maxOccurs'] if 'maxOccurs' in nd.attrib else None
-        namespace = nd.attrib['namespace'] if 'namespace' in nd.attrib else None
-        processContents = nd.attrib['processContents'] \
-            if 'processContents' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        minOccurs = get_attr(nd, 'minOccurs')
+        maxOccurs = get_attr(nd, 'maxOccurs')
+        namespace = get_attr(nd, 'namespace')
+        processContents = get_attr(nd, 'processContents')
 
         # Sub-elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:any'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'any')
 
         return cls(id_=id_, minOccurs=minOccurs, maxOccurs=maxOccurs,
                    namespace=namespace, processContents=processContents,
                    elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1483,7 +1485,7 @@ class XsdAny:
         if self.processContents is not None:
             d['processContents'] = self.processContents
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1496,6 +1498,8 @@ class XsdGroup:
     Content: (annotation?, (all | choice | sequence))
 
     """
+    __slots__ = ('id_', 'name', 'ref', 'minOccurs', 'maxOccurs', 'elems')
+
     def __init__(self, id_=None, name=None, ref=None, minOccurs=None,
                  maxOccurs=None, elems=None):
         self.id_ = id_
@@ -1504,41 +1508,27 @@ class XsdGroup:
         self.minOccurs = minOccurs
         self.maxOccurs = maxOccurs
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
-        ref = nd.attrib['ref'] if 'ref' in nd.attrib else None
-        minOccurs = nd.attrib['minOccurs'] if 'minOccurs' in nd.attrib else None
-        maxOccurs = nd.attrib['maxOccurs'] if 'maxOccurs' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+        ref = get_attr(nd, 'ref')
+        minOccurs = get_attr(nd, 'minOccurs')
+        maxOccurs = get_attr(nd, 'maxOccurs')
 
         label = 'Group'
         # print(f'{label}{" "*(lbl_sz-len(label))}: name={name}')
         
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'all':
-                elems.append(XsdAll.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:group'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'group')
 
         return cls(id_=id_, name=name, ref=ref, minOccurs=minOccurs,
                    maxOccurs=maxOccurs, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1552,7 +1542,192 @@ class XsdGroup:
         if self.maxOccurs is not None:
             d['maxOccurs'] = self.maxOccurs
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdSelector:
+    """Selects the elements of an identity constraint, with an XPath subset
+    expression.
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'xpath', 'elems')
+
+    def __init__(self, id_=None, xpath=None, elems=None):
+        self.id_ = id_
+        self.xpath = xpath
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        xpath = get_attr(nd, 'xpath')
+
+        # Elements
+        elems = build_elems(cls, nd, 'selector')
+
+        return cls(id_=id_, xpath=xpath, elems=elems)
+
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.xpath is not None:
+            d['xpath'] = self.xpath
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdField:
+    """Selects a value of an identity constraint, relative to the selected
+    element, with an XPath subset expression.
+
+    Content: (annotation?)
+
+    """
+    __slots__ = ('id_', 'xpath', 'elems')
+
+    def __init__(self, id_=None, xpath=None, elems=None):
+        self.id_ = id_
+        self.xpath = xpath
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        xpath = get_attr(nd, 'xpath')
+
+        # Elements
+        elems = build_elems(cls, nd, 'field')
+
+        return cls(id_=id_, xpath=xpath, elems=elems)
+
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.xpath is not None:
+            d['xpath'] = self.xpath
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdUnique:
+    """Specifies that the values of the selected elements must be unique.
+
+    Content: (annotation?, (selector, field+))
+
+    """
+    __slots__ = ('id_', 'name', 'elems')
+
+    def __init__(self, id_=None, name=None, elems=None):
+        self.id_ = id_
+        self.name = name
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+
+        # Elements
+        elems = build_elems(cls, nd, 'unique')
+
+        return cls(id_=id_, name=name, elems=elems)
+
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.name is not None:
+            d['name'] = self.name
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
+        return d
+
+#-------------------------------------------------------------------------------
+
+class XsdKey(XsdUnique):
+    """Specifies that the values of the selected elements must be present and
+    unique, and can be referred to by keyrefs.
+
+    Content: (annotation?, (selector, field+))
+
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+
+        # Elements
+        elems = build_elems(cls, nd, 'key')
+
+        return cls(id_=id_, name=name, elems=elems)
+
+#-------------------------------------------------------------------------------
+
+class XsdKeyref:
+    """Specifies that the values of the selected elements must match those of
+    a key or unique constraint.
+
+    Content: (annotation?, (selector, field+))
+
+    """
+    __slots__ = ('id_', 'name', 'refer', 'elems')
+
+    def __init__(self, id_=None, name=None, refer=None, elems=None):
+        self.id_ = id_
+        self.name = name
+        self.refer = refer
+
+        self.elems = elems_tuple(elems)
+
+    @classmethod
+    def build(cls, nd):
+        # Attributes
+        id_ = get_attr(nd, 'id')
+        name = get_attr(nd, 'name')
+        refer = get_attr(nd, 'refer')
+
+        # Elements
+        elems = build_elems(cls, nd, 'keyref')
+
+        return cls(id_=id_, name=name, refer=refer, elems=elems)
+
+    def dictify(self, deep=True):
+        d = { 'elem_type': self.__class__.__name__ }
+        # Attributes
+        if self.id_ is not None:
+            d['id'] = self.id_
+        if self.name is not None:
+            d['name'] = self.name
+        if self.refer is not None:
+            d['refer'] = self.refer
+        # Sub-elements
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1564,8 +1739,15 @@ class XsdElement:
     Content: (annotation?, ((simpleType | complexType)?, (unique | key |
     keyref)*))
     """
+    __slots__ = (
+        'abstract', 'final', 'id_', 'maxOccurs', 'minOccurs', 'name', 'ref',
+        'type_', 'substitutionGroup', 'block', 'nillable', 'default',
+        'fixed', 'form', 'elems')
+
     def __init__(self, abstract=None, final=None, id_=None, maxOccurs=None,
-                 minOccurs=None, name=None, ref=None, type_=None, elems=None):
+                 minOccurs=None, name=None, ref=None, type_=None,
+                 substitutionGroup=None, block=None, nillable=None,
+                 default=None, fixed=None, form=None, elems=None):
         self.abstract = abstract
         self.final = final
         self.id_ = id_
@@ -1574,22 +1756,32 @@ class XsdElement:
         self.name = name
         self.ref = ref
         self.type_ = type_
+        self.substitutionGroup = substitutionGroup
+        self.block = block
+        self.nillable = nillable
+        self.default = default
+        self.fixed = fixed
+        self.form = form
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        abstract = nd.attrib['abstract'] if 'abstract' in nd.attrib else None
-        final = nd.attrib['final'] if 'final' in nd.attrib else None
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        maxOccurs = nd.attrib['maxOccurs'] if 'maxOccurs' in nd.attrib else None
-        minOccurs = nd.attrib['minOccurs'] if 'minOccurs' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
-        ref = nd.attrib['ref'] if 'ref' in nd.attrib else None
-        type_ = nd.attrib['type'] if 'type' in nd.attrib else None
+        abstract = get_attr(nd, 'abstract')
+        final = get_attr(nd, 'final')
+        id_ = get_attr(nd, 'id')
+        maxOccurs = get_attr(nd, 'maxOccurs')
+        minOccurs = get_attr(nd, 'minOccurs')
+        name = get_attr(nd, 'name')
+        ref = get_attr(nd, 'ref')
+        type_ = get_attr(nd, 'type')
+        substitutionGroup = get_attr(nd, 'substitutionGroup')
+        block = get_attr(nd, 'block')
+        nillable = get_attr(nd, 'nillable')
+        default = get_attr(nd, 'default')
+        fixed = get_attr(nd, 'fixed')
+        form = get_attr(nd, 'form')
 
         # label = 'Element'
         # s = f'{label}{" "*(lbl_sz-len(label))}:'
@@ -1598,26 +1790,15 @@ class XsdElement:
         # print(s)
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'simpleType':
-                elems.append(XsdSimpleType.build(k))
-            elif tag(k) == 'complexType':
-                elems.append(XsdComplexType.build(k))
-            elif tag(k) in ['key', 'keyref', 'unique']:
-                print(f'Support for tag "{tag(k)}" not implemented',
-                      file=sys.stderr)
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:element'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'element')
 
         return cls(id_=id_, name=name, ref=ref, minOccurs=minOccurs,
                    maxOccurs=maxOccurs, abstract=abstract, final=final,
-                   type_=type_, elems=elems)
+                   type_=type_, substitutionGroup=substitutionGroup,
+                   block=block, nillable=nillable, default=default,
+                   fixed=fixed, form=form, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.abstract is not None:
@@ -1636,8 +1817,20 @@ class XsdElement:
             d['ref'] = self.ref
         if self.type_ is not None:
             d['type_'] = self.type_
+        if self.substitutionGroup is not None:
+            d['substitutionGroup'] = self.substitutionGroup
+        if self.block is not None:
+            d['block'] = self.block
+        if self.nillable is not None:
+            d['nillable'] = self.nillable
+        if self.default is not None:
+            d['default'] = self.default
+        if self.fixed is not None:
+            d['fixed'] = self.fixed
+        if self.form is not None:
+            d['form'] = self.form
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1651,6 +1844,8 @@ class XsdComplexType:
     choice | sequence)?, ((attribute | attributeGroup)*, anyAttribute?))))
 
     """
+    __slots__ = ('abstract', 'block', 'final', 'id_', 'mixed', 'name', 'elems')
+
     def __init__(self, abstract=None, block=None, final=None, id_=None,
                  mixed=None, name=None, elems=None):
         self.abstract = abstract
@@ -1660,19 +1855,17 @@ class XsdComplexType:
         self.mixed = mixed
         self.name = name
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        abstract = nd.attrib['abstract'] if 'abstract' in nd.attrib else None
-        block = nd.attrib['block'] if 'block' in nd.attrib else None
-        final = nd.attrib['final'] if 'final' in nd.attrib else None
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        mixed = nd.attrib['mixed'] if 'mixed' in nd.attrib else None
-        name = nd.attrib['name'] if 'name' in nd.attrib else None
+        abstract = get_attr(nd, 'abstract')
+        block = get_attr(nd, 'block')
+        final = get_attr(nd, 'final')
+        id_ = get_attr(nd, 'id')
+        mixed = get_attr(nd, 'mixed')
+        name = get_attr(nd, 'name')
 
         # label = 'ComplexType'
         # s = f'{label}{" "*(lbl_sz-len(label))}:'
@@ -1680,36 +1873,12 @@ class XsdComplexType:
         # print(s)
 
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'simpleContent':
-                elems.append(XsdSimpleContent.build(k))
-            elif tag(k) == 'complexContent':
-                elems.append(XsdComplexContent.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'all':
-                elems.append(XsdAll.build(k))
-            elif tag(k) == 'choice':
-                elems.append(XsdChoice.build(k))
-            elif tag(k) == 'sequence':
-                elems.append(XsdSequence.build(k))
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'anyAttribute':
-                elems.append(XsdAnyAttribute.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:complexType'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'complexType')
 
         return cls(abstract=abstract, block=block, final=final, id_=id_,
                    mixed=mixed, name=name, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.abstract is not None:
@@ -1725,7 +1894,7 @@ class XsdComplexType:
         if self.name is not None:
             d['name'] = self.name
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
@@ -1738,33 +1907,26 @@ class XsdInclude:
     Content: (annotation?)
 
     """
+    __slots__ = ('id_', 'schemaLocation', 'elems')
+
     def __init__(self, id_=None, schemaLocation=None, elems=None):
         self.id_ = id_
         self.schemaLocation = schemaLocation
 
-        self.elems = []
-        if elems is not None:
-            self.elems = elems
+        self.elems = elems_tuple(elems)
 
     @classmethod
     def build(cls, nd):
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        schemaLocation = nd.attrib['schemaLocation'] \
-            if 'schemaLocation' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        schemaLocation = get_attr(nd, 'schemaLocation')
         
         # Elements
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:include'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'include')
 
         return cls(id_=id_, schemaLocation=schemaLocation, elems=elems)
 
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1772,43 +1934,45 @@ class XsdInclude:
         if self.schemaLocation is not None:
             d['schemaLocation'] = self.schemaLocation
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
-    def get_schema(self, dirpath, prevs):
-        # print(f'dirpath={dirpath}, sch_loc={self.schemaLocation}')
-        # for p in prevs:
-        #     print(f'    {p}')
-        
-        # Loop prevention
-        for p in prevs:
-            if p == self.schemaLocation:
-                return
-            
-        # Look for a schema file in the same directory where we found the
-        # current one: dirpath.
-        path = self.schemaLocation if dirpath is None \
-            else os.path.join(dirpath, self.schemaLocation)
-        if os.path.isfile(path):
-
-            print(f'{self.__class__.__name__}: getting schema' \
-                  f' {self.schemaLocation} (from path "{path}")',
-                  file=sys.stderr)
-            return XMLSchema.from_file(path, prevs)
+    def locate(self, base):
+        """Return the canonical location (absolute file path, or URL) of the
+        schema document referenced by self, or None if there's nothing to
+        load.
+
+        base is the canonical location of the document containing self,
+        relative schema locations are resolved against it. The catalog is
+        consulted before falling back to a URL.
+
+        """
+        namespace = self.namespace if isinstance(self, XsdImport) else None
+        cat = catalog.default_catalog()
+
+        if self.schemaLocation is None:
+            # An import without a location can only be found by namespace
+            path = cat.resolve(None, namespace)
+            return os.path.realpath(path) if path is not None else None
+
+        if is_url(base):
+            location = urljoin(base, self.schemaLocation)
+        elif is_url(self.schemaLocation):
+            location = self.schemaLocation
         else:
-            # If it can't be read as a file, try to get it from the net
-            r = requests.get(self.schemaLocation)
-            if r.status_code >= 400:
-                m = f'Couldn\'t download "{self.schemaLocation}",' \
-                    f' status={r.status_code}'
-                raise RuntimeError(m)
-            # Ignore comments
-            p = et.XMLParser(remove_comments=True)
-            root = objectify.fromstring(r.content.decode(), parser=p)
-            print(f'Including schema {self.schemaLocation} (from url)',
-                  file=sys.stderr)
-            return XMLSchema.build(root, None, self.schemaLocation, prevs)
+            # Look for a schema file in the same directory where we found the
+            # current one.
+            path = os.path.join(os.path.dirname(base), self.schemaLocation)
+            if os.path.isfile(path):
+                return os.path.realpath(path)
+            location = self.schemaLocation
+
+        # Then ask the catalog for a local copy
+        path = cat.resolve(location, namespace)
+        if path is not None and os.path.isfile(path):
+            return os.path.realpath(path)
+        return location
 
 #-------------------------------------------------------------------------------
 
@@ -1818,6 +1982,8 @@ class XsdImport(XsdInclude):
 
     Content: (annotation?)
     """
+    __slots__ = ('namespace',)
+
     def __init__(self, id_=None, namespace=None, schemaLocation=None,
                  elems=None):
         super().__init__(id_=id_, schemaLocation=schemaLocation, elems=elems)
@@ -1829,18 +1995,21 @@ class XsdImport(XsdInclude):
         
         # Attributes
         id_ = x.id_
-        namespace = nd.attrib['namespace'] if 'namespace' in nd.attrib else None
+        namespace = get_attr(nd, 'namespace')
         schemaLocation = x.schemaLocation
         elems = x.elems
 
         return cls(id_=id_, namespace=namespace, schemaLocation=schemaLocation,
                    elems=elems)
 
-    def dictify(self):
-        d = super().dictify()
+    def dictify(self, deep=True):
+        d = super().dictify(deep=False)
         # Attributes
         if self.namespace is not None:
             d['namespace'] = self.namespace
+        # Sub-elements
+        if deep and len(self.elems) > 0:
+            d['elems'] = [e.dictify() for e in self.elems]
         return d
  
 #-------------------------------------------------------------------------------
@@ -1857,7 +2026,7 @@ class XMLSchema:
                  elementFormDefault=None, finalDefault=None,
                  targetNamespace=None, version=None, lang=None, includes=None,
                  imports=None, elems=None, dirpath=None,
-                 schema_location=None, prevs=None):
+                 schema_location=None, nsmap=None):
         self.id_ = id_
         self.attributeFormDefault = attributeFormDefault
         self.blockDefault = blockDefault
@@ -1871,9 +2040,6 @@ class XMLSchema:
         self.dirpath = dirpath
         self.schema_location = schema_location
 
-        # Previously-loaded schemas
-        self.prevs = prevs
-
         self.includes = []
         if includes is not None:
             self.includes = includes
@@ -1886,71 +2052,52 @@ class XMLSchema:
         if elems is not None:
             self.elems = elems
 
-        # Get included schemas
-        inc_schemas = []
-        for inc in includes:
-            if schema_location not in self.prevs:
-                self.prevs += [schema_location]
-            sch = inc.get_schema(self.dirpath, self.prevs)
-
-        # Get imported schemas
-        imp_schemas = []
-        for imp in imports:
-            if schema_location not in self.prevs:
-                self.prevs += [schema_location]
-            sch = imp.get_schema(self.dirpath, self.prevs)
+        # Prefix to namespace mapping in scope on the xs:schema element, used
+        # to expand the QName-valued attributes (ref, type, base, ...).
+        self.nsmap = {}
+        if nsmap is not None:
+            self.nsmap = nsmap
+
+        # Effective target namespace. It differs from targetNamespace for a
+        # "chameleon" include (a schema without a targetNamespace, included
+        # by a schema that has one), see assemble().
+        self.namespace = targetNamespace
+
+        # Included and imported schemas, filled in by SchemaLoader
+        self.inc_schemas = []
+        self.imp_schemas = []
+
+        # Global component tables, filled in by assemble()
+        self.elements = {}
+        self.types = {}
+        self.groups = {}
+        self.attribute_groups = {}
+        self.attributes = {}
+        self.owners = {}
 
     @classmethod
-    def build(cls, nd, dirpath, schema_location, prevs):
+    def build(cls, nd, dirpath, schema_location, prevs=None):
         """nd is expected to be the root node of the XML tree obtained when
         parsing an XML Schema.
 
+        Included and imported schemas are not loaded, see SchemaLoader. prevs
+        is ignored, it's kept for compatibility.
+
         """
         # Attributes
-        id_ = nd.attrib['id'] if 'id' in nd.attrib else None
-        attributeFormDefault = nd.attrib['attributeFormDefault'] \
-            if 'attributeFormDefault' in nd.attrib else None
-        blockDefault = nd.attrib['blockDefault'] \
-            if 'blockDefault' in nd.attrib else None
-        elementFormDefault = nd.attrib['elementFormDefault'] \
-            if 'elementFormDefault' in nd.attrib else None
-        finalDefault = nd.attrib['finalDefault'] \
-            if 'finalDefault' in nd.attrib else None
-        targetNamespace = nd.attrib['targetNamespace'] \
-            if 'targetNamespace' in nd.attrib else None
-        version = nd.attrib['version'] if 'version' in nd.attrib else None
-        lang = nd.attrib['lang'] if 'lang' in nd.attrib else None
+        id_ = get_attr(nd, 'id')
+        attributeFormDefault = get_attr(nd, 'attributeFormDefault')
+        blockDefault = get_attr(nd, 'blockDefault')
+        elementFormDefault = get_attr(nd, 'elementFormDefault')
+        finalDefault = get_attr(nd, 'finalDefault')
+        targetNamespace = get_attr(nd, 'targetNamespace')
+        version = get_attr(nd, 'version')
+        lang = get_attr(nd, 'lang')
         
         # Elements
-        includes = []
-        imports = []
-        elems = []
-        for k in nd:
-            if tag(k) == 'annotation':
-                elems.append(XsdAnnotation.build(k))
-            elif tag(k) == 'include':
-                x = XsdInclude.build(k)
-                includes.append(x)
-                elems.append(x)
-            elif tag(k) == 'import':
-                x = XsdImport.build(k)
-                imports.append(x)
-                elems.append(x)
-            elif tag(k) == 'attribute':
-                elems.append(XsdAttribute.build(k))
-            elif tag(k) == 'attributeGroup':
-                elems.append(XsdAttributeGroup.build(k))
-            elif tag(k) == 'element':
-                elems.append(XsdElement.build(k))
-            elif tag(k) == 'group':
-                elems.append(XsdGroup.build(k))
-            elif tag(k) == 'simpleType':
-                elems.append(XsdSimpleType.build(k))
-            elif tag(k) == 'complexType':
-                elems.append(XsdComplexType.build(k))
-            else:
-                m = f'Unexpected tag "{tag(k)}" inside an xs:schema'
-                raise RuntimeError(m)
+        elems = build_elems(cls, nd, 'schema')
+        includes = [x for x in elems if type(x) == XsdInclude]
+        imports = [x for x in elems if type(x) == XsdImport]
 
         return cls(id_=id_, attributeFormDefault=attributeFormDefault,
                    blockDefault=blockDefault,
@@ -1958,27 +2105,20 @@ class XMLSchema:
                    finalDefault=finalDefault, targetNamespace=targetNamespace,
                    version=version, lang=lang, includes=includes,
                    imports=imports, elems=elems, dirpath=dirpath,
-                   schema_location=schema_location, prevs=prevs)
+                   schema_location=schema_location, nsmap=dict(nd.nsmap))
         
     @classmethod
-    def from_file(cls, filepath, prevs):
+    def from_file(cls, filepath, prevs=None, annotations='full'):
         """filepath is an XML file containing an XML Schema definition.
 
-        prevs is a list of previous filepaths from which schemas have already
-        been loaded, this is to detect loops where a schema loads itself,
-        albeit indirectly.
+        The included and imported schemas are loaded too, see SchemaLoader,
+        which also describes the 'annotations' modes. prevs is ignored, it's
+        kept for compatibility.
 
         """
-        # Ignore comments
-        p = et.XMLParser(remove_comments=True)
-        root = objectify.parse(filepath, parser=p).getroot()
+        return SchemaLoader(annotations=annotations).load(filepath)
 
-        # FIXME I'm using just the filename for the schema location, not the
-        # path, not sure if this is ok.
-        dirpath, schema_location = os.path.split(filepath)
-        return cls.build(root, dirpath, schema_location, prevs)
-
-    def dictify(self):
+    def dictify(self, deep=True):
         d = { 'elem_type': self.__class__.__name__ }
         # Attributes
         if self.id_ is not None:
@@ -1998,15 +2138,76 @@ class XMLSchema:
         if self.lang is not None:
             d['lang'] = self.lang
         # Sub-elements
-        if len(self.elems) > 0:
+        if deep and len(self.elems) > 0:
             d['elems'] = [e.dictify() for e in self.elems]
         return d
 
     def __str__(self):
-        return json.dumps(self.dictify(), indent=4)
+        f = io.StringIO()
+        self.write_json(f)
+        return f.getvalue()
+
+    def write_json(self, f, indent=4):
+        """Write the JSON form of this schema document to the file object
+        'f', see write_json().
+
+        """
+        write_json(self, f, indent)
+
+    def write_ndjson(self, f):
+        """Write this schema document to the file object 'f' as newline
+        delimited JSON: one line with the xs:schema attributes, then one line
+        per top-level component.
+
+        """
+        write_json(self, f, None, deep=False)
+        f.write('\n')
+        for x in self.elems:
+            write_json(x, f, None)
+            f.write('\n')
 
     #---------------------------------------------------------------------------
 
+    def schemas(self):
+        """Return the list of schema documents reachable from self (self
+        included) through includes and imports, each one listed once.
+
+        """
+        arr = []
+        seen = set()
+        stack = [self]
+        while len(stack) > 0:
+            sch = stack.pop()
+            if id(sch) in seen:
+                continue
+            seen.add(id(sch))
+            arr.append(sch)
+            # Reversed, so that the documents come out in declaration order
+            stack.extend(reversed(sch.imp_schemas))
+            stack.extend(reversed(sch.inc_schemas))
+        return arr
+
+    def expand(self, qname):
+        """Return the expanded name of a QName-valued attribute found in this
+        schema document, as a '{namespace}localname' string (Clark notation).
+
+        Unqualified names belong to the default namespace if there is one. In
+        a chameleon include, they belong to the including schema's namespace.
+
+        """
+        prefix, _, local = qname.rpartition(':')
+        if prefix == 'xml':
+            ns = xml_ns
+        elif prefix == '':
+            ns = self.nsmap[None] if None in self.nsmap else self.namespace
+        elif prefix in self.nsmap:
+            ns = self.nsmap[prefix]
+        else:
+            m = f'Undeclared namespace prefix "{prefix}" in "{qname}"' \
+                f' ({self.schema_location})'
+            raise RuntimeError(m)
+        return et.QName(ns, local).text
+
     def assemble(self):
         """Assemble the different pieces together.
 
@@ -2014,21 +2215,384 @@ class XMLSchema:
         elements, types, groups, attributes, and attribute groups. These
         dictionaries must be merged from all the imported or included schemas.
 
+        The dictionaries are keyed by expanded name (see expand()), resolving
+        a reference is a single lookup. The schema document where a component
+        is declared is recorded in self.owners, because references nested
+        inside that component must be expanded with that document's nsmap.
+
+        """
+        self.elements = {}
+        self.types = {}
+        self.groups = {}
+        self.attribute_groups = {}
+        self.attributes = {}
+        self.owners = {}
+
+        tables = {
+            XsdElement: self.elements,
+            XsdComplexType: self.types,
+            XsdSimpleType: self.types,
+            XsdGroup: self.groups,
+            XsdAttributeGroup: self.attribute_groups,
+            XsdAttribute: self.attributes,
+        }
+
+        # Chameleon includes take on the namespace of the including schema
+        for sch in self.schemas():
+            for inc in sch.inc_schemas:
+                if inc.targetNamespace is None:
+                    inc.namespace = sch.namespace
+
+        for sch in self.schemas():
+            for e in sch.elems:
+                if type(e) not in tables:
+                    continue
+                key = et.QName(sch.namespace, e.name).text
+                tables[type(e)][key] = e
+                self.owners[id(e)] = sch
+
+    def owner(self, comp):
+        """Return the schema document where global component 'comp' is
+        declared.
+
+        """
+        if self.owners is None:
+            # Unpickled schema, the ids have changed
+            self.owners = {}
+            for sch in self.schemas():
+                for e in sch.elems:
+                    self.owners[id(e)] = sch
+        return self.owners[id(comp)]
+
+    def __getstate__(self):
+        # self.owners is keyed by object ids, it can't survive pickling
+        d = self.__dict__.copy()
+        d['owners'] = None
+        return d
+
+    def location(self):
+        """Return the file path (or URL) this schema document was loaded
+        from.
+
+        """
+        if self.dirpath is None:
+            return self.schema_location
+        return os.path.join(self.dirpath, self.schema_location)
+
+    def load_annotation(self, ann):
+        """Return the complete annotation (with its appinfo and documentation
+        elements) for 'ann', an annotation of this schema document loaded in
+        'lines' mode. The document is read again, nothing is kept in memory.
+
         """
+        root = parse_document(self.location())
+        for nd in root.iter(xs('annotation')):
+            if nd.sourceline == ann.line:
+                return XsdAnnotation.build(nd)
+        m = f'No annotation at line {ann.line} in "{self.location()}"'
+        raise RuntimeError(m)
+
+    def locations(self):
+        """Return the locations of all the documents that make up the
+        schema.
+
+        """
+        return [sch.location() for sch in self.schemas()]
+
+    def resolve(self, table, qname, sch=None):
+        """Look up 'qname' in one of the global component tables.
+
+        'sch' is the schema document where the reference appears, by default
+        self. Return None if there is no such component (e.g. built-in
+        types).
+
+        """
+        if sch is None:
+            sch = self
+        key = sch.expand(qname)
+        return table[key] if key in table else None
+
+    def get_element(self, qname, sch=None):
+        return self.resolve(self.elements, qname, sch)
+
+    def get_type(self, qname, sch=None):
+        return self.resolve(self.types, qname, sch)
+
+    def get_group(self, qname, sch=None):
+        return self.resolve(self.groups, qname, sch)
+
+    def get_attribute_group(self, qname, sch=None):
+        return self.resolve(self.attribute_groups, qname, sch)
+
+    def get_attribute(self, qname, sch=None):
+        return self.resolve(self.attributes, qname, sch)
+
+#-------------------------------------------------------------------------------
+# Dispatch tables: for each class, the sub-elements that its build() factory
+# accepts, keyed by tag in Clark notation, and the class that builds them.
+# None marks the tags that are valid but not supported yet.
+
+XsdAnnotation.children = dispatch(
+    appinfo=XsdAppinfo, documentation=XsdDocumentation)
+XsdList.children = dispatch(annotation=XsdAnnotation, simpleType=XsdSimpleType)
+XsdPattern.children = dispatch(annotation=XsdAnnotation)
+XsdEnumeration.children = dispatch(annotation=XsdAnnotation)
+XsdMaxExclusive.children = dispatch(annotation=XsdAnnotation)
+XsdMaxInclusive.children = dispatch(annotation=XsdAnnotation)
+XsdMaxLength.children = dispatch(annotation=XsdAnnotation)
+XsdMinLength.children = dispatch(annotation=XsdAnnotation)
+XsdMinExclusive.children = dispatch(annotation=XsdAnnotation)
+XsdMinInclusive.children = dispatch(annotation=XsdAnnotation)
+XsdLength.children = dispatch(annotation=XsdAnnotation)
+XsdTotalDigits.children = dispatch(annotation=XsdAnnotation)
+XsdFractionDigits.children = dispatch(annotation=XsdAnnotation)
+XsdWhiteSpace.children = dispatch(annotation=XsdAnnotation)
+XsdRestrictionST.children = dispatch(
+    annotation=XsdAnnotation, enumeration=XsdEnumeration,
+    maxExclusive=XsdMaxExclusive, maxInclusive=XsdMaxInclusive,
+    maxLength=XsdMaxLength, minExclusive=XsdMinExclusive,
+    minInclusive=XsdMinInclusive, minLength=XsdMinLength, pattern=XsdPattern,
+    fractionDigits=XsdFractionDigits, length=XsdLength,
+    simpleType=XsdSimpleType, totalDigits=XsdTotalDigits,
+    whiteSpace=XsdWhiteSpace)
+XsdUnion.children = dispatch(
+    annotation=XsdAnnotation, simpleType=XsdSimpleType)
+XsdSimpleType.children = dispatch(
+    annotation=XsdAnnotation, list=XsdList, restriction=XsdRestrictionST,
+    union=XsdUnion)
+XsdRestrictionSC.children = dispatch(
+    annotation=XsdAnnotation, enumeration=XsdEnumeration,
+    maxExclusive=XsdMaxExclusive, maxInclusive=XsdMaxInclusive,
+    maxLength=XsdMaxLength, minExclusive=XsdMinExclusive,
+    minInclusive=XsdMinInclusive, minLength=XsdMinLength, pattern=XsdPattern,
+    attribute=XsdAttribute, attributeGroup=XsdAttributeGroup,
+    anyAttribute=XsdAnyAttribute, fractionDigits=XsdFractionDigits,
+    length=XsdLength, simpleType=XsdSimpleType, totalDigits=XsdTotalDigits,
+    whiteSpace=XsdWhiteSpace)
+XsdExtensionSC.children = dispatch(
+    annotation=XsdAnnotation, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, anyAttribute=XsdAnyAttribute)
+XsdSimpleContent.children = dispatch(
+    annotation=XsdAnnotation, restriction=XsdRestrictionSC,
+    extension=XsdExtensionSC)
+XsdRestrictionCC.children = dispatch(
+    annotation=XsdAnnotation, group=XsdGroup, all=XsdAll, choice=XsdChoice,
+    sequence=XsdSequence, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, anyAttribute=XsdAnyAttribute)
+XsdExtensionCC.children = dispatch(
+    annotation=XsdAnnotation, group=XsdGroup, all=XsdAll, choice=XsdChoice,
+    sequence=XsdSequence, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, anyAttribute=XsdAnyAttribute)
+XsdComplexContent.children = dispatch(
+    annotation=XsdAnnotation, restriction=XsdRestrictionCC,
+    extension=XsdExtensionCC)
+XsdSequence.children = dispatch(
+    annotation=XsdAnnotation, element=XsdElement, group=XsdGroup,
+    choice=XsdChoice, sequence=XsdSequence, any=XsdAny)
+XsdAttribute.children = dispatch(
+    annotation=XsdAnnotation, simpleType=XsdSimpleType)
+XsdAttributeGroup.children = dispatch(
+    annotation=XsdAnnotation, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, anyAttribute=XsdAnyAttribute)
+XsdAnyAttribute.children = dispatch(annotation=XsdAnnotation)
+XsdAll.children = dispatch(annotation=XsdAnnotation, element=XsdElement)
+XsdChoice.children = dispatch(
+    annotation=XsdAnnotation, element=XsdElement, group=XsdGroup,
+    choice=XsdChoice, sequence=XsdSequence, any=XsdAny)
+XsdAny.children = dispatch(annotation=XsdAnnotation)
+XsdGroup.children = dispatch(
+    annotation=XsdAnnotation, all=XsdAll, choice=XsdChoice,
+    sequence=XsdSequence)
+XsdElement.children = dispatch(
+    annotation=XsdAnnotation, simpleType=XsdSimpleType,
+    complexType=XsdComplexType, key=XsdKey, keyref=XsdKeyref,
+    unique=XsdUnique)
+XsdSelector.children = dispatch(annotation=XsdAnnotation)
+XsdField.children = dispatch(annotation=XsdAnnotation)
+XsdUnique.children = dispatch(
+    annotation=XsdAnnotation, selector=XsdSelector, field=XsdField)
+XsdKey.children = XsdUnique.children
+XsdKeyref.children = XsdUnique.children
+XsdComplexType.children = dispatch(
+    annotation=XsdAnnotation, simpleContent=XsdSimpleContent,
+    complexContent=XsdComplexContent, group=XsdGroup, all=XsdAll,
+    choice=XsdChoice, sequence=XsdSequence, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, anyAttribute=XsdAnyAttribute)
+XsdInclude.children = dispatch(annotation=XsdAnnotation)
+XMLSchema.children = dispatch(
+    annotation=XsdAnnotation, include=XsdInclude, attribute=XsdAttribute,
+    attributeGroup=XsdAttributeGroup, element=XsdElement, group=XsdGroup,
+    simpleType=XsdSimpleType, complexType=XsdComplexType,
+    redefine=None, notation=None)
+# 'import' is a python keyword
+XMLSchema.children[xs('import')] = XsdImport
+
+#-------------------------------------------------------------------------------
+
+def write_json(x, f, indent=4, level=0, deep=True):
+    """Write component 'x' and its sub-elements as JSON to the file object
+    'f', without building the whole dictify() tree or the whole string: only
+    one component per nesting level is held in memory.
+
+    The text is the same as json.dumps(x.dictify(), indent=indent), indent
+    None gives the compact form, on one line.
+
+    """
+    if indent is None:
+        nl, sep = '', ', '
+    else:
+        nl, sep = '\n', ','
+    inner = nl + ' '*(indent or 0)*(level + 1)
+
+    f.write('{')
+    for i, (k, v) in enumerate(x.dictify(deep=False).items()):
+        f.write(f'{sep if i > 0 else ""}{inner}{json.dumps(k)}: '
+                f'{json.dumps(v)}')
+
+    elems = getattr(x, 'elems', ())
+    if deep and len(elems) > 0:
+        f.write(f'{sep}{inner}"elems": [')
+        for i, e in enumerate(elems):
+            f.write(f'{sep if i > 0 else ""}{inner}{" "*(indent or 0)}')
+            write_json(e, f, indent, level + 2)
+        f.write(f'{inner}]')
+    f.write(f'{nl}{" "*(indent or 0)*level}}}')
+
+#-------------------------------------------------------------------------------
+
+def parse_document(location):
+    """Return the root node of the schema document at 'location' (file path
+    or URL), comments removed.
+
+    """
+    p = et.XMLParser(remove_comments=True)
+    if is_url(location):
+        content = catalog.default_catalog().fetch(location)
+        return objectify.fromstring(content, parser=p)
+    return objectify.parse(location, parser=p).getroot()
+
+#-------------------------------------------------------------------------------
+
+class SchemaLoader:
+    """Loads a schema document and all the documents it includes or imports,
+    directly or indirectly.
+
+    Every schemaLocation is resolved to a canonical location (see
+    XsdInclude.locate), so each distinct document is loaded exactly once,
+    however many times and however it's referenced; loops are harmless. The
+    documents are read and parsed on a thread pool, lxml releases the GIL
+    while parsing, so independent branches of the include/import graph load
+    concurrently.
+
+    The 'annotations' mode says what's loaded for xs:annotation elements,
+    that validation and code generation never look at:
+      - 'full': everything, with the appinfo and documentation contents
+      - 'lines': empty XsdAnnotation objects, recording only their line
+        number, see XMLSchema.load_annotation()
+      - 'skip': nothing, the annotations are left out of the model
+
+    """
+    def __init__(self, max_workers=None, annotations='full'):
+        if annotations not in annotation_modes:
+            m = f'Unknown annotations mode "{annotations}", expected one of:' \
+                f' {", ".join(annotation_modes)}'
+            raise RuntimeError(m)
+        self.max_workers = max_workers
+        self.annotations = annotations
+
+        # Canonical location => XMLSchema
+        self.docs = {}
+
+        # Canonical location => (included locations, imported locations)
+        self.graph = {}
+
+    def read(self, location):
+        """Read, parse and build one schema document."""
+        root = parse_document(location)
+        if is_url(location):
+            dirpath, schema_location = None, location
+        else:
+            dirpath, schema_location = os.path.split(location)
+
+        # Drop what won't be built, in one pass through lxml
+        if self.annotations == 'skip':
+            et.strip_elements(root, xs('annotation'), with_tail=False)
+        elif self.annotations == 'lines':
+            et.strip_elements(root, xs('appinfo'), xs('documentation'),
+                              with_tail=False)
+
+        print(f'{self.__class__.__name__}: loaded {location}', file=sys.stderr)
+        return XMLSchema.build(root, dirpath, schema_location)
+
+    def load(self, location):
+        """Return the schema at 'location' (file path or URL), with its
+        inc_schemas and imp_schemas lists filled in.
+
+        """
+        if not is_url(location):
+            location = os.path.realpath(location)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.read, location): location}
+            while len(futures) > 0:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for f in done:
+                    loc = futures.pop(f)
+                    sch = self.docs[loc] = f.result()
+
+                    # Discover the documents referenced by this one
+                    incs = [x.locate(loc) for x in sch.includes]
+                    imps = [x.locate(loc) for x in sch.imports]
+                    incs = [x for x in incs if x is not None]
+                    imps = [x for x in imps if x is not None]
+                    self.graph[loc] = (incs, imps)
+
+                    for x in incs + imps:
+                        if x not in self.docs and x not in futures.values():
+                            futures[pool.submit(self.read, x)] = x
+
+        # Link the documents together
+        for loc, (incs, imps) in self.graph.items():
+            sch = self.docs[loc]
+            sch.inc_schemas = [self.docs[x] for x in dict.fromkeys(incs)]
+            sch.imp_schemas = [self.docs[x] for x in dict.fromkeys(imps)]
+
+        return self.docs[location]
+
+#-------------------------------------------------------------------------------
+
+def build_schema(filepath, annotations='full'):
+    xsd = XMLSchema.from_file(filepath, [], annotations=annotations)
+    xsd.assemble()
+    return xsd
+
+def load_schema(filepath, use_cache=True, annotations='full'):
+    """Return the assembled schema, from the on-disk cache if possible (see
+    schema_cache.py).
+
+    """
+    if not use_cache:
+        return build_schema(filepath, annotations)
+    return schema_cache.load(filepath,
+                             lambda x: build_schema(x, annotations),
+                             XMLSchema.locations, variant=annotations)
 
 #-------------------------------------------------------------------------------
 
-def parse_schema(filepath):
-    xsd = XMLSchema.from_file(filepath, [])
-    print(xsd)
+def parse_schema(filepath, use_cache=True, annotations='full'):
+    xsd = load_schema(filepath, use_cache, annotations)
+    xsd.write_json(sys.stdout)
+    print()
 
 #-------------------------------------------------------------------------------
 
 if __name__ == '__main__':
     # Command line argument
-    if len(sys.argv) != 2:
-        print(f'Usage: {sys.argv[0]} <xsd filepath>')
+    if len(sys.argv) not in [2, 3]:
+        print(f'Usage: {sys.argv[0]} <xsd filepath>'
+              f' [{"|".join(annotation_modes)}]')
         exit(-1)
     filepath = sys.argv[1]
+    annotations = sys.argv[2] if len(sys.argv) == 3 else 'full'
 
-    parse_schema(filepath)
+    parse_schema(filepath, annotations=annotations)
@@ -0,0 +1,216 @@
+# parse_xsd_t.py
+
+import io
+import os
+import json
+import glob
+import contextlib
+import tempfile
+import unittest
+import lxml.etree as et
+import catalog
+import schema_cache
+from parse_xsd import XMLSchema, XsdElement, XsdComplexType, XsdSequence, \
+    XsdAnnotation, XsdDocumentation, build_schema
+
+bpmn = 'http://www.omg.org/spec/BPMN/20100524/MODEL'
+bpmndi = 'http://www.omg.org/spec/BPMN/20100524/DI'
+dc = 'http://www.omg.org/spec/DD/20100524/DC'
+
+#-------------------------------------------------------------------------------
+
+class AssembleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xsd = XMLSchema.from_file('samples/bpmn/xsd/BPMN20.xsd', [])
+        cls.xsd.assemble()
+
+    def test_000_expand(self):
+        self.assertEqual(f'{{{bpmn}}}tProcess', self.xsd.expand('tProcess'))
+        self.assertEqual(f'{{{bpmndi}}}BPMNDiagram',
+                         self.xsd.expand('bpmndi:BPMNDiagram'))
+
+    def test_001_included_element(self):
+        # process is declared in Semantic.xsd, included by BPMN20.xsd
+        e = self.xsd.elements[f'{{{bpmn}}}process']
+        self.assertIsInstance(e, XsdElement)
+        self.assertEqual('Semantic.xsd', self.xsd.owner(e).schema_location)
+
+    def test_002_imported_type(self):
+        # Bounds is declared in DC.xsd, imported by BPMNDI.xsd
+        t = self.xsd.types[f'{{{dc}}}Bounds']
+        self.assertIsInstance(t, XsdComplexType)
+
+    def test_003_resolve(self):
+        e = self.xsd.get_element('definitions')
+        sch = self.xsd.owner(e)
+        t = self.xsd.get_type(e.type_, sch)
+        self.assertEqual('tDefinitions', t.name)
+        self.assertIsNone(self.xsd.get_type('xsd:string', sch))
+
+    def test_004_loaded_once(self):
+        # DC.xsd is imported by both BPMNDI.xsd and DI.xsd
+        names = [sch.schema_location for sch in self.xsd.schemas()]
+        self.assertEqual(1, names.count('DC.xsd'))
+        bpmndi = self.xsd.imp_schemas[0]
+        di = [x for x in bpmndi.imp_schemas if x.schema_location == 'DI.xsd']
+        self.assertIs(bpmndi.imp_schemas[0], di[0].imp_schemas[0])
+
+#-------------------------------------------------------------------------------
+
+class DispatchTest(unittest.TestCase):
+
+    def sequence(self, content):
+        s = '<xs:sequence xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+            f'{content}</xs:sequence>'
+        return XsdSequence.build(et.fromstring(s))
+
+    def test_000_children(self):
+        x = self.sequence('<xs:element name="a"/><xs:choice/><xs:any/>')
+        self.assertEqual(['XsdElement', 'XsdChoice', 'XsdAny'],
+                         [e.__class__.__name__ for e in x.elems])
+
+    def test_001_unexpected(self):
+        with self.assertRaisesRegex(RuntimeError, 'Unexpected tag "attribute"'
+                                    ' inside an xs:sequence'):
+            self.sequence('<xs:attribute name="a"/>')
+
+    def test_002_not_supported(self):
+        # Valid tags that aren't supported are skipped, with a warning
+        s = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+            '<xs:redefine schemaLocation="other.xsd"/>' \
+            '<xs:notation name="gif" public="image/gif"/>' \
+            '<xs:element name="a"/></xs:schema>'
+        f = io.StringIO()
+        with contextlib.redirect_stderr(f):
+            x = XMLSchema.build(et.fromstring(s), '.', 'x.xsd')
+        self.assertEqual(['XsdElement'],
+                         [e.__class__.__name__ for e in x.elems])
+        self.assertEqual(['Support for tag "redefine" not implemented',
+                          'Support for tag "notation" not implemented'],
+                         f.getvalue().splitlines())
+
+#-------------------------------------------------------------------------------
+
+class JsonTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xsd = build_schema('samples/bpmn/xsd/BPMN20.xsd')
+
+    def test_000_write_json(self):
+        for sch in self.xsd.schemas():
+            for indent in [4, None]:
+                f = io.StringIO()
+                sch.write_json(f, indent)
+                self.assertEqual(json.dumps(sch.dictify(), indent=indent),
+                                 f.getvalue())
+
+    def test_001_write_ndjson(self):
+        sch = self.xsd.inc_schemas[0]
+        f = io.StringIO()
+        sch.write_ndjson(f)
+        lines = [json.loads(x) for x in f.getvalue().splitlines()]
+        self.assertEqual(sch.dictify(deep=False), lines[0])
+        self.assertEqual([e.dictify() for e in sch.elems], lines[1:])
+
+#-------------------------------------------------------------------------------
+
+class CacheTest(unittest.TestCase):
+
+    def test_000_warm_start(self):
+        filepath = 'samples/bpmn/xsd/BPMN20.xsd'
+        with tempfile.TemporaryDirectory() as d:
+            cold = schema_cache.load(filepath, build_schema,
+                                     XMLSchema.locations, d)
+            self.assertEqual(1, len(glob.glob(os.path.join(d, '*.pickle'))))
+            warm = schema_cache.load(filepath, build_schema,
+                                     XMLSchema.locations, d)
+            self.assertIsNot(cold, warm)
+            self.assertEqual(str(cold), str(warm))
+            self.assertEqual(sorted(cold.elements), sorted(warm.elements))
+            e = warm.get_element('process')
+            self.assertEqual('Semantic.xsd', warm.owner(e).schema_location)
+
+    def test_001_bad_entry(self):
+        # An entry that can't be unpickled, whatever the exception, is a miss
+        filepath = 'samples/bpmn/xsd/DC.xsd'
+        with tempfile.TemporaryDirectory() as d:
+            schema_cache.load(filepath, build_schema, XMLSchema.locations, d)
+            manifest, = glob.glob(os.path.join(d, '*.deps'))
+            with open(manifest) as f:
+                self.assertEqual(['parse_xsd'], json.load(f)['modules'])
+            entry, = glob.glob(os.path.join(d, '*.pickle'))
+            for data in [b'', b'garbage', b'cno_such_module\nX\n.']:
+                with open(entry, 'wb') as f:
+                    f.write(data)
+                xsd = schema_cache.load(filepath, build_schema,
+                                        XMLSchema.locations, d)
+                self.assertIsNotNone(xsd.get_type('Point'))
+
+#-------------------------------------------------------------------------------
+
+class AnnotationsTest(unittest.TestCase):
+    lei = 'samples/lei/xsd/2017-03-21_lei-cdf-v2-1.xsd'
+
+    def annotations(self, xsd):
+        # Annotations of the global components
+        return [e for x in xsd.elems for e in getattr(x, 'elems', [])
+                if isinstance(e, XsdAnnotation)]
+
+    def test_000_full(self):
+        anns = self.annotations(build_schema(self.lei))
+        self.assertTrue(len(anns) > 0)
+        self.assertIsInstance(anns[0].elems[0], XsdDocumentation)
+
+    def test_001_lines(self):
+        full = self.annotations(build_schema(self.lei))
+        xsd = build_schema(self.lei, annotations='lines')
+        anns = self.annotations(xsd)
+        self.assertEqual([a.line for a in full], [a.line for a in anns])
+        self.assertEqual(0, sum(len(a.elems) for a in anns))
+
+        ann = xsd.load_annotation(anns[0])
+        self.assertEqual(full[0].dictify(), ann.dictify())
+
+    def test_002_skip(self):
+        xsd = build_schema(self.lei, annotations='skip')
+        self.assertEqual([], self.annotations(xsd))
+        self.assertIsInstance(xsd.get_element('LEIData'), XsdElement)
+
+    def test_003_unknown_mode(self):
+        with self.assertRaisesRegex(RuntimeError, 'Unknown annotations mode'):
+            build_schema(self.lei, annotations='none')
+
+#-------------------------------------------------------------------------------
+
+class CatalogTest(unittest.TestCase):
+
+    def test_000_bundled(self):
+        cat = catalog.default_catalog()
+        path = cat.resolve('http://www.w3.org/2001/03/xml.xsd')
+        self.assertEqual('http_www.w3.org_2001_03_xml.xsd',
+                         os.path.basename(path))
+        path = cat.resolve('https://www.w3.org/2001/xml.xsd')
+        self.assertEqual('https_www.w3.org_2001_xml.xsd',
+                         os.path.basename(path))
+        path = cat.resolve(None, 'http://www.w3.org/XML/1998/namespace')
+        self.assertTrue(os.path.isfile(path))
+
+    def test_001_offline(self):
+        cat = catalog.Catalog(offline=True)
+        self.assertIsNone(cat.resolve('http://example.com/foo.xsd'))
+        with self.assertRaises(RuntimeError):
+            cat.fetch('http://example.com/foo.xsd')
+
+    def test_002_import_from_catalog(self):
+        # collada imports http://www.w3.org/2001/03/xml.xsd
+        xsd = build_schema('samples/collada/xsd/collada_schema_1_4_1.xsd')
+        a = xsd.attributes['{http://www.w3.org/XML/1998/namespace}lang']
+        self.assertEqual('lang', a.name)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,205 @@
+# schema_cache.py - persistent on-disk cache of compiled schema models
+
+"""\
+Building the schema model means parsing every XSD file with lxml and creating
+the whole object graph, for big schemas (collada_schema_1_4_1.xsd) this takes
+a noticeable time. The cache stores the built model in pickled form, so that a
+warm start only needs to hash the files and unpickle.
+
+A cache entry is keyed by a hash of:
+  - the cache format version and the source of the module that builds the
+    model
+  - the source of every module whose classes are in the pickle (so that a
+    code change invalidates the old entries, the objects would be restored
+    with the new classes)
+  - the bytes of every file that contributed to the model (the root schema and
+    all its includes and imports)
+
+Since the lists of contributing files and of modules are only known after a
+build, a small manifest maps each root schema path to them. An entry that
+can't be unpickled for any reason is a cache miss, the model is built again.
+
+"""
+
+import io
+import os
+import sys
+import json
+import pickle
+import hashlib
+import importlib.util
+
+from catalog import is_url
+
+# Bump this whenever the cache layout changes
+version = '3'
+
+#-------------------------------------------------------------------------------
+
+def default_dir():
+    """The cache directory, $SCHEMAX_CACHE_DIR or ~/.cache/schemax."""
+    if 'SCHEMAX_CACHE_DIR' in os.environ:
+        return os.environ['SCHEMAX_CACHE_DIR']
+    return os.path.join(os.path.expanduser('~'), '.cache', 'schemax')
+
+def module_file(name):
+    """Return the path of the file of module 'name', None if it has none
+    (built-in modules), or if it can't be found.
+
+    """
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return getattr(mod, '__file__', None)
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec is not None and spec.has_location else None
+
+class ModuleRecorder(pickle.Unpickler):
+    """Unpickle a model, keeping the names of the modules of its classes."""
+    def __init__(self, f):
+        super().__init__(f)
+        self.modules = set()
+
+    def find_class(self, module, name):
+        self.modules.add(module)
+        return super().find_class(module, name)
+
+def pickled_modules(data):
+    """Return the sorted list of the modules whose classes (or functions)
+    are in the pickle 'data'.
+
+    """
+    r = ModuleRecorder(io.BytesIO(data))
+    r.load()
+    return sorted(r.modules)
+
+#-------------------------------------------------------------------------------
+
+class SchemaCache:
+    """A directory of pickled schema models."""
+    def __init__(self, dirpath=None):
+        self.dirpath = dirpath if dirpath is not None else default_dir()
+
+    def tool_id(self, build, variant=''):
+        """Identify the code that builds the model: its qualified name and
+        the source of its module. 'variant' tells apart models built by the
+        same code with different options.
+
+        """
+        name = f'{build.__module__}.{build.__qualname__}'
+        h = hashlib.sha256(f'{version}:{name}:{variant}'.encode())
+        mod = sys.modules[build.__module__]
+        if getattr(mod, '__file__', None) is not None:
+            with open(mod.__file__, 'rb') as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    def key(self, tool_id, deps, modules):
+        """Return the cache key for a model built from the 'deps' files,
+        that has classes from 'modules'.
+
+        Return None if one of the files can't be read anymore. URLs are hashed
+        by name only, their contents is assumed not to change, and so are
+        modules without a file.
+
+        """
+        h = hashlib.sha256(tool_id.encode())
+        for name in modules:
+            h.update(name.encode() + b'\0')
+            path = module_file(name)
+            if path is None:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                return None
+        for path in deps:
+            h.update(path.encode() + b'\0')
+            if is_url(path):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                return None
+        return h.hexdigest()
+
+    def manifest_path(self, tool_id, filepath):
+        name = hashlib.sha256(f'{tool_id}:{filepath}'.encode()).hexdigest()
+        return os.path.join(self.dirpath, f'{name}.deps')
+
+    def entry_path(self, key):
+        return os.path.join(self.dirpath, f'{key}.pickle')
+
+    def write(self, path, data):
+        # Write to a temporary file and rename it, concurrent runs (CI) must
+        # never see a partially written entry.
+        os.makedirs(self.dirpath, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(self, tool_id, filepath):
+        """Return the cached model for 'filepath', or None."""
+        try:
+            with open(self.manifest_path(tool_id, filepath), 'r',
+                      encoding='utf-8') as f:
+                manifest = json.load(f)
+            deps = manifest['deps']
+            modules = manifest['modules']
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+        key = self.key(tool_id, deps, modules)
+        if key is None:
+            return None
+        try:
+            with open(self.entry_path(key), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # Truncated or corrupt entry, or one that the code can't restore
+            # anymore (missing module or class, changed __setstate__...)
+            return None
+
+    def store(self, tool_id, filepath, obj, deps):
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        modules = pickled_modules(data)
+        key = self.key(tool_id, deps, modules)
+        if key is None:
+            return
+        self.write(self.entry_path(key), data)
+        manifest = {'deps': deps, 'modules': modules}
+        self.write(self.manifest_path(tool_id, filepath),
+                   json.dumps(manifest).encode())
+
+    def get(self, filepath, build, deps, variant=''):
+        """Return the model for schema 'filepath', from the cache if possible.
+
+        build(filepath) creates the model on a cache miss, and deps(model)
+        returns the list of the files (or URLs) that it was built from.
+
+        """
+        filepath = os.path.abspath(filepath)
+        tool_id = self.tool_id(build, variant)
+
+        obj = self.lookup(tool_id, filepath)
+        if obj is not None:
+            return obj
+
+        obj = build(filepath)
+        self.store(tool_id, filepath, obj, deps(obj))
+        return obj
+
+#-------------------------------------------------------------------------------
+
+def load(filepath, build, deps, dirpath=None, variant=''):
+    return SchemaCache(dirpath).get(filepath, build, deps, variant)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    print('This module is not meant to be executed directly.')
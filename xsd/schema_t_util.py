@@ -0,0 +1,31 @@
+# schema_t_util.py - schemas built from strings, for the unit tests
+
+import lxml.etree as et
+from parse_xsd import XMLSchema
+
+tns = 'http://example.com/t'
+
+#-------------------------------------------------------------------------------
+
+def schema(content, attrs='', prefix=False):
+    """Return the assembled schema of the 'content' components, in target
+    namespace tns. 'attrs' go on the xs:schema element, prefix: bind 't:' to
+    tns too (for XPaths, refer="t:...").
+
+    """
+    t = f' xmlns:t="{tns}"' if prefix else ''
+    s = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"' \
+        f' xmlns="{tns}"{t} targetNamespace="{tns}"' \
+        f' elementFormDefault="qualified"{attrs}>{content}</xs:schema>'
+    xsd = XMLSchema.build(et.fromstring(s), None, 'test.xsd')
+    xsd.assemble()
+    return xsd
+
+def q(name):
+    """Return the Clark notation of 'name' in tns."""
+    return f'{{{tns}}}{name}'
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    print('This module is not meant to be executed directly.')
@@ -0,0 +1,113 @@
+# substitution.py - transitive closure of the substitution groups of a schema
+
+"""\
+A reference to the head of a substitution group accepts the head itself and
+every member of the group, transitively: in BPMN, tasks are members of
+activity, itself a member of flowElement. The closure is computed once for
+the whole schema, each head gets the frozenset of the expanded names of the
+elements that can take its place, so that checking a child element is a
+single set lookup.
+
+Substitutions that the schema forbids are left out:
+  - abstract elements can't appear in a document, they're not members (an
+    abstract head isn't substitutable for itself either), but their own
+    members are
+  - final on the head (or finalDefault): a member whose type is derived from
+    the head's type by a final method isn't a member at all
+  - block on the head (or blockDefault): "substitution" blocks every member,
+    "extension" and "restriction" those whose type is derived from the head's
+    type by that method, anywhere along the derivation (see derivation.py)
+
+"""
+
+from derivation import DerivationIndex, blocked
+from facets import to_bool
+
+#-------------------------------------------------------------------------------
+
+class SubstitutionIndex:
+    """The substitution groups of an assembled schema (see
+    parse_xsd.load_schema), by expanded name.
+
+    """
+    def __init__(self, xsd, derivations=None):
+        self.xsd = xsd
+        self.derivations = derivations if derivations is not None \
+            else DerivationIndex(xsd)
+
+        # Head => frozenset of the elements that can take its place, the head
+        # itself included if it's not abstract
+        self.closure = {}
+
+        # Names of the abstract elements
+        self.abstract = frozenset(q for q, e in xsd.elements.items()
+                                  if to_bool(e.abstract))
+
+        # Head => direct members, those that the head's final allows
+        direct = {}
+        for qname, e in xsd.elements.items():
+            if e.substitutionGroup is None:
+                continue
+            sch = xsd.owner(e)
+            head = sch.expand(e.substitutionGroup)
+            h = xsd.elements.get(head)
+            if h is None:
+                continue
+            final = blocked(h.final, xsd.owner(h).finalDefault)
+            if len(final & self.derivation(qname, head)) == 0:
+                direct.setdefault(head, []).append(qname)
+
+        for head in direct:
+            h = xsd.elements[head]
+            block = blocked(h.block, xsd.owner(h).blockDefault)
+            arr = set()
+            if head not in self.abstract:
+                arr.add(head)
+            if 'substitution' not in block:
+                # Transitive members, a cycle (an invalid schema) stops
+                seen = {head}
+                stack = list(direct[head])
+                while len(stack) > 0:
+                    q = stack.pop()
+                    if q in seen:
+                        continue
+                    seen.add(q)
+                    stack.extend(direct.get(q, []))
+                    if q not in self.abstract and \
+                       len(block & self.derivation(q, head)) == 0:
+                        arr.add(q)
+            self.closure[head] = frozenset(arr)
+
+    def members(self, head):
+        """Return the frozenset of the elements that can appear where 'head'
+        is expected.
+
+        """
+        s = self.closure.get(head)
+        if s is not None:
+            return s
+        return frozenset() if head in self.abstract else frozenset([head])
+
+    def is_substitutable(self, member, head):
+        """True if element 'member' can appear where 'head' is expected (both
+        expanded names).
+
+        """
+        s = self.closure.get(head)
+        if s is not None:
+            return member in s
+        return member == head and head not in self.abstract
+
+    def heads(self):
+        return list(self.closure.keys())
+
+    def derivation(self, member, head):
+        """Return the set of the methods used to derive the type of element
+        'member' from the type of element 'head'.
+
+        """
+        d = self.derivations
+        m = self.xsd.elements[member]
+        h = self.xsd.elements[head]
+        return d.derivation(d.element_type(m, self.xsd.owner(m)),
+                            d.element_type(h, self.xsd.owner(h)))
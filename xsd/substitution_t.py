@@ -0,0 +1,85 @@
+# substitution_t.py
+
+import unittest
+import lxml.etree as et
+from substitution import SubstitutionIndex
+from xsd import SubstitutionGroups
+from schema_t_util import schema, q
+
+types = '''
+  <xs:complexType name="Base"/>
+  <xs:complexType name="Ext">
+    <xs:complexContent><xs:extension base="Base"/></xs:complexContent>
+  </xs:complexType>
+  <xs:complexType name="Res">
+    <xs:complexContent><xs:restriction base="Base"/></xs:complexContent>
+  </xs:complexType>
+  <xs:complexType name="ExtRes">
+    <xs:complexContent><xs:restriction base="Ext"/></xs:complexContent>
+  </xs:complexType>'''
+
+#-------------------------------------------------------------------------------
+
+class SubstitutionTest(unittest.TestCase):
+
+    def test_000_closure(self):
+        s = SubstitutionIndex(schema(types + '''
+          <xs:element name="flow" type="Base" abstract="true"/>
+          <xs:element name="activity" type="Ext" substitutionGroup="flow"
+                      abstract=" true "/>
+          <xs:element name="task" substitutionGroup="activity"/>
+          <xs:element name="gateway" type="Res" substitutionGroup="flow"/>
+          <xs:element name="other" type="Base"/>'''))
+        self.assertEqual({q('task'), q('gateway')}, s.members(q('flow')))
+        self.assertEqual({q('task')}, s.members(q('activity')))
+        self.assertTrue(s.is_substitutable(q('task'), q('flow')))
+        self.assertFalse(s.is_substitutable(q('flow'), q('flow')))
+        self.assertFalse(s.is_substitutable(q('activity'), q('flow')))
+        self.assertFalse(s.is_substitutable(q('gateway'), q('activity')))
+        # Not a head
+        self.assertTrue(s.is_substitutable(q('other'), q('other')))
+        self.assertEqual({q('task')}, s.members(q('task')))
+        self.assertEqual({q('flow'), q('activity')}, set(s.heads()))
+
+    def test_001_block(self):
+        content = '''
+          <xs:element name="head" type="Base" block="{}"/>
+          <xs:element name="ext" type="Ext" substitutionGroup="head"/>
+          <xs:element name="res" type="Res" substitutionGroup="head"/>
+          <xs:element name="extres" type="ExtRes" substitutionGroup="head"/>
+          <xs:element name="same" substitutionGroup="head"/>'''
+        def members(block):
+            s = SubstitutionIndex(schema(types + content.format(block)))
+            return {x.rpartition('}')[2] for x in s.members(q('head'))}
+        self.assertEqual({'head', 'ext', 'res', 'extres', 'same'},
+                         members(''))
+        self.assertEqual({'head', 'res', 'same'}, members('extension'))
+        self.assertEqual({'head', 'ext', 'same'}, members('restriction'))
+        self.assertEqual({'head'}, members('substitution'))
+        self.assertEqual({'head'}, members('#all'))
+
+    def test_002_final(self):
+        # A member that the head's final forbids isn't a member, its own
+        # members neither
+        s = SubstitutionIndex(schema(types + '''
+          <xs:element name="head" type="Base"/>
+          <xs:element name="ext" type="Ext" substitutionGroup="head"/>
+          <xs:element name="sub" substitutionGroup="ext"/>
+          <xs:element name="res" type="Res" substitutionGroup="head"/>''',
+                                     ' finalDefault="extension"'))
+        self.assertEqual({q('head'), q('res')}, s.members(q('head')))
+        self.assertEqual({q('ext'), q('sub')}, s.members(q('ext')))
+
+    def test_003_groups(self):
+        s = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+            '<xs:element name="a" abstract="\n true "/>' \
+            '<xs:element name="b" abstract="1"/>' \
+            '<xs:element name="c" abstract="false"/>' \
+            '<xs:element name="d" substitutionGroup="a"/></xs:schema>'
+        sg = SubstitutionGroups(et.fromstring(s))
+        self.assertEqual({'a', 'b'}, sg.abstract)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
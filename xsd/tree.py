@@ -1,20 +1,69 @@
 # tree.py - generic tree class, supporting tree creation from edges
 
 import json
+import mmap
+from array import array
+from collections import deque
 
 #-------------------------------------------------------------------------------
+# Traversals of the trees rooted at some Nodes, generating the Nodes. They
+# keep a stack (a queue, breadth-first) of iterators over the kids of the
+# Nodes being visited, no recursion and no list of the visited Nodes.
 
-class FoundException(Exception):
-    def __init__(self, msg, obj):
-        super().__init__(msg)
-        self.obj = obj
+def pre_order(roots):
+    """Generate the Nodes depth-first, each one before its kids."""
+    stack = [iter(roots)]
+    while len(stack) > 0:
+        nd = next(stack[-1], None)
+        if nd is None:
+            stack.pop()
+            continue
+        yield nd
+        if len(nd.kids) > 0:
+            stack.append(iter(nd.kids))
+
+def post_order(roots):
+    """Generate the Nodes depth-first, each one after its kids."""
+    # The Node whose kids each iterator goes through, None for the roots
+    nodes = [None]
+    stack = [iter(roots)]
+    while len(stack) > 0:
+        nd = next(stack[-1], None)
+        if nd is None:
+            stack.pop()
+            nd = nodes.pop()
+            if nd is not None:
+                yield nd
+        elif len(nd.kids) == 0:
+            yield nd
+        else:
+            nodes.append(nd)
+            stack.append(iter(nd.kids))
+
+def breadth_first(roots):
+    """Generate the Nodes level by level."""
+    queue = deque([iter(roots)])
+    while len(queue) > 0:
+        for nd in queue.popleft():
+            yield nd
+            if len(nd.kids) > 0:
+                queue.append(iter(nd.kids))
+
+def with_kids(roots):
+    """Generate the Nodes that have kids, in pre-order."""
+    for nd in pre_order(roots):
+        if len(nd.kids) > 0:
+            yield nd
 
 #-------------------------------------------------------------------------------
 
 class Node:
+    __slots__ = ('payload', 'kids', 'parent')
+
     def __init__(self, payload):
         self.payload = payload  # simple type or object
         self.kids = []
+        self.parent = None
 
     def dictify(self):
         return {
@@ -27,10 +76,16 @@ class Node:
 
     def show(self, level):
         ind = ' '*4
-        s = f'{ind*level}{self.payload}\n'
-        for k in self.kids:
-            s += k.show(level+1)
-        return s
+        arr = [f'{ind*level}{self.payload}\n']
+        stack = [iter(self.kids)]
+        while len(stack) > 0:
+            nd = next(stack[-1], None)
+            if nd is None:
+                stack.pop()
+                continue
+            arr.append(f'{ind*(level + len(stack))}{nd.payload}\n')
+            stack.append(iter(nd.kids))
+        return ''.join(arr)
 
     def is_parent(self, payload):
         # True if 'payload' is an immediate child of self
@@ -38,139 +93,505 @@ class Node:
             if k.payload == payload:
                 return True
         return False
-        
+
     def find(self, payload):
-        """Look for 'payload' in self's entire sub-tree"""
-        if self.payload == payload:
-            raise FoundException('Found node', self)
-        for k in self.kids:
-            k.find(payload)
+        """Look for 'payload' in self's entire sub-tree, return its Node or
+        None.
 
-    def ancestry(self, payload, ancestors):
-        """Return the list of ancestors for the node with this 'payload'."""
-        if self.payload == payload:
-            raise FoundException('Found node', ancestors)
-        for k in self.kids:
-            k.ancestry(payload, ancestors + [self.payload])
+        """
+        for nd in pre_order([self]):
+            if nd.payload == payload:
+                return nd
+        return None
+
+    def root(self):
+        nd = self
+        while nd.parent is not None:
+            nd = nd.parent
+        return nd
 
     def traverse(self, arr):
-        # FIXME implement a generator function
-        arr.append(self.payload)
-        for k in self.kids:
-            arr = k.traverse(arr)
+        arr.extend(nd.payload for nd in pre_order([self]))
         return arr
 
     def parents(self, arr):
-        if len(self.kids) > 0:
-            arr.append(self.payload)
-        for k in self.kids:
-            arr = k.parents(arr)
+        arr.extend(nd.payload for nd in with_kids([self]))
         return arr
 
     def children(self, obj):
-        if len(self.kids) > 0:
-            # FIXME this only works for hashable payloads
-            obj[self.payload] = [k.payload for k in self.kids]
-        for k in self.kids:
-            obj = k.children(obj)
+        # This only works for hashable payloads
+        for nd in with_kids([self]):
+            obj[nd.payload] = [k.payload for k in nd.kids]
         return obj
-    
+
 #-------------------------------------------------------------------------------
 
 def find(root, payload):
     """Look for 'payload' in tree 'root'."""
-    try:
-        root.find(payload)
-    except FoundException as e:
-        return e.obj
+    return root.find(payload)
 
 #-------------------------------------------------------------------------------
 
 class TreeSet:
-    """A set of trees"""
-    def __init__(self):
-        self.trees = []
+    """A set of trees, built from edges.
+
+    Every Node knows its parent, and the Node of each payload is found in a
+    dictionary: adding an edge costs O(1), child_of() O(1), ancestry() the
+    depth of the node. Payloads that can't be hashed (dicts...) are found by
+    comparing them to those of the other unhashable ones, unless a key is
+    given: the nodes are then found by key(payload), e.g. key=id to tell the
+    payloads apart by identity, or key=lambda t: t.name.
+
+    A payload that's added as the child of a second parent gets a second Node,
+    the first one is the one that's found. An edge that would close a cycle
+    doesn't move the root of the tree under one of its descendants, the child
+    gets a new Node too.
+
+    """
+    def __init__(self, key=None):
+        self.key = key
+
+        # Root Nodes, in the order the trees were started
+        self.roots = {}
+
+        # Payload (or its key) => Node, for the hashable ones
+        self.nodes = {}
+
+        # The Nodes whose payload isn't hashable
+        self.others = []
+
+        # (parent, child) payloads (or keys) of the edges, the hashable ones
+        self.edges = set()
+
+        # What from_edges() left out: the (parent, child) edges to a child
+        # that had a parent already, the cycles (lists of payloads, each one
+        # the parent of the next)
+        self.multiple = []
+        self.cycles = []
+
+    @classmethod
+    def from_edges(cls, edges, key=None, strict=False):
+        """Return the TreeSet of the (parent, child) 'edges', built in one
+        pass, in linear time (but for unhashable payloads without a key).
+
+        Unlike with add_edge(), the order of the edges doesn't matter (but for
+        the order of the kids): the roots are the payloads that are nobody's
+        child. An edge to a child that has a parent already is left out, and
+        kept in 'multiple'. A cycle is cut above the payload of the cycle that
+        came first, which becomes a root, and kept in 'cycles'. strict:
+        raise RuntimeError instead.
+
+        """
+        ts = cls(key)
+
+        # The Nodes, in the order their payloads came
+        order = []
+        for parent, child in edges:
+            nd = ts.node(parent)
+            if nd is None:
+                nd = ts.new_node(parent)
+                order.append(nd)
+            kid = ts.node(child)
+            if kid is None:
+                kid = ts.new_node(child)
+                order.append(kid)
+            if kid is nd:
+                ts.cycles.append([child])
+                continue
+            if kid.parent is not None:
+                if kid.parent is not nd:
+                    ts.multiple.append((parent, child))
+                continue
+            kid.parent = nd
+            nd.kids.append(kid)
+            try:
+                ts.edges.add((ts.ident(parent), ts.ident(child)))
+            except TypeError:
+                pass
+
+        # The Nodes that no root leads to are in cycles, each Node has one
+        # parent at most
+        reached = set(pre_order([nd for nd in order if nd.parent is None]))
+        rank = {nd: i for i, nd in enumerate(order)}
+        for nd in order:
+            if nd in reached:
+                continue
+            path = set()
+            while nd not in path:
+                path.add(nd)
+                nd = nd.parent
+            cycle = [nd]
+            first = nd
+            x = nd.parent
+            while x is not nd:
+                cycle.append(x)
+                if rank[x] < rank[first]:
+                    first = x
+                x = x.parent
+            # Cut above the first one
+            i = cycle.index(first)
+            cycle = cycle[i::-1] + cycle[:i:-1]
+            ts.cycles.append([x.payload for x in cycle])
+            first.parent.kids.remove(first)
+            try:
+                ts.edges.discard((ts.ident(first.parent.payload),
+                                  ts.ident(first.payload)))
+            except TypeError:
+                pass
+            first.parent = None
+            reached.update(pre_order([first]))
+
+        for nd in order:
+            if nd.parent is None:
+                ts.roots[nd] = None
+        if strict and (len(ts.multiple) > 0 or len(ts.cycles) > 0):
+            arr = [f'"{c}" has a parent already, not "{p}"'
+                   for p, c in ts.multiple]
+            arr.extend('Cycle: ' + ' => '.join(f'"{x}"' for x in cycle)
+                       for cycle in ts.cycles)
+            m = 'Not a forest:\n  ' + '\n  '.join(arr)
+            raise RuntimeError(m)
+        return ts
+
+    @property
+    def trees(self):
+        return list(self.roots)
 
     def dictify(self):
-        return [t.dictify() for t in self.trees]
+        return [t.dictify() for t in self.roots]
 
     # def __str__(self):
     #     return json.dumps(self.dictify(), indent=4)
 
     def __str__(self):
         s = ''
-        for t in self.trees:
+        for t in self.roots:
             s += t.show(0)
         return s
 
+    def ident(self, payload):
+        """Return what the Node of 'payload' is found by."""
+        return payload if self.key is None else self.key(payload)
+
+    def node(self, payload):
+        """Return the Node of 'payload', None if it's not in the trees."""
+        try:
+            return self.nodes.get(self.ident(payload))
+        except TypeError:
+            for nd in self.others:
+                if nd.payload == payload:
+                    return nd
+            return None
+
+    def new_node(self, payload):
+        nd = Node(payload)
+        try:
+            self.nodes.setdefault(self.ident(payload), nd)
+        except TypeError:
+            self.others.append(nd)
+        return nd
+
     def add_edge(self, parent, child):
-        # If this parent already exists, add child to it
-        # print(f'"{parent}" => "{child}"')
-        for t in self.trees:
-            nd = find(t, parent)
-            if nd is not None:
-                # Found parent. If child is one of the roots in trees, move it,
-                # else create a new Node
-                for t in self.trees:
-                    if t.payload == child:
-                        nd.kids.append(t)
-                        self.trees.remove(t)
-                        return
-                nd.kids.append(Node(child))
-                return
-
-        # Start a new tree
-        nd = Node(parent)
-        self.trees.append(nd)
-        # If child is one a root in trees, move it, else create a new Node
-        for t in self.trees:
-            if t.payload == child:
-                nd.kids.append(t)
-                self.trees.remove(t)
-                return
-        nd.kids.append(Node(child))
+        nd = self.node(parent)
+        if nd is None:
+            # Start a new tree
+            nd = self.new_node(parent)
+            self.roots[nd] = None
+
+        # If child is the root of another tree, move it, else create a new
+        # Node
+        kid = self.node(child)
+        if kid is not None and kid.parent is None and kid is not nd.root():
+            del self.roots[kid]
+        else:
+            kid = self.new_node(child)
+        kid.parent = nd
+        nd.kids.append(kid)
+        try:
+            self.edges.add((self.ident(parent), self.ident(child)))
+        except TypeError:
+            pass
 
     def child_of(self, child, parent):
-        # First we need to find 'parent' (we assume it's there)
-        for t in self.trees:
-            nd = find(t, parent)
-            if nd is not None:
-                # Then we search the immediate children of the parent
-                return nd.is_parent(child)
-        return False
+        try:
+            return (self.ident(parent), self.ident(child)) in self.edges
+        except TypeError:
+            nd = self.node(parent)
+            return nd is not None and nd.is_parent(child)
 
     def ancestry(self, payload):
         """Return the list of payload's ancestors (as a list of payloads)"""
-        for t in self.trees:
-            try:
-                t.ancestry(payload, [])
-            except FoundException as e:
-                return e.obj
-        return []
-
-    def traverse(self):
-        """Generate the list of nodes from a depth-first traversal."""
-        # FIXME implement a generator function
         arr = []
-        for t in self.trees:
-            arr = t.traverse(arr)
+        nd = self.node(payload)
+        while nd is not None and nd.parent is not None:
+            nd = nd.parent
+            arr.append(nd.payload)
+        arr.reverse()
         return arr
 
+    def pre_order(self):
+        """Generate the payloads depth-first, each one before its kids."""
+        return (nd.payload for nd in pre_order(self.roots))
+
+    def post_order(self):
+        """Generate the payloads depth-first, each one after its kids."""
+        return (nd.payload for nd in post_order(self.roots))
+
+    def breadth_first(self):
+        """Generate the payloads level by level, the roots first."""
+        return (nd.payload for nd in breadth_first(self.roots))
+
+    def iter_parents(self):
+        """Generate the payloads of the nodes that have kids, in pre-order."""
+        return (nd.payload for nd in with_kids(self.roots))
+
+    def traverse(self):
+        """Return the list of payloads from a depth-first traversal."""
+        return list(self.pre_order())
+
     def parents(self):
-        """Generate the list of nodes that are parents.
+        """Return the list of nodes that are parents.
 
         Parents are nodes that have len(kids) > 0."""
+        return list(self.iter_parents())
+
+    def children(self):
+        """Return the dictionary of (head, members), the heads by key if
+        there's one.
+
+        """
+        return {self.ident(nd.payload): [k.payload for k in nd.kids]
+                for nd in with_kids(self.roots)}
+
+    def pack(self, name=None):
+        """Return the compact form of the trees, see PackedForest.
+
+        name(payload) is the string a payload is saved as, by default its key
+        (or the payload itself), which must be a string.
+
+        """
+        if name is None:
+            name = self.ident
+
+        # Pre-order, with one counter for the pre and post-order numbers
+        index = {}
+        parent = array('i')
+        pre = array('i')
+        post = array('i')
+        names = []
+        count = 0
+        for t in self.roots:
+            stack = [(t, iter(t.kids))]
+            while len(stack) > 0:
+                nd, it = stack[-1]
+                if nd not in index:
+                    index[nd] = len(names)
+                    p = nd.parent
+                    parent.append(-1 if p is None else index[p])
+                    pre.append(count)
+                    post.append(0)
+                    count += 1
+                    s = name(nd.payload)
+                    if not isinstance(s, str):
+                        m = f'Payload name "{s}" is not a string'
+                        raise RuntimeError(m)
+                    names.append(s.encode('utf-8'))
+                k = next(it, None)
+                if k is None:
+                    post[index[nd]] = count
+                    count += 1
+                    stack.pop()
+                    continue
+                stack.append((k, iter(k.kids)))
+
+        offsets = array('i', [0])
+        for s in names:
+            offsets.append(offsets[-1] + len(s))
+        by_name = array('i', sorted(range(len(names)),
+                                    key=lambda i: (names[i], i)))
+        blob = b''.join(names)
+        header = array('i', [PackedForest.magic, len(names), len(blob)])
+        return b''.join([header.tobytes(), parent.tobytes(), pre.tobytes(),
+                         post.tobytes(), offsets.tobytes(),
+                         by_name.tobytes(), blob])
+
+#-------------------------------------------------------------------------------
+
+class PackedForest:
+    """The trees of a TreeSet in compact form, queried in place.
+
+    The nodes are numbered in pre-order. Arrays of ints give the index of the
+    parent of each node (-1 for a root), its pre and post-order numbers (one
+    counter for both, a node is below another one if and only if their
+    numbers are enclosed in the other's), and the offsets of the node names
+    in a table of UTF-8 strings. Another array orders the nodes by name,
+    names are looked up by binary search.
+
+    The data is read as is, from bytes or from a memory-mapped file: loading
+    doesn't create any Node, nor any Python object per node. Names are
+    compared as strings: the payloads come back as their names.
+
+    Lookups by name are binary searches, unless build_index() was called:
+    they are then O(1), at the cost of one pass over the names.
+
+    """
+    __slots__ = ('data', 'n', 'parent', 'pre', 'post', 'offsets', 'by_name',
+                 'blob', 'at')
+
+    # Also tells the byte order apart
+    magic = 0x54534631
+
+    def __init__(self, data):
+        self.data = data
+        mv = memoryview(data)
+        header = mv[:12].cast('i') if len(mv) >= 12 else [0]
+        if header[0] != self.magic:
+            m = 'Not a packed TreeSet (or of another byte order)'
+            raise RuntimeError(m)
+        n = self.n = header[1]
+
+        def ints(start, count):
+            return mv[start:start + 4*count].cast('i')
+
+        pos = 12
+        self.parent = ints(pos, n)
+        pos += 4*n
+        self.pre = ints(pos, n)
+        pos += 4*n
+        self.post = ints(pos, n)
+        pos += 4*n
+        self.offsets = ints(pos, n + 1)
+        pos += 4*(n + 1)
+        self.by_name = ints(pos, n)
+        pos += 4*n
+        self.blob = mv[pos:pos + header[2]]
+
+        # Name => node, see build_index()
+        self.at = None
+
+    @classmethod
+    def load(cls, filepath, use_mmap=True):
+        """Return the PackedForest saved in 'filepath', memory-mapped or in
+        a single read.
+
+        """
+        with open(filepath, 'rb') as f:
+            if use_mmap:
+                return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            return cls(f.read())
+
+    def save(self, filepath):
+        with open(filepath, 'wb') as f:
+            f.write(self.data)
+
+    def __reduce__(self):
+        # Pickled as its bytes
+        return (PackedForest, (bytes(self.data),))
+
+    def __len__(self):
+        return self.n
+
+    def __str__(self):
+        ind = ' '*4
         arr = []
-        for t in self.trees:
-            arr = t.parents(arr)
+        ends = []
+        for i in range(self.n):
+            while len(ends) > 0 and i >= ends[-1]:
+                ends.pop()
+            arr.append(f'{ind*len(ends)}{self.name(i)}\n')
+            ends.append(self.end(i))
+        return ''.join(arr)
+
+    def name(self, i):
+        """Return the name of node 'i'."""
+        return str(self.encoded(i), 'utf-8')
+
+    def encoded(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def build_index(self):
+        """Look the names up in a dictionary from now on."""
+        at = {}
+        # Backwards: the first node of a name in pre-order wins
+        for i in range(self.n - 1, -1, -1):
+            at[self.name(i)] = i
+        self.at = at
+
+    def index(self, name):
+        """Return the node of 'name' (the first one in pre-order), or -1."""
+        if self.at is not None:
+            return self.at.get(name, -1)
+        s = name.encode('utf-8')
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.encoded(self.by_name[mid]) < s:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n:
+            i = self.by_name[lo]
+            if self.encoded(i) == s:
+                return i
+        return -1
+
+    def end(self, i):
+        """Return the node after the sub-tree of node 'i'."""
+        return i + (self.post[i] - self.pre[i] + 1)//2
+
+    def kids(self, i):
+        """Generate the nodes whose parent is node 'i' (-1: the roots)."""
+        j, end = (0, self.n) if i < 0 else (i + 1, self.end(i))
+        while j < end:
+            yield j
+            j = self.end(j)
+
+    def roots(self):
+        return [self.name(i) for i in self.kids(-1)]
+
+    def child_of(self, child, parent):
+        i = self.index(child)
+        return i >= 0 and self.parent[i] >= 0 and \
+            self.name(self.parent[i]) == parent
+
+    def is_below(self, name, ancestor):
+        """True if 'name' is in the sub-tree of 'ancestor', but not it."""
+        i = self.index(name)
+        a = self.index(ancestor)
+        if i < 0 or a < 0:
+            return False
+        return self.pre[a] < self.pre[i] and self.post[i] < self.post[a]
+
+    def ancestry(self, name):
+        """Return the list of the ancestors of 'name', the root first."""
+        arr = []
+        i = self.index(name)
+        while i >= 0 and self.parent[i] >= 0:
+            i = self.parent[i]
+            arr.append(self.name(i))
+        arr.reverse()
         return arr
 
+    def pre_order(self):
+        return (self.name(i) for i in range(self.n))
+
+    def post_order(self):
+        # The nodes whose sub-tree isn't done
+        stack = []
+        for i in range(self.n):
+            while len(stack) > 0 and i >= self.end(stack[-1]):
+                yield self.name(stack.pop())
+            stack.append(i)
+        while len(stack) > 0:
+            yield self.name(stack.pop())
+
+    def traverse(self):
+        return list(self.pre_order())
+
     def children(self):
-        """Generate the dictionary of (head, members)."""
-        obj = {}
-        for t in self.trees:
-            obj = t.children(obj)
-        return obj
+        """Return the dictionary of (head, members)."""
+        return {self.name(i): [self.name(k) for k in self.kids(i)]
+                for i in range(self.n) if self.end(i) > i + 1}
 
 #-------------------------------------------------------------------------------
 
@@ -1,7 +1,10 @@
 # tree_t.py
 
+import os
+import pickle
+import tempfile
 import unittest
-from x4b.tree import TreeSet
+from x4b.tree import TreeSet, PackedForest
 
 # -----------------------------------------------------------------------------
 
@@ -182,6 +185,154 @@ class TreeT(unittest.TestCase):
         self.assertEqual(True, ts.child_of(C, A))
         self.assertEqual(True, ts.child_of(Cbis, A))
 
+    def test_010_moved_roots(self):
+        # Children first: their trees are moved under their parents
+        ts = TreeSet()
+        ts.add_edge('C', 'D')
+        ts.add_edge('B', 'C')
+        ts.add_edge('X', 'Y')
+        ts.add_edge('A', 'B')
+        self.assertEqual(['X', 'A'], [t.payload for t in ts.trees])
+        self.assertEqual(['A', 'B', 'C'], ts.ancestry('D'))
+        self.assertEqual(True, ts.child_of('C', 'B'))
+        self.assertEqual(['X', 'Y', 'A', 'B', 'C', 'D'], ts.traverse())
+
+    def test_011_cycle(self):
+        ts = TreeSet()
+        ts.add_edge('A', 'B')
+        ts.add_edge('B', 'A')
+        self.assertEqual(['A'], [t.payload for t in ts.trees])
+        self.assertEqual([], ts.ancestry('A'))
+        self.assertEqual(['A'], ts.ancestry('B'))
+        self.assertEqual(True, ts.child_of('A', 'B'))
+
+    def test_012_traversals(self):
+        ts = TreeSet()
+        for parent, child in [('A', 'B'), ('A', 'C'), ('C', 'D'), ('C', 'E'),
+                              ('F', 'G')]:
+            ts.add_edge(parent, child)
+        self.assertEqual(['A', 'B', 'C', 'D', 'E', 'F', 'G'],
+                         list(ts.pre_order()))
+        self.assertEqual(['B', 'D', 'E', 'C', 'A', 'G', 'F'],
+                         list(ts.post_order()))
+        self.assertEqual(['A', 'F', 'B', 'C', 'G', 'D', 'E'],
+                         list(ts.breadth_first()))
+        self.assertEqual(['A', 'C', 'F'], list(ts.iter_parents()))
+        self.assertEqual({'A': ['B', 'C'], 'C': ['D', 'E'], 'F': ['G']},
+                         ts.children())
+
+    def test_013_deep_chain(self):
+        # Deeper than the recursion limit
+        ts = TreeSet()
+        n = 5000
+        for i in range(n):
+            ts.add_edge(i, i + 1)
+        self.assertEqual(list(range(n + 1)), ts.traverse())
+        self.assertEqual(list(range(n, -1, -1)), list(ts.post_order()))
+        self.assertEqual(n, len(ts.parents()))
+        self.assertEqual(n, len(ts.ancestry(n)))
+
+    def test_014_key(self):
+        # By identity: Cbis is another payload
+        ts = TreeSet(key=id)
+        ts.add_edge(A, C)
+        ts.add_edge(C, D)
+        self.assertEqual(True, ts.child_of(C, A))
+        self.assertEqual(False, ts.child_of(Cbis, A))
+        self.assertEqual([A, C], ts.ancestry(D))
+        self.assertEqual([], ts.ancestry(Cbis))
+        self.assertEqual([], ts.others)
+
+        # By name: it's the same
+        ts = TreeSet(key=lambda x: x['name'])
+        ts.add_edge(C, D)
+        ts.add_edge(A, Cbis)
+        self.assertEqual(True, ts.child_of(Cbis, A))
+        self.assertEqual([A], [t.payload for t in ts.trees])
+        self.assertEqual([A, C], ts.ancestry(D))
+        self.assertEqual({'BaseElement': [Cbis], 'DataOutputAssociation': [D]},
+                         ts.children())
+
+    def test_015_from_edges(self):
+        # Children first: the roots don't depend on the order of the edges
+        edges = [('C', 'D'), ('B', 'C'), ('X', 'Y'), ('A', 'B')]
+        ts = TreeSet.from_edges(edges)
+        self.assertEqual(['X', 'A'], [t.payload for t in ts.trees])
+        self.assertEqual(['A', 'B', 'C'], ts.ancestry('D'))
+        self.assertEqual(['X', 'Y', 'A', 'B', 'C', 'D'], ts.traverse())
+        ts = TreeSet.from_edges(edges[::-1])
+        self.assertEqual(['A', 'X'], [t.payload for t in ts.trees])
+        self.assertEqual(['A', 'B', 'C'], ts.ancestry('D'))
+        self.assertEqual([], ts.multiple)
+        self.assertEqual([], ts.cycles)
+
+        # A second parent is left out, a repeated edge is not
+        ts = TreeSet.from_edges([('A', 'B'), ('A', 'B'), ('C', 'B')])
+        self.assertEqual(['A', 'C'], [t.payload for t in ts.trees])
+        self.assertEqual({'A': ['B']}, ts.children())
+        self.assertEqual([('C', 'B')], ts.multiple)
+
+    def test_016_from_edges_cycles(self):
+        edges = [('B', 'C'), ('C', 'A'), ('A', 'B'), ('D', 'D'), ('C', 'E')]
+        ts = TreeSet.from_edges(edges)
+        # Cut above B, which came first
+        self.assertEqual(['B', 'D'], [t.payload for t in ts.trees])
+        self.assertEqual(['B', 'C'], ts.ancestry('A'))
+        self.assertEqual(['B', 'C'], ts.ancestry('E'))
+        self.assertEqual([['D'], ['B', 'C', 'A']], ts.cycles)
+        self.assertEqual(False, ts.child_of('B', 'A'))
+        with self.assertRaises(RuntimeError) as cm:
+            TreeSet.from_edges(edges + [('E', 'C')], strict=True)
+        self.assertIn('"C" has a parent already, not "E"',
+                      str(cm.exception))
+        self.assertIn('Cycle: "B" => "C" => "A"', str(cm.exception))
+
+    def test_017_packed(self):
+        ts = TreeSet.from_edges([('C', 'D'), ('B', 'C'), ('X', 'Y'),
+                                 ('A', 'B'), ('A', 'É'), ('X', 'Z')])
+        pf = PackedForest(ts.pack())
+        self.assertEqual(8, len(pf))
+        self.assertEqual(['X', 'A'], pf.roots())
+        self.assertEqual(ts.traverse(), pf.traverse())
+        self.assertEqual(list(ts.post_order()), list(pf.post_order()))
+        self.assertEqual(ts.children(), pf.children())
+        self.assertEqual(str(ts), str(pf))
+        self.assertEqual(['A', 'B', 'C'], pf.ancestry('D'))
+        self.assertEqual(['A'], pf.ancestry('É'))
+        self.assertEqual(True, pf.child_of('D', 'C'))
+        self.assertEqual(False, pf.child_of('D', 'B'))
+        self.assertEqual(True, pf.is_below('D', 'A'))
+        self.assertEqual(False, pf.is_below('A', 'A'))
+        self.assertEqual(False, pf.is_below('Y', 'A'))
+        self.assertEqual(-1, pf.index('W'))
+        i = pf.index('C')
+        pf.build_index()
+        self.assertEqual(i, pf.index('C'))
+        self.assertEqual(-1, pf.index('W'))
+        self.assertEqual(['A', 'B', 'C'], pf.ancestry('D'))
+        self.assertEqual([], PackedForest(TreeSet().pack()).traverse())
+        with self.assertRaises(RuntimeError):
+            PackedForest(b'<xs:schema/>')
+
+    def test_018_packed_file(self):
+        # Payloads saved by key
+        ts = TreeSet(key=lambda x: x['name'])
+        ts.add_edge(A, B)
+        ts.add_edge(B, C)
+        pf = PackedForest(ts.pack())
+        self.assertEqual(['BaseElement', 'DataAssociation'],
+                         pf.ancestry('DataOutputAssociation'))
+        with tempfile.TemporaryDirectory() as d:
+            filepath = os.path.join(d, 'forest.bin')
+            pf.save(filepath)
+            for use_mmap in [True, False]:
+                x = PackedForest.load(filepath, use_mmap)
+                self.assertEqual(pf.traverse(), x.traverse())
+                x = pickle.loads(pickle.dumps(x))
+                self.assertEqual(pf.children(), x.children())
+        with self.assertRaises(RuntimeError):
+            TreeSet.from_edges([(1, 2)]).pack()
+
 #-------------------------------------------------------------------------------
 
 if __name__ == '__main__':
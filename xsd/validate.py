@@ -1,27 +1,104 @@
-# validate.py -
+# validate.py - validate an XML document against an XML Schema, using lxml
 
+import re
 import sys
 import lxml.etree as et
 
-def validate(xsd_filepath, xml_filepath):
-    # Construct the XMLSchema validator
+from validator import ValidationError, ErrorBuffer
+
+# libxml2's error types for the validation constraints, e.g.
+# SCHEMAV_CVC_COMPLEX_TYPE_2_4 for cvc-complex-type.2.4
+cvc_type_name = re.compile(r'SCHEMAV_(CVC_[A-Z_]+?)_(\d[\d_]*)$')
+
+# The others that have a constraint
+type_name_codes = {
+    'SCHEMAV_ELEMENT_CONTENT': 'cvc-complex-type.2.4',
+    'SCHEMAV_NOROOT': 'cvc-elt.1',
+    'SCHEMAV_UNDECLAREDELEM': 'cvc-elt.1',
+    'SCHEMAV_ISABSTRACT': 'cvc-elt.2',
+    'SCHEMAV_NOTNILLABLE': 'cvc-elt.3.1',
+    'SCHEMAV_HAVEDEFAULT': 'cvc-elt.3.2.2',
+    'SCHEMAV_NOTSIMPLE': 'cvc-type.3.1.1',
+}
+
+def compile_schema(xsd_filepath):
+    """Return the lxml validator for an XML Schema, compiling it is costly,
+    it should be done once for many documents.
+
+    """
     doc = et.parse(xsd_filepath)
-    xsd = et.XMLSchema(doc)
+    return et.XMLSchema(doc)
+
+def error_code(type_name):
+    """Return the code of the constraint from libxml2's error type name,
+    the name itself if it's not a validation constraint.
+
+    """
+    mo = cvc_type_name.match(type_name)
+    if mo is None:
+        return type_name_codes.get(type_name, type_name)
+    name, numbers = mo.groups()
+    return f'{name.lower().replace("_", "-")}.{numbers.replace("_", ".")}'
 
-    # Validate an instance document
+def validation_error(e):
+    """Return the ValidationError for an entry of lxml's error log."""
+    return ValidationError(e.line, e.path, e.message, error_code(e.type_name),
+                           e.column if e.column > 0 else None)
+
+def collect(xsd, xml_filepath, limit=None, stop=False):
+    """Validate a document with a compiled schema, return its errors in an
+    ErrorBuffer (see validator.py).
+
+    libxml2 always validates the whole document: stop only bounds the
+    buffer, the pass isn't any shorter. For a yes/no answer on large
+    documents, the streaming validator stops at the first error.
+
+    """
+    buffer = ErrorBuffer(limit, stop)
     doc = et.parse(xml_filepath)
-    r = xsd.validate(doc)
-    if not r:
-        print(xsd.error_log.last_error)
+    if not xsd.validate(doc):
+        for e in xsd.error_log:
+            if buffer.add(validation_error(e)):
+                break
+    return buffer
+
+def validate(xsd_filepath, xml_filepath, limit=None, stop=False):
+    # Construct the XMLSchema validator
+    xsd = compile_schema(xsd_filepath)
+
+    # Validate an instance document, print all the errors
+    errs = collect(xsd, xml_filepath, limit, stop)
+    for err in errs:
+        print(err)
+    if errs.stopped:
+        print(f'Stopped after {len(errs.errors)} error(s)')
+    elif errs.truncated():
+        print(f'{errs.count - len(errs.errors)} more error(s)')
+    return errs
 
 #-------------------------------------------------------------------------------
 
 if __name__ == '__main__':
-    # Command line argument
-    if len(sys.argv) != 3:
-        print(f'Usage: {sys.argv[0]} <xsd filepath> <xml_filepath>')
+    # Command line arguments: options first
+    args = sys.argv[1:]
+    limit = None
+    stop = False
+    while len(args) > 0 and args[0].startswith('--'):
+        opt = args.pop(0)
+        if opt == '--max-errors' and len(args) > 0:
+            limit = int(args.pop(0))
+        elif opt == '--stop':
+            stop = True
+        elif opt == '--fail-fast':
+            limit, stop = 1, True
+        else:
+            args = []
+    if len(args) != 2:
+        print(f'Usage: {sys.argv[0]} [--max-errors <n> [--stop] | --fail-fast]'
+              ' <xsd filepath> <xml_filepath>')
         exit(-1)
-    xsd_filepath = sys.argv[1]
-    xml_filepath = sys.argv[2]
+    xsd_filepath = args[0]
+    xml_filepath = args[1]
 
-    validate(xsd_filepath, xml_filepath)
+    errs = validate(xsd_filepath, xml_filepath, limit, stop)
+    exit(0 if errs.count == 0 else 1)
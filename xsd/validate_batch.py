@@ -0,0 +1,197 @@
+# validate_batch.py - validate many XML documents against one XML Schema
+
+"""\
+The schema is compiled once per worker process, then the documents are fanned
+out across a process pool. One JSON line is written per document, in the
+order the documents were given:
+
+    {"file": "a.bpmn", "valid": false, "bytes": 1234, "ms": 2.1,
+     "error_count": 1, "truncated": false,
+     "errors": [{"line": 12, "column": null, "path": "/definitions/process",
+                 "code": "cvc-complex-type.2.4.a", "message": "..."}]}
+
+Documents that can't be read or parsed get a "failure" instead of "errors".
+Only the first max_errors errors of a document are kept (all of them by
+default), the others are just counted. With fail_fast, validation of a
+document stops at its first error: the native engine doesn't read the rest
+of the document, libxml2 always makes a full pass.
+A summary, with the throughput in files/s and MB/s, goes to stderr.
+
+Two engines are available: lxml (libxml2's validator, the default) and
+native (validator.py, streaming, on the parse_xsd model).
+
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.etree as et
+
+import validate
+from parse_xsd import load_schema
+from validator import Validator
+
+engines = ['lxml', 'native']
+
+# The validator of the worker process, see init_worker()
+worker = None
+
+#-------------------------------------------------------------------------------
+
+def instances(args):
+    """Yield the document paths given by 'args': files, directories (all the
+    files below them, sorted) or glob patterns. '-' reads the paths from
+    stdin, one per line.
+
+    """
+    for arg in args:
+        if arg == '-':
+            for line in sys.stdin:
+                if line.strip() != '':
+                    yield line.strip()
+        elif os.path.isdir(arg):
+            for dirpath, dirnames, filenames in os.walk(arg):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    yield os.path.join(dirpath, name)
+        elif glob.has_magic(arg):
+            yield from sorted(glob.glob(arg, recursive=True))
+        else:
+            yield arg
+
+#-------------------------------------------------------------------------------
+
+class LxmlWorker:
+    def __init__(self, xsd_filepath, limit=None, stop=False):
+        self.xsd = validate.compile_schema(xsd_filepath)
+        self.limit = limit
+        self.stop = stop
+
+    def errors(self, filepath):
+        return validate.collect(self.xsd, filepath, self.limit, self.stop)
+
+class NativeWorker:
+    def __init__(self, xsd_filepath, limit=None, stop=False):
+        self.validator = Validator(load_schema(xsd_filepath))
+        self.limit = limit
+        self.stop = stop
+
+    def errors(self, filepath):
+        return self.validator.collect(filepath, self.limit, self.stop)
+
+def init_worker(xsd_filepath, engine, limit=None, stop=False):
+    """Compile the schema, once per process."""
+    global worker
+    if engine == 'lxml':
+        worker = LxmlWorker(xsd_filepath, limit, stop)
+    else:
+        worker = NativeWorker(xsd_filepath, limit, stop)
+
+def validate_file(filepath):
+    """Validate one document with the worker's validator, return its result
+    as a dict.
+
+    """
+    d = {'file': filepath}
+    t0 = time.perf_counter()
+    try:
+        d['bytes'] = os.path.getsize(filepath)
+        errs = worker.errors(filepath)
+        d['valid'] = errs.count == 0
+        d['error_count'] = errs.count
+        d['truncated'] = errs.truncated()
+        d['errors'] = [e.dictify() for e in errs]
+    except (OSError, et.XMLSyntaxError) as e:
+        d['valid'] = False
+        d['failure'] = f'{e.__class__.__name__}: {e}'
+    d['ms'] = round((time.perf_counter() - t0)*1000, 3)
+    return d
+
+#-------------------------------------------------------------------------------
+
+def validate_batch(xsd_filepath, filepaths, f=sys.stdout, engine='lxml',
+                   jobs=None, chunksize=16, max_errors=None, fail_fast=False):
+    """Validate the documents of 'filepaths', write one JSON line per
+    document to file object 'f'. Return the summary as a dict.
+
+    jobs is the number of worker processes (by default, one per CPU), 1
+    validates in this process. max_errors bounds the errors kept per
+    document, fail_fast stops at the first one.
+
+    """
+    limit, stop = (1, True) if fail_fast else (max_errors, False)
+    if engine not in engines:
+        m = f'Unknown engine "{engine}", expected one of: {", ".join(engines)}'
+        raise RuntimeError(m)
+
+    summary = {'files': 0, 'valid': 0, 'invalid': 0, 'failed': 0,
+               'bytes': 0}
+    t0 = time.perf_counter()
+
+    def output(results):
+        for d in results:
+            f.write(json.dumps(d) + '\n')
+            summary['files'] += 1
+            summary['bytes'] += d.get('bytes', 0)
+            if 'failure' in d:
+                summary['failed'] += 1
+            elif d['valid']:
+                summary['valid'] += 1
+            else:
+                summary['invalid'] += 1
+
+    if jobs == 1:
+        init_worker(xsd_filepath, engine, limit, stop)
+        output(validate_file(x) for x in filepaths)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(xsd_filepath, engine, limit,
+                                           stop)) as pool:
+            output(pool.map(validate_file, filepaths, chunksize=chunksize))
+
+    t = time.perf_counter() - t0
+    summary['seconds'] = round(t, 3)
+    summary['files_per_s'] = round(summary['files']/t, 1) if t > 0 else None
+    summary['mb_per_s'] = round(summary['bytes']/1e6/t, 2) if t > 0 else None
+    return summary
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line arguments: options first
+    args = sys.argv[1:]
+    engine = 'lxml'
+    jobs = None
+    max_errors = None
+    fail_fast = False
+    while len(args) > 0 and args[0].startswith('--'):
+        opt = args.pop(0)
+        if opt == '--native':
+            engine = 'native'
+        elif opt == '--jobs' and len(args) > 0:
+            jobs = int(args.pop(0))
+        elif opt == '--max-errors' and len(args) > 0:
+            max_errors = int(args.pop(0))
+        elif opt == '--fail-fast':
+            fail_fast = True
+        else:
+            args = []
+    if len(args) < 2:
+        print(f'Usage: {sys.argv[0]} [--native] [--jobs <n>]'
+              ' [--max-errors <n> | --fail-fast] <xsd filepath>'
+              ' <file | directory | glob | - >...')
+        exit(-1)
+    xsd_filepath = args[0]
+
+    s = validate_batch(xsd_filepath, instances(args[1:]), engine=engine,
+                       jobs=jobs, max_errors=max_errors,
+                       fail_fast=fail_fast)
+    print(f'{s["files"]} files ({s["valid"]} valid, {s["invalid"]} invalid,'
+          f' {s["failed"]} failed), {s["bytes"]/1e6:.1f} MB in'
+          f' {s["seconds"]:.2f} s: {s["files_per_s"]} files/s,'
+          f' {s["mb_per_s"]} MB/s', file=sys.stderr)
+    exit(0 if s['invalid'] + s['failed'] == 0 else 1)
@@ -0,0 +1,57 @@
+# validate_batch_t.py
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from validate_batch import instances, validate_batch
+
+xsd = 'samples/bpmn/xsd/BPMN20.xsd'
+
+#-------------------------------------------------------------------------------
+
+class BatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.d = tempfile.mkdtemp()
+        for name in ['EmailVoting2', 'TravelBooking']:
+            shutil.copy(f'samples/bpmn/xml/{name}.bpmn', cls.d)
+        os.mkdir(os.path.join(cls.d, 'sub'))
+        with open(os.path.join(cls.d, 'sub', 'broken.bpmn'), 'w') as f:
+            f.write('<definitions')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.d)
+
+    def run_batch(self, **kwargs):
+        f = io.StringIO()
+        s = validate_batch(xsd, instances([self.d]), f, **kwargs)
+        return s, [json.loads(x) for x in f.getvalue().splitlines()]
+
+    def test_000_instances(self):
+        names = [os.path.relpath(x, self.d) for x in instances([self.d])]
+        self.assertEqual(['EmailVoting2.bpmn', 'TravelBooking.bpmn',
+                          'sub/broken.bpmn'], names)
+        names = list(instances([os.path.join(self.d, '*.bpmn')]))
+        self.assertEqual(2, len(names))
+
+    def test_001_lxml(self):
+        s, results = self.run_batch(jobs=1)
+        self.assertEqual((3, 2, 0, 1), (s['files'], s['valid'],
+                                        s['invalid'], s['failed']))
+        self.assertTrue(results[0]['valid'])
+        self.assertIn('XMLSyntaxError', results[2]['failure'])
+
+    def test_002_native_pool(self):
+        s, results = self.run_batch(engine='native', jobs=2)
+        self.assertEqual((3, 2, 1), (s['files'], s['valid'], s['failed']))
+        self.assertEqual([True, True, False], [x['valid'] for x in results])
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
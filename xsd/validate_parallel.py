@@ -0,0 +1,525 @@
+# validate_parallel.py - validate one large document with several processes
+
+"""\
+A large document often is a long list of independent parts: the processes
+and collaborations of a BPMN definitions element, the library_* elements of a
+COLLADA file. Above a size threshold, the document is split at the children
+of its root element and the parts are validated in parallel, by worker
+processes:
+
+  - one cheap scan of the bytes of the document finds where the children of
+    the root element start and end (the end tag of each child is searched
+    for, the inside of the children isn't tokenized)
+  - the main process checks the root element: its attributes, the sequence of
+    its children against its content model (from the start tags of the
+    children only), the text between them
+  - the children are grouped in consecutive runs, a worker validates each
+    run inside a copy of the root's start tag, the state of the root's
+    content model before the run is sent along
+  - the key and unique tables of the root's identity constraints, and the
+    values of its keyrefs, are sent back by the workers and merged in
+    document order, the duplicates across parts and the keyrefs are checked
+    at the end (see identity.py)
+  - so are the xs:ID values of each part (where a duplicate would be
+    reported) and its IDREFs to IDs it doesn't have (see validator.IdTable)
+
+The errors are those of the streaming validator (see validator.py), the root
+element's first, then the parts' in document order, then those of the
+root's identity constraints and content.
+
+Documents that can't be split this way are validated in one piece: smaller
+than the threshold, with an internal DTD subset (entities), not encoded in
+an ASCII superset, or whose root has identity constraints that select the
+root itself. If a worker finds a syntax error, the document is validated in
+one piece again, for the error to be reported as usual.
+
+"""
+
+import io
+import os
+import re
+import mmap
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.etree as et
+
+from parse_xsd import load_schema
+from validator import Validator, ValidationError, Frame, IdTable
+from identity import IdentityState, Scope
+
+# Start tag: name, '/' if it's an empty element tag
+start_tag_re = re.compile(rb'<([^\s/>!?]+)(?:\s+[^\s=/>]+\s*=\s*'
+                          rb'(?:"[^"]*"|\'[^\']*\'))*\s*(/?)>')
+
+xml_decl_re = re.compile(rb'<\?xml\s[^>]*\?>')
+encoding_re = re.compile(rb'encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+# Documents from 4 MB are split
+default_threshold = 4*1024*1024
+
+#-------------------------------------------------------------------------------
+# Scan
+
+class Layout:
+    """Where the parts of a document are, as byte offsets.
+
+    decl: the XML declaration, b'' if there's none
+    root: (start, end) of the start tag of the root element
+    children: (start, end) of each child element of the root, in order
+    close: start of the end tag of the root element
+
+    """
+    __slots__ = ('decl', 'root', 'children', 'close')
+
+    def __init__(self, decl, root, children, close):
+        self.decl = decl
+        self.root = root
+        self.children = children
+        self.close = close
+
+# The bytes of the document are read in place, memory-mapped: bytes and mmap
+# objects have find() and slicing in common, not startswith() nor count()
+
+def at(data, i, s):
+    """True if the bytes 's' are found at 'i'."""
+    return data[i:i + len(s)] == s
+
+def newlines(data, start, end):
+    return data[start:end].count(b'\n')
+
+def skip_markup(data, i):
+    """Return the end of the comment, PI or CDATA section at 'i', None if
+    there's none there, -1 if it's not closed.
+
+    """
+    for start, end in ((b'<!--', b'-->'), (b'<?', b'?>'),
+                       (b'<![CDATA[', b']]>')):
+        if at(data, i, start):
+            j = data.find(end, i + len(start))
+            return j + len(end) if j >= 0 else -1
+    return None
+
+def element_end(data, pos, name, tags):
+    """Return the end of the element named 'name' whose start tag ends at
+    'pos', None if it's not found. 'tags' caches the regexes of the start and
+    end tags, by name (they also find the comments, PIs and CDATA sections,
+    which are skipped).
+
+    """
+    tag_re = tags.get(name)
+    if tag_re is None:
+        tag_re = re.compile(rb'<(?:(/?)' + re.escape(name)
+                            + rb'[\s/>]|!--|\?|!\[CDATA\[)')
+        tags[name] = tag_re
+    depth = 1
+    while True:
+        mo = tag_re.search(data, pos)
+        if mo is None:
+            return None
+        if mo.group(1) is None:
+            pos = skip_markup(data, mo.start())
+            if pos < 0:
+                return None
+            continue
+        if mo.group(1) == b'/':
+            pos = data.find(b'>', mo.end() - 1) + 1
+            if pos == 0:
+                return None
+            depth -= 1
+            if depth == 0:
+                return pos
+            continue
+        mo = start_tag_re.match(data, mo.start())
+        if mo is None:
+            return None
+        if mo.group(2) != b'/':
+            depth += 1
+        pos = mo.end()
+
+def scan(data):
+    """Return the Layout of the document whose bytes are 'data', None if it
+    can't be split.
+
+    """
+    if data[:2] in (b'\xff\xfe', b'\xfe\xff', b'\x00<', b'<\x00'):
+        # UTF-16
+        return None
+    pos = 3 if at(data, 0, b'\xef\xbb\xbf') else 0
+    decl = b''
+    mo = xml_decl_re.match(data, pos)
+    if mo is not None:
+        decl = mo.group()
+        enc = encoding_re.search(decl)
+        if enc is not None and enc.group(1).lower().startswith(b'utf-16'):
+            return None
+        pos = mo.end()
+
+    # Prolog: comments, PIs, DOCTYPE without an internal subset
+    while True:
+        i = data.find(b'<', pos)
+        if i < 0:
+            return None
+        j = skip_markup(data, i)
+        if j is not None:
+            if j < 0:
+                return None
+            pos = j
+        elif at(data, i, b'<!'):
+            j = data.find(b'>', i)
+            if j < 0 or b'[' in data[i:j]:
+                return None
+            pos = j + 1
+        else:
+            break
+    root = start_tag_re.match(data, i)
+    if root is None or root.group(2) == b'/':
+        return None
+
+    children = []
+    tags = {}
+    pos = root.end()
+    while True:
+        i = data.find(b'<', pos)
+        if i < 0:
+            return None
+        j = skip_markup(data, i)
+        if j is not None:
+            if j < 0:
+                return None
+            pos = j
+            continue
+        if at(data, i, b'</'):
+            break
+        mo = start_tag_re.match(data, i)
+        if mo is None:
+            return None
+        end = mo.end() if mo.group(2) == b'/' else \
+            element_end(data, mo.end(), mo.group(1), tags)
+        if end is None:
+            return None
+        children.append((i, end))
+        pos = end
+    return Layout(decl, (root.start(), root.end()), children, i)
+
+def flat(tag):
+    """Return start tag 'tag' on a single line: a new line in an attribute
+    value is normalized into a space anyway.
+
+    """
+    return tag.replace(b'\r', b' ').replace(b'\n', b' ')
+
+#-------------------------------------------------------------------------------
+# Workers
+
+def part_errors(validator, source, state, offset):
+    """Validate the children of the root element of 'source', a run of
+    children of the document's root, starting in 'state' of the root's
+    content model. 'offset' is added to the line numbers.
+
+    Return (errors, tables, refs, ids, idrefs): the list of the errors found
+    in each child, the tables and keyref values of the root's identity
+    constraints, the (value, ValidationError, child, index in its errors) of
+    the IDs and the (value, ValidationError) of the IDREFs to IDs not found.
+
+    """
+    v = validator
+    stack = []
+    skip = 0
+    errors = []
+    kids = []
+    identity = IdentityState(v.constraints, ValidationError)
+    id_table = IdTable([])
+    context = et.iterparse(source, events=('start', 'end'),
+                           remove_comments=True, remove_pis=True,
+                           huge_tree=True)
+    for event, elem in context:
+        if skip > 0:
+            if event == 'start':
+                skip += 1
+            else:
+                skip -= 1
+                if skip == 0:
+                    elem.clear(keep_tail=True)
+            continue
+
+        if event == 'start':
+            if len(stack) == 0:
+                # The root element is checked by the main process
+                etype = v.root(elem, [])
+                stack.append(Frame(elem.tag, elem.sourceline, etype, state))
+                if len(etype.constraints) > 0:
+                    identity.start(elem, stack, errors)
+                continue
+            if len(stack) == 1:
+                # So is its content model, and the text between its children
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+                etype = v.child(elem, stack, [])
+                errors = []
+                kids.append(errors)
+            else:
+                etype = v.enter(elem, stack, errors)
+            if etype is None:
+                skip = 1
+            else:
+                stack.append(v.start(elem, etype, stack, errors, id_table))
+                if len(identity.scopes) > 0 or len(etype.constraints) > 0:
+                    identity.start(elem, stack, errors)
+        elif len(stack) > 1:
+            v.leave(elem, stack, errors, identity, id_table)
+    del context
+
+    for errors in kids:
+        fix_lines(errors, offset)
+    index = {id(errors): i for i, errors in enumerate(kids)}
+    ids = [(value, err, index[id(errors)], i)
+           for value, err, errors, i in id_table.found]
+    fix_lines([x[1] for x in ids], offset)
+    idrefs = id_table.refs
+    fix_lines([x[1] for x in idrefs], offset)
+    tables = {}
+    refs = []
+    if len(identity.scopes) > 0:
+        scope = identity.scopes[0]
+        for name, table in scope.tables.items():
+            tables[name] = {values: entry if entry is None
+                            else (entry[0] + offset,) + entry[1:]
+                            for values, entry in table.items()}
+        refs = [(c.name, values, lexicals, line + offset, path)
+                for c, values, lexicals, line, path in scope.refs]
+    return kids, tables, refs, ids, idrefs
+
+def init_worker(xsd_filepath):
+    """Load the schema, once per process."""
+    global validator
+    validator = Validator(load_schema(xsd_filepath))
+
+def validate_run(filepath, head, tail, start, end, state, offset):
+    """Validate the bytes from 'start' to 'end' of a document, a run of
+    children of its root, between 'head' and 'tail'. Return None if it isn't
+    well-formed (lxml's XMLSyntaxError can't be pickled).
+
+    """
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start)
+    try:
+        return part_errors(validator, io.BytesIO(head + body + tail), state,
+                           offset)
+    except et.XMLSyntaxError:
+        return None
+
+#-------------------------------------------------------------------------------
+
+class ParallelValidator:
+    """Validates documents against the schema of 'xsd_filepath', splitting
+    those of at least 'threshold' bytes between 'jobs' worker processes (by
+    default, one per CPU). The workers are started by the first document
+    that's split, and kept until close().
+
+    """
+    def __init__(self, xsd_filepath, jobs=None, threshold=default_threshold):
+        self.xsd_filepath = xsd_filepath
+        self.validator = Validator(load_schema(xsd_filepath))
+        self.jobs = jobs if jobs is not None else os.cpu_count()
+        self.threshold = threshold
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def validate(self, filepath):
+        """Return the list of the errors found in the document."""
+        size = os.path.getsize(filepath)
+        if size >= self.threshold and size > 0:
+            with open(filepath, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with data:
+                layout = scan(data)
+                if layout is not None and len(layout.children) >= 2:
+                    try:
+                        errors = self.validate_parts(filepath, data, layout)
+                    except et.XMLSyntaxError:
+                        # Reported where it is
+                        errors = None
+                    if errors is not None:
+                        return errors
+        return self.validator.validate(filepath)
+
+    def text(self, data, start, end):
+        """Return the text between 'start' and 'end', None if it's only
+        whitespace (markup included).
+
+        """
+        raw = data[start:end]
+        if raw.strip() == b'':
+            return None
+        parser = et.XMLParser(remove_comments=True, remove_pis=True)
+        return et.fromstring(b'<x>' + raw + b'</x>', parser).text
+
+    def validate_parts(self, filepath, data, layout):
+        """Return the errors of the document, validated in parts, None if a
+        part isn't well-formed.
+
+        """
+        v = self.validator
+        start, end = layout.root
+        head = flat(data[start:end])
+        name = start_tag_re.match(head).group(1)
+        tail = b'</' + name + b'>'
+
+        # The root element, the line its start tag ends on
+        errors = []
+        line = newlines(data, 0, end) + 1
+        elem = et.fromstring(layout.decl + head + tail)
+        etype = v.root(elem, errors)
+        if etype is None:
+            return fix_lines(errors, line - 1)
+        if any(len(p.steps) == 0 for c in etype.constraints
+               for p in c.selector):
+            return v.validate(filepath)
+        stack = []
+        id_table = IdTable()
+        frame = v.start(elem, etype, stack, errors, id_table)
+        fix_lines(errors, line - 1)
+        fix_lines([x[1] for x in id_table.refs], line - 1)
+        for value in id_table.ids:
+            id_table.ids[value] = line
+        frame.line = line
+        stack.append(frame)
+
+        # Its children: the runs of the workers, and the state of the
+        # content model before each one. The errors found before each
+        # child: the text before it, the child against the content model
+        size = max((layout.close - end)//(self.jobs*4), 1)
+        runs = []
+        before = []
+        pos = end
+        for start, end in layout.children:
+            kid_errors = []
+            v.check_between(self.text(data, pos, start), frame, kid_errors,
+                            stack)
+            line += newlines(data, pos, start)
+            if len(runs) == 0 or runs[-1][1] - runs[-1][0] >= size:
+                runs.append([start, end, frame.state, line - 1])
+            else:
+                runs[-1][1] = end
+            tag = start_tag_re.match(data, start)
+            kid = et.fromstring(layout.decl + head
+                                + flat(tag.group()).rstrip(b'/>') + b'/>'
+                                + tail)[0]
+            n = len(kid_errors)
+            v.child(kid, stack, kid_errors)
+            fix_lines(kid_errors[n:], line - 1
+                      + newlines(data, start, tag.end()))
+            before.append(kid_errors)
+            line += newlines(data, start, end)
+            pos = end
+        text = self.text(data, pos, layout.close)
+        if frame.nil:
+            # The children are errors already
+            runs = []
+
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                            initializer=init_worker,
+                                            initargs=(self.xsd_filepath,))
+        head = layout.decl + head
+        futures = [self.pool.submit(validate_run, filepath, head, tail,
+                                    start, end, state, offset)
+                   for start, end, state, offset in runs]
+
+        # The root's identity constraints, over all the parts
+        identity = IdentityState(v.constraints, ValidationError)
+        scope = Scope(0, etype.constraints)
+        kids = iter(before)
+        merged = []
+        for i, future in enumerate(futures):
+            result = future.result()
+            if result is None:
+                # A syntax error, reported where it is
+                for f in futures[i + 1:]:
+                    f.cancel()
+                return None
+            part, tables, refs, ids, idrefs = result
+            self.merge_ids(id_table, part, ids, idrefs)
+            for kid_errors in part:
+                errors.extend(next(kids))
+                errors.extend(kid_errors)
+            identity.merge(scope, tables, refs, merged)
+        for kid_errors in kids:
+            errors.extend(kid_errors)
+        identity.close(scope, merged)
+        errors.extend(merged)
+
+        v.finish(text, False, stack, errors, id_table)
+        id_table.close(errors)
+        return errors
+
+    def merge_ids(self, id_table, part, ids, idrefs):
+        """Add the IDs of a part to the document's IdTable, the duplicates
+        of the IDs of the previous parts go in the errors of their child,
+        where the worker would have put them. Keep its IDREFs for the end.
+
+        """
+        # Child => errors inserted in its list so far
+        shift = {}
+        for value, err, k, i in ids:
+            first = id_table.ids.get(value)
+            if first is None:
+                id_table.ids[value] = err.line
+                continue
+            err.message = f'Duplicate ID "{value}", already found at line' \
+                f' {first}'
+            n = shift.get(k, 0)
+            part[k].insert(i + n, err)
+            shift[k] = n + 1
+        id_table.refs.extend(idrefs)
+
+def fix_lines(errors, offset):
+    for err in errors:
+        err.line += offset
+    return errors
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line arguments: options first
+    args = sys.argv[1:]
+    jobs = None
+    threshold = default_threshold
+    while len(args) > 0 and args[0].startswith('--'):
+        opt = args.pop(0)
+        if opt == '--jobs' and len(args) > 0:
+            jobs = int(args.pop(0))
+        elif opt == '--threshold' and len(args) > 0:
+            threshold = int(args.pop(0))
+        else:
+            args = []
+    if len(args) != 2:
+        print(f'Usage: {sys.argv[0]} [--jobs <n>] [--threshold <bytes>]'
+              ' <xsd filepath> <xml filepath>')
+        exit(-1)
+    xsd_filepath = args[0]
+    xml_filepath = args[1]
+
+    with ParallelValidator(xsd_filepath, jobs, threshold) as pv:
+        t0 = time.perf_counter()
+        errors = pv.validate(xml_filepath)
+        t = time.perf_counter() - t0
+    for err in errors:
+        print(err)
+    n = len(errors)
+    print(f'{xml_filepath}: {"valid" if n == 0 else f"{n} error(s)"}'
+          f' ({t:.3f}s)')
+    exit(0 if n == 0 else 1)
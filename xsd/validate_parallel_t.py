@@ -0,0 +1,180 @@
+# validate_parallel_t.py
+
+import os
+import shutil
+import tempfile
+import unittest
+import lxml.etree as et
+from validator import Validator
+from parse_xsd import load_schema
+from validate_parallel import ParallelValidator, scan
+
+tns = 'http://example.com/t'
+
+schema = f'''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+    xmlns="{tns}" xmlns:t="{tns}" targetNamespace="{tns}"
+    elementFormDefault="qualified">
+  <xs:element name="list">
+    <xs:complexType><xs:sequence>
+      <xs:element name="item" maxOccurs="unbounded">
+        <xs:complexType>
+          <xs:sequence>
+            <xs:element name="sub" minOccurs="0" maxOccurs="unbounded">
+              <xs:complexType>
+                <xs:attribute name="n" type="xs:int"/>
+                <xs:attribute name="name" type="xs:ID"/>
+              </xs:complexType>
+            </xs:element>
+          </xs:sequence>
+          <xs:attribute name="id" type="xs:int"/>
+          <xs:attribute name="name" type="xs:ID"/>
+          <xs:attribute name="refs" type="xs:IDREFS"/>
+        </xs:complexType>
+      </xs:element>
+      <xs:element name="ref" minOccurs="0" maxOccurs="unbounded">
+        <xs:complexType>
+          <xs:attribute name="to" type="xs:int"/>
+          <xs:attribute name="refs" type="xs:IDREFS"/>
+        </xs:complexType>
+      </xs:element>
+    </xs:sequence></xs:complexType>
+    <xs:key name="itemId">
+      <xs:selector xpath="t:item"/>
+      <xs:field xpath="@id"/>
+    </xs:key>
+    <xs:keyref name="itemRef" refer="t:itemId">
+      <xs:selector xpath="t:ref"/>
+      <xs:field xpath="@to"/>
+    </xs:keyref>
+  </xs:element>
+</xs:schema>'''
+
+#-------------------------------------------------------------------------------
+
+class ScanTest(unittest.TestCase):
+
+    def test_000_layout(self):
+        doc = b'<?xml version="1.0"?>\n<!-- c --><r a="x>y">\n' \
+            b'<a><a/><a>t</a></a><!-- <b> --><?pi?>\n' \
+            b'<b x="/>"/><![CDATA[<c>]]><c></c>\n</r>'
+        layout = scan(doc)
+        self.assertEqual(b'<?xml version="1.0"?>', layout.decl)
+        self.assertEqual(b'<r a="x>y">', doc[slice(*layout.root)])
+        self.assertEqual([b'<a><a/><a>t</a></a>', b'<b x="/>"/>',
+                          b'<c></c>'],
+                         [doc[slice(*x)] for x in layout.children])
+        self.assertEqual(b'</r>', doc[layout.close:])
+
+    def test_002_markup_in_child(self):
+        # The end tags in the comment and CDATA section aren't the child's
+        doc = b'<r><a><!-- </a><a> --><![CDATA[</a>]]><?a </a>?></a><b/></r>'
+        layout = scan(doc)
+        self.assertEqual([b'<a><!-- </a><a> --><![CDATA[</a>]]><?a </a>?></a>',
+                          b'<b/>'],
+                         [doc[slice(*x)] for x in layout.children])
+
+    def test_001_not_split(self):
+        self.assertIsNone(scan(b'<!DOCTYPE r [<!ENTITY e "x">]><r/>'))
+        self.assertIsNone(scan(b'<r><a></r>'))
+        self.assertIsNone(scan('<r/>'.encode('utf-16')))
+
+#-------------------------------------------------------------------------------
+
+class ParallelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.d = tempfile.mkdtemp()
+        cls.xsd = os.path.join(cls.d, 'list.xsd')
+        with open(cls.xsd, 'w') as f:
+            f.write(schema)
+        cls.v = Validator(load_schema(cls.xsd, False))
+        cls.pv = ParallelValidator(cls.xsd, 2, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pv.close()
+        shutil.rmtree(cls.d)
+
+    def errors(self, content):
+        filepath = os.path.join(self.d, 'list.xml')
+        with open(filepath, 'w') as f:
+            f.write(f'<list xmlns="{tns}"\n      xmlns:t="{tns}">\n{content}'
+                    '\n</list>')
+        serial = [(e.line, e.path, e.code) for e in self.v.validate(filepath)]
+        errs = [(e.line, e.path, e.code) for e in self.pv.validate(filepath)]
+        return serial, errs
+
+    def test_000_valid(self):
+        items = ''.join(f'<item id="{i}">\n<sub n="{i}"/></item>\n'
+                        for i in range(20))
+        serial, errs = self.errors(items + '<ref to="3"/>')
+        self.assertEqual([], serial)
+        self.assertEqual([], errs)
+
+    def test_001_errors(self):
+        items = ''.join(f'<item id="{i}"><sub n="x"/></item>\n'
+                        for i in range(8))
+        serial, errs = self.errors(items + 'text<other/>\n<item/>')
+        self.assertEqual(serial, errs)
+        self.assertEqual(['cvc-datatype-valid.1.2.1']*8
+                         + ['cvc-complex-type.2.3', 'cvc-complex-type.2.4.a',
+                            'cvc-complex-type.2.4.a'],
+                         [x[2] for x in errs])
+
+    def test_002_identity(self):
+        # Duplicates in the first and last parts, a keyref to nothing
+        items = ''.join(f'<item id="{i % 9}"/>\n' for i in range(10))
+        serial, errs = self.errors(items + '<ref to="4"/><ref to="12"/>')
+        self.assertEqual(sorted(serial), sorted(errs))
+        self.assertEqual([(12, '/list/item', 'cvc-identity-constraint.4.2.2'),
+                          (13, '/list/ref', 'cvc-identity-constraint.4.3')],
+                         errs)
+
+    def test_003_syntax_error(self):
+        # Validated in one piece again, the error is lxml's
+        content = '<item id="1"/>\n<item id="2"><sub n="1"></item>'
+        with self.assertRaises(et.XMLSyntaxError) as serial:
+            self.errors(content)
+        filepath = os.path.join(self.d, 'list.xml')
+        with self.assertRaises(et.XMLSyntaxError) as cm:
+            self.pv.validate(filepath)
+        self.assertEqual(str(serial.exception), str(cm.exception))
+
+    def test_004_comment_in_child(self):
+        items = ''.join(f'<item id="{i}"><!-- </item><item> --></item>\n'
+                        for i in range(4))
+        serial, errs = self.errors(items + '<ref to="2"/>')
+        self.assertEqual([], serial)
+        self.assertEqual([], errs)
+
+    def test_005_ids(self):
+        # Duplicates within a part and across parts, IDREFs to the IDs of
+        # the other part, before and after them, and to nothing
+        items = ''.join(f'<item id="{i}" name="a{i % 3}">'
+                        f'<sub name="b{i % 5}"/></item>\n' for i in range(8))
+        items = items.replace('<item id="0"', '<item id="0" refs="b4 a2"')
+        serial, errs = self.errors(items + '<ref refs="a0 c1 b3"/>')
+        self.assertEqual(serial, errs)
+        self.assertEqual([(6, '/list/item', 'cvc-id.2'),
+                          (7, '/list/item', 'cvc-id.2'),
+                          (8, '/list/item', 'cvc-id.2'),
+                          (8, '/list/item/sub', 'cvc-id.2'),
+                          (9, '/list/item', 'cvc-id.2'),
+                          (9, '/list/item/sub', 'cvc-id.2'),
+                          (10, '/list/item', 'cvc-id.2'),
+                          (10, '/list/item/sub', 'cvc-id.2'),
+                          (11, '/list/ref', 'cvc-id.1')], errs)
+
+    def test_006_bpmn(self):
+        xsd = 'samples/bpmn/xsd/BPMN20.xsd'
+        xml = 'samples/bpmn/xml/EmailVoting2.bpmn'
+        with ParallelValidator(xsd, 2, 0) as pv:
+            self.assertEqual([], pv.validate(xml))
+        self.assertEqual(2, pv.jobs)
+        self.assertIsNone(pv.pool)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,742 @@
+# validator.py - streaming validation of XML documents, on the schema model
+
+"""\
+Validate an XML document against a schema loaded with parse_xsd, without
+building the document tree: the document is read with lxml's iterparse, only
+the stack of the open elements is kept, and every element is dropped as soon
+as it's been checked. Memory use doesn't depend on the length of the
+document.
+
+What's checked:
+  - the child elements of each element, against the content model of its type
+    (see content_model.py), including substitution groups and wildcards
+  - text content: not allowed in element-only or empty content
+  - attributes: undeclared attributes (unless an anyAttribute allows them),
+    missing required attributes
+  - the values of the attributes and text-only elements, against the facets
+    of their simple type (see facets.py)
+  - xsi:type (the type must be derived from the declared one, see
+    derivation.py) and xsi:nil
+  - identity constraints: key, keyref and unique (see identity.py)
+  - xs:ID values are unique in the document, and each IDREF (IDREFS) value
+    is the value of some ID: the IDs are kept in a table, the IDREFs to IDs
+    that aren't found yet until the end of the document
+
+Each error comes with the line number and the path of the element where it
+was found, and the code of the constraint from the XML Schema specification.
+The errors can be collected in a bounded ErrorBuffer, validation can stop at
+the first N errors (fail-fast: N=1), without reading the rest of the
+document.
+
+"""
+
+import sys
+import lxml.etree as et
+
+from parse_xsd import XsdComplexType, XsdSimpleType, XsdSimpleContent, \
+    XsdComplexContent, XsdExtensionCC, XsdAttribute, XsdAttributeGroup, \
+    XsdAnyAttribute, xsd_ns, load_schema
+from content_model import Compiler, Wildcard, any_type, namespace
+from facets import FacetCompiler, to_bool
+from identity import ConstraintCompiler, IdentityState, local
+from derivation import blocked
+
+xsi_ns = 'http://www.w3.org/2001/XMLSchema-instance'
+xsi_type = f'{{{xsi_ns}}}type'
+xsi_nil = f'{{{xsi_ns}}}nil'
+
+#-------------------------------------------------------------------------------
+
+class ValidationError:
+    """An error found in the document: line number, path of the element
+    (local names), and description.
+
+    code identifies the constraint that's violated, by the name it has in the
+    XML Schema specification (e.g. "cvc-complex-type.2.4.a"). column is None
+    when the parser doesn't give it (lxml elements only have a line number).
+
+    """
+    __slots__ = ('line', 'path', 'message', 'code', 'column')
+
+    def __init__(self, line, path, message, code=None, column=None):
+        self.line = line
+        self.path = path
+        self.message = message
+        self.code = code
+        self.column = column
+
+    def dictify(self):
+        return {'line': self.line, 'column': self.column, 'path': self.path,
+                'code': self.code, 'message': self.message}
+
+    def __str__(self):
+        pos = f'{self.line}' if self.column is None \
+            else f'{self.line}:{self.column}'
+        code = f' [{self.code}]' if self.code is not None else ''
+        return f'line {pos}: {self.path}: {self.message}{code}'
+
+#-------------------------------------------------------------------------------
+
+class ErrorBuffer:
+    """Collects the errors of a document, keeping the first 'limit' of them
+    (all of them if limit is None) and counting the others.
+
+    With stop=True, validation stops as soon as the buffer is full: add()
+    returns True, the caller is expected to give up on the document. The
+    count is then a lower bound. limit=1, stop=True is fail-fast: the
+    document is only read up to its first error.
+
+    """
+    def __init__(self, limit=None, stop=False):
+        if limit is not None and limit < 1:
+            m = f'Error buffer limit must be at least 1, got {limit}'
+            raise RuntimeError(m)
+        self.limit = limit
+        self.stop = stop
+        self.errors = []
+        self.count = 0
+        self.stopped = False
+
+    def full(self):
+        return self.limit is not None and len(self.errors) >= self.limit
+
+    def add(self, err):
+        """Add an error, return True if validation should stop."""
+        self.count += 1
+        if not self.full():
+            self.errors.append(err)
+        if self.stop and self.full():
+            self.stopped = True
+        return self.stopped
+
+    def truncated(self):
+        """True if some errors were dropped, or not even looked for."""
+        return self.count > len(self.errors) or self.stopped
+
+    def __len__(self):
+        # The errors kept, see count for all of them
+        return len(self.errors)
+
+    def __iter__(self):
+        return iter(self.errors)
+
+    def dictify(self):
+        return {'count': self.count, 'truncated': self.truncated(),
+                'errors': [e.dictify() for e in self.errors]}
+
+#-------------------------------------------------------------------------------
+
+class ElementType:
+    """What the validator needs to know about the type of an element.
+
+    simple: text-only content (simple type, or complex type with simple
+        content), model is None
+    model: the content model, for child elements
+    mixed: text allowed between the child elements
+    attributes: attribute name => (XsdAttribute, required, Facets)
+    any_attribute: Wildcard of the anyAttribute, or None
+    facets: Facets of the text, for text-only content (None: not checked)
+    default: the value of an empty element (default or fixed)
+    constraints: identity constraints of the element declaration
+
+    """
+    __slots__ = ('simple', 'model', 'mixed', 'attributes', 'any_attribute',
+                 'facets', 'default', 'constraints')
+
+    def __init__(self, simple, model=None, mixed=False, attributes=None,
+                 any_attribute=None, facets=None, default=None,
+                 constraints=()):
+        self.simple = simple
+        self.model = model
+        self.mixed = mixed
+        self.attributes = attributes if attributes is not None else {}
+        self.any_attribute = any_attribute
+        self.facets = facets
+        self.default = default
+        self.constraints = constraints
+
+    def for_element(self, default, constraints):
+        """Return this type with what comes from the element declaration."""
+        if default is None and len(constraints) == 0:
+            return self
+        return ElementType(self.simple, self.model, self.mixed,
+                           self.attributes, self.any_attribute, self.facets,
+                           default, constraints)
+
+#-------------------------------------------------------------------------------
+
+class Frame:
+    """An open element: its type, the state of its content model."""
+    __slots__ = ('tag', 'line', 'etype', 'state', 'nil')
+
+    def __init__(self, tag, line, etype, state, nil=False):
+        self.tag = tag
+        self.line = line
+        self.etype = etype
+        self.state = state
+        self.nil = nil
+
+#-------------------------------------------------------------------------------
+
+class IdTable:
+    """The xs:ID values of a document.
+
+    ids: ID value => line of the element that has it
+    refs: (value, ValidationError) of the IDREFs to IDs not found yet
+    found: None, or the list of (value, ValidationError, errors list, index
+        in it) of the IDs, where a duplicate found later would be reported
+        (see validate_parallel.py)
+
+    """
+    __slots__ = ('ids', 'refs', 'found')
+
+    def __init__(self, found=None):
+        self.ids = {}
+        self.refs = []
+        self.found = found
+
+    def close(self, errors):
+        """The document ends: report the IDREFs to IDs not found."""
+        for value, err in self.refs:
+            if value not in self.ids:
+                errors.append(err)
+        self.refs = []
+
+#-------------------------------------------------------------------------------
+
+class Validator:
+    """Validates documents against an assembled schema (see
+    parse_xsd.load_schema). The compiled content models and element types
+    are kept from one document to the next.
+
+    """
+    def __init__(self, xsd, compiler=None):
+        self.xsd = xsd
+        self.compiler = compiler if compiler is not None else Compiler(xsd)
+        self.facets = FacetCompiler(xsd)
+        self.derivations = self.compiler.substitutions.derivations
+        self.constraints = ConstraintCompiler()
+
+        # XsdElement or XsdComplexType => ElementType
+        self.types = {}
+
+        # xs:anyType, and plain text
+        self.any_type = ElementType(False, self.compiler.any_model(), True,
+                                    {}, Wildcard('##any', None))
+        self.simple_type = ElementType(True)
+
+    #---------------------------------------------------------------------------
+    # Types
+
+    def element_type(self, decl, sch):
+        """Return the ElementType of the elements declared by 'decl', found
+        in schema document 'sch'.
+
+        """
+        if decl in self.types:
+            return self.types[decl]
+
+        etype = None
+        for k in decl.elems:
+            if type(k) == XsdComplexType:
+                etype = self.complex_type(k, sch)
+            elif type(k) == XsdSimpleType:
+                etype = ElementType(True,
+                                    facets=self.checker(
+                                        self.facets.simple_type(k, sch)))
+        if etype is None and decl.type_ is not None:
+            etype = self.named_type(sch.expand(decl.type_))
+        elif etype is None and decl.substitutionGroup is not None:
+            # Same type as the head of the substitution group
+            head = self.xsd.get_element(decl.substitutionGroup, sch)
+            if head is not None:
+                etype = self.element_type(head, self.xsd.owner(head))
+        if etype is None:
+            etype = self.any_type
+        default = decl.default if decl.default is not None else decl.fixed
+        etype = etype.for_element(default if etype.simple else None,
+                                  self.constraints.compile(decl, sch))
+
+        self.types[decl] = etype
+        return etype
+
+    def named_type(self, qname):
+        """Return the ElementType for the type named 'qname' (Clark
+        notation), None if there's no such type.
+
+        """
+        t = self.xsd.types.get(qname)
+        if type(t) == XsdComplexType:
+            return self.complex_type(t, self.xsd.owner(t))
+        if qname == any_type:
+            return self.any_type
+        if t is None and namespace(qname) != xsd_ns:
+            return None
+        # A simple type, maybe a built-in one
+        key = t if t is not None else qname
+        if key not in self.types:
+            self.types[key] = ElementType(
+                True, facets=self.checker(self.facets.named_type(qname)))
+        return self.types[key]
+
+    def complex_type(self, ctype, sch):
+        if ctype in self.types:
+            return self.types[ctype]
+
+        mixed = to_bool(ctype.mixed)
+        simple = False
+        for k in ctype.elems:
+            if type(k) == XsdSimpleContent:
+                simple = True
+            elif type(k) == XsdComplexContent:
+                if to_bool(k.mixed):
+                    mixed = True
+                # Like libxml2, an extension of a mixed type is mixed too
+                for d in k.elems:
+                    base = self.xsd.get_type(d.base, sch) \
+                        if type(d) == XsdExtensionCC else None
+                    if type(base) == XsdComplexType and \
+                       self.complex_type(base, self.xsd.owner(base)).mixed:
+                        mixed = True
+
+        model = None if simple else self.compiler.type_model(ctype, sch)
+        attributes = {}
+        wildcards = []
+        self.attribute_uses(ctype, sch, attributes, wildcards)
+        any_attribute = wildcards[-1] if len(wildcards) > 0 else None
+
+        facets = self.checker(self.facets.simple_content(ctype, sch)) \
+            if simple else None
+        etype = ElementType(simple, model, mixed, attributes, any_attribute,
+                            facets)
+        self.types[ctype] = etype
+        return etype
+
+    def checker(self, facets):
+        """Return 'facets', or None if there's nothing to check."""
+        if facets is None or facets.accepts_anything():
+            return None
+        return facets
+
+    def attribute_uses(self, ctype, sch, attributes, wildcards):
+        """Collect the attributes of complex type 'ctype', those of its base
+        type first.
+
+        """
+        for k in ctype.elems:
+            if type(k) in [XsdSimpleContent, XsdComplexContent]:
+                for d in k.elems:
+                    if getattr(d, 'base', None) is None:
+                        continue
+                    base = self.xsd.get_type(d.base, sch)
+                    if type(base) == XsdComplexType:
+                        self.attribute_uses(base, self.xsd.owner(base),
+                                            attributes, wildcards)
+                    self.add_attributes(d.elems, sch, attributes, wildcards)
+        self.add_attributes(ctype.elems, sch, attributes, wildcards)
+
+    def add_attributes(self, items, sch, attributes, wildcards):
+        for k in items:
+            if type(k) == XsdAttribute:
+                decl_sch = sch
+                if k.ref is not None:
+                    qname = sch.expand(k.ref)
+                    decl = self.xsd.attributes.get(qname, k)
+                    if decl is not k:
+                        decl_sch = self.xsd.owner(decl)
+                else:
+                    qualified = k.form == 'qualified' if k.form is not None \
+                        else sch.attributeFormDefault == 'qualified'
+                    ns = sch.namespace if qualified else None
+                    qname = et.QName(ns, k.name).text
+                    decl = k
+                if k.use == 'prohibited':
+                    attributes.pop(qname, None)
+                else:
+                    facets = self.checker(
+                        self.facets.attribute(decl, decl_sch))
+                    attributes[qname] = (decl, k.use == 'required', facets)
+            elif type(k) == XsdAttributeGroup and k.ref is not None:
+                g = self.xsd.get_attribute_group(k.ref, sch)
+                if g is None:
+                    m = f'Attribute group "{k.ref}" not found' \
+                        f' ({sch.schema_location})'
+                    raise RuntimeError(m)
+                self.add_attributes(g.elems, self.xsd.owner(g), attributes,
+                                    wildcards)
+            elif type(k) == XsdAnyAttribute:
+                wildcards.append(Wildcard(k.namespace, sch.namespace))
+
+    #---------------------------------------------------------------------------
+    # Validation
+
+    def start(self, elem, etype, stack, errors, ids=None):
+        """Check the attributes of 'elem', return its Frame. ids: the
+        IdTable of the document, None not to check IDs.
+
+        """
+        nil = False
+        for name, value in elem.attrib.items():
+            if name.startswith(f'{{{xsi_ns}}}'):
+                if name == xsi_nil:
+                    nil = to_bool(value)
+                continue
+            if name in etype.attributes:
+                facets = etype.attributes[name][2]
+                err = facets.check(value) if facets is not None else None
+                if err is not None:
+                    code, m = err
+                    m = f'Attribute "{local(name)}": {m}'
+                    errors.append(self.error(elem, stack, code, m))
+                elif ids is not None and facets is not None and \
+                     facets.id_kind is not None:
+                    self.check_id(facets, value, elem, stack, errors, ids)
+                continue
+            w = etype.any_attribute
+            if w is not None and w.matches(namespace(name)):
+                continue
+            m = f'Attribute "{local(name)}" not allowed'
+            errors.append(self.error(elem, stack, 'cvc-complex-type.3.2.2', m))
+
+        for name, (decl, required, _) in etype.attributes.items():
+            if required and name not in elem.attrib:
+                m = f'Missing required attribute "{local(name)}"'
+                errors.append(self.error(elem, stack, 'cvc-complex-type.4', m))
+
+        model = etype.model
+        return Frame(elem.tag, elem.sourceline, etype,
+                     model.initial if model is not None else None, nil)
+
+    def check_id(self, facets, value, elem, stack, errors, ids):
+        """Add the ID value of 'elem' (None: the top element) to the
+        IdTable, or look up its IDREF values there.
+
+        """
+        value = facets.normalize(value)
+        if facets.id_kind == 'ID':
+            first = ids.ids.get(value)
+            if first is not None:
+                m = f'Duplicate ID "{value}", already found at line {first}'
+                errors.append(self.error(elem, stack, 'cvc-id.2', m))
+                return
+            ids.ids[value] = elem.sourceline if elem is not None \
+                else stack[-1].line
+            if ids.found is not None:
+                err = self.error(elem, stack, 'cvc-id.2', '')
+                ids.found.append((value, err, errors, len(errors)))
+            return
+        values = value.split() if facets.id_kind == 'IDREFS' else [value]
+        for x in values:
+            if x not in ids.ids:
+                m = f'No ID "{x}" for IDREF'
+                ids.refs.append((x, self.error(elem, stack, 'cvc-id.1', m)))
+
+    def error(self, elem, stack, code, message):
+        """Return the error for 'elem', a child of the element at the top of
+        the stack. elem=None stands for the top element itself.
+
+        """
+        tags = [f.tag for f in stack]
+        if elem is not None:
+            tags.append(elem.tag)
+        path = '/' + '/'.join(local(x) for x in tags)
+        line = elem.sourceline if elem is not None else stack[-1].line
+        return ValidationError(line, path, message, code)
+
+    def child_type(self, elem, decl, sch, stack, errors):
+        """Return the ElementType of 'elem' declared by 'decl', taking
+        xsi:type and abstract into account. None means: don't validate the
+        subtree.
+
+        """
+        if to_bool(decl.abstract):
+            m = f'Element "{local(elem.tag)}" is abstract'
+            errors.append(self.error(elem, stack, 'cvc-elt.2', m))
+            return None
+
+        etype = self.element_type(decl, sch)
+        if xsi_type in elem.attrib:
+            value = elem.attrib[xsi_type]
+            prefix, _, name = value.rpartition(':')
+            ns = elem.nsmap.get(prefix if prefix != '' else None)
+            qname = et.QName(ns, name).text
+            t = self.named_type(qname)
+            if t is None:
+                m = f'Unknown type "{value}" in xsi:type'
+                errors.append(self.error(elem, stack, 'cvc-elt.4.2', m))
+                return None
+            m = self.check_derivation(qname, decl, sch)
+            if m is not None:
+                errors.append(self.error(elem, stack, 'cvc-elt.4.3', m))
+                return None
+            etype = t.for_element(etype.default if t.simple else None,
+                                  etype.constraints)
+        return etype
+
+    def check_derivation(self, qname, decl, sch):
+        """Check that type 'qname', from xsi:type, can replace the type of
+        element declaration 'decl'. Return the error message, None if it
+        can.
+
+        """
+        d = self.derivations
+        declared = d.element_type(decl, sch)
+        if type(declared) == tuple:
+            return f'Type "{local(qname)}" is not derived from the anonymous' \
+                ' type of the element'
+        if not d.is_derived(qname, declared):
+            return f'Type "{local(qname)}" is not derived from' \
+                f' "{local(declared)}"'
+        block = blocked(decl.block, sch.blockDefault)
+        t = self.xsd.types.get(declared)
+        if type(t) == XsdComplexType:
+            block |= blocked(t.block, self.xsd.owner(t).blockDefault)
+        used = block & d.methods(qname, declared)
+        if len(used) > 0:
+            return f'Type "{local(qname)}" is derived by' \
+                f' {" and ".join(sorted(used))}, which is blocked'
+        return None
+
+    def iter_errors(self, source):
+        """Validate the document read from 'source' (file path or file
+        object), yield the ValidationErrors as they're found.
+
+        """
+        stack = []
+        skip = 0
+        errors = []
+        identity = IdentityState(self.constraints, ValidationError)
+        ids = IdTable()
+        context = et.iterparse(source, events=('start', 'end'),
+                               remove_comments=True, remove_pis=True,
+                               huge_tree=True)
+        for event, elem in context:
+            if skip > 0:
+                # Inside a subtree that isn't validated
+                if event == 'start':
+                    skip += 1
+                else:
+                    # Drop it as it ends, and its previous siblings, the
+                    # skipped subtree isn't kept either
+                    skip -= 1
+                    elem.clear(keep_tail=True)
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+                continue
+
+            if event == 'start':
+                etype = self.enter(elem, stack, errors)
+                if etype is None:
+                    skip = 1
+                else:
+                    stack.append(self.start(elem, etype, stack, errors,
+                                            ids))
+                    if len(identity.scopes) > 0 or \
+                       len(etype.constraints) > 0:
+                        identity.start(elem, stack, errors)
+            else:
+                self.leave(elem, stack, errors, identity, ids)
+
+            if len(errors) > 0:
+                yield from errors
+                errors = []
+        del context
+        ids.close(errors)
+        yield from errors
+
+    def enter(self, elem, stack, errors):
+        """A new element starts, check it against its parent's content model
+        and return its ElementType (None to skip its subtree).
+
+        """
+        if len(stack) == 0:
+            return self.root(elem, errors)
+
+        self.check_text(elem, stack[-1], errors, stack)
+        return self.child(elem, stack, errors)
+
+    def root(self, elem, errors):
+        """Return the ElementType of root element 'elem', None if it isn't
+        declared.
+
+        """
+        decl = self.xsd.elements.get(elem.tag)
+        if decl is None:
+            m = f'No declaration for root element "{elem.tag}"'
+            errors.append(self.error(elem, [], 'cvc-elt.1', m))
+            return None
+        return self.child_type(elem, decl, self.xsd.owner(decl), [], errors)
+
+    def child(self, elem, stack, errors):
+        """Check child element 'elem' against the content model of the
+        element at the top of the stack, return its ElementType (None to
+        skip its subtree).
+
+        """
+        parent = stack[-1]
+        if parent.nil:
+            m = f'Element "{local(elem.tag)}" not allowed, the parent is nil'
+            errors.append(self.error(elem, stack, 'cvc-elt.3.2.1', m))
+            return None
+        model = parent.etype.model
+        if model is None:
+            m = f'Element "{local(elem.tag)}" not allowed, text-only content'
+            errors.append(self.error(elem, stack, 'cvc-complex-type.2.2', m))
+            return None
+
+        t = model.transition(parent.state, elem.tag) \
+            if parent.state is not None else None
+        if t is None:
+            m = f'Element "{local(elem.tag)}" not allowed'
+            code = 'cvc-complex-type.2.4.a'
+            if parent.state is not None:
+                expected = model.expected(parent.state)
+                if len(expected) > 0:
+                    m += f', expected one of: {", ".join(expected)}'
+                else:
+                    m += ', no more child elements expected'
+                    code = 'cvc-complex-type.2.4.d'
+            errors.append(self.error(elem, stack, code, m))
+            # Don't report every following sibling too
+            parent.state = None
+            return None
+
+        parent.state, term = t
+        if term.wildcard is not None:
+            contents = term.decl.processContents
+            decl = self.xsd.elements.get(elem.tag)
+            if contents == 'skip' or (decl is None and contents == 'lax'):
+                return None
+            if decl is None:
+                m = f'No declaration for element "{local(elem.tag)}"' \
+                    ' matched by a strict wildcard'
+                errors.append(self.error(elem, stack, 'cvc-complex-type.2.4.c',
+                                         m))
+                return None
+            return self.child_type(elem, decl, self.xsd.owner(decl), stack,
+                                   errors)
+        if term.decl is None:
+            # Reference to an element that wasn't loaded
+            return None
+        return self.child_type(elem, term.decl, term.sch, stack, errors)
+
+    def check_text(self, elem, parent, errors, stack):
+        """A child element starts: the text before it is complete, check it,
+        and drop the previous sibling that's been validated.
+
+        """
+        prev = elem.getprevious()
+        text = prev.tail if prev is not None else elem.getparent().text
+        self.check_between(text, parent, errors, stack)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    def check_between(self, text, parent, errors, stack):
+        """Check the text found before a child element of 'parent'."""
+        if text is not None and not parent.etype.mixed and \
+           not parent.etype.simple and text.strip() != '':
+            m = 'Text not allowed, element-only content'
+            errors.append(self.error(None, stack, 'cvc-complex-type.2.3', m))
+
+    def leave(self, elem, stack, errors, identity=None, ids=None):
+        # Text after the last child, or the whole text if there's no child
+        last = elem[-1] if len(elem) > 0 else None
+        text = last.tail if last is not None else elem.text
+        self.finish(text, last is None, stack, errors, ids)
+
+        if identity is not None and len(identity.scopes) > 0:
+            identity.end(elem, stack, text if last is None else None, errors)
+
+        stack.pop()
+        elem.clear(keep_tail=True)
+
+    def finish(self, text, empty, stack, errors, ids=None):
+        """The element at the top of the stack ends: check the text after
+        its last child ('empty': it has no child, it's the whole text), and
+        that its content is complete. ids: as in start().
+
+        """
+        frame = stack[-1]
+        etype = frame.etype
+        if text is not None and text.strip() != '':
+            if frame.nil:
+                m = 'Text not allowed, the element is nil'
+                errors.append(self.error(None, stack, 'cvc-elt.3.2.1', m))
+            elif not etype.mixed and not etype.simple:
+                m = 'Text not allowed, element-only content'
+                errors.append(self.error(None, stack, 'cvc-complex-type.2.3',
+                                         m))
+
+        if etype.facets is not None and not frame.nil and empty:
+            value = text if text is not None else ''
+            if value == '' and etype.default is not None:
+                value = etype.default
+            err = etype.facets.check(value)
+            if err is not None:
+                errors.append(self.error(None, stack, *err))
+            elif ids is not None and etype.facets.id_kind is not None:
+                self.check_id(etype.facets, value, None, stack, errors, ids)
+
+        if not frame.nil and frame.state is not None and \
+           not etype.model.is_final(frame.state):
+            expected = etype.model.expected(frame.state)
+            m = 'Missing child element'
+            if len(expected) > 0:
+                m += f', expected one of: {", ".join(expected)}'
+            errors.append(self.error(None, stack, 'cvc-complex-type.2.4.b',
+                                     m))
+
+    def validate(self, source):
+        """Return the list of the errors found in the document."""
+        return list(self.iter_errors(source))
+
+    def collect(self, source, limit=None, stop=False):
+        """Validate the document, return its errors in an ErrorBuffer (see
+        there for limit and stop). When the buffer says stop, the rest of the
+        document isn't read.
+
+        """
+        errors = ErrorBuffer(limit, stop)
+        gen = self.iter_errors(source)
+        for err in gen:
+            if errors.add(err):
+                gen.close()
+                break
+        return errors
+
+    def is_valid(self, source):
+        """Fail-fast: stop at the first error."""
+        return self.collect(source, 1, True).count == 0
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # Command line arguments: options first
+    args = sys.argv[1:]
+    limit = None
+    stop = False
+    while len(args) > 0 and args[0].startswith('--'):
+        opt = args.pop(0)
+        if opt == '--max-errors' and len(args) > 0:
+            limit = int(args.pop(0))
+        elif opt == '--stop':
+            stop = True
+        elif opt == '--fail-fast':
+            limit, stop = 1, True
+        else:
+            args = []
+    if len(args) != 2:
+        print(f'Usage: {sys.argv[0]} [--max-errors <n> [--stop] | --fail-fast]'
+              ' <xsd filepath> <xml filepath>')
+        exit(-1)
+    xsd_filepath = args[0]
+    xml_filepath = args[1]
+
+    v = Validator(load_schema(xsd_filepath))
+    errors = v.collect(xml_filepath, limit, stop)
+    for err in errors:
+        print(err)
+    n = errors.count
+    more = '+' if errors.stopped else ''
+    print(f'{xml_filepath}: {"valid" if n == 0 else f"{n}{more} error(s)"}')
+    exit(0 if n == 0 else 1)
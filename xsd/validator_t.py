@@ -0,0 +1,239 @@
+# validator_t.py
+
+import io
+import unittest
+import lxml.etree as et
+from parse_xsd import build_schema
+from validator import Validator, ErrorBuffer
+import validate
+from schema_t_util import tns, schema
+
+#-------------------------------------------------------------------------------
+
+class ValidatorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.v = Validator(schema('''
+          <xs:element name="order">
+            <xs:complexType>
+              <xs:sequence>
+                <xs:element name="item" maxOccurs="unbounded">
+                  <xs:complexType>
+                    <xs:simpleContent>
+                      <xs:extension base="xs:string">
+                        <xs:attribute name="qty" type="xs:int"
+                                      use="required"/>
+                      </xs:extension>
+                    </xs:simpleContent>
+                  </xs:complexType>
+                </xs:element>
+                <xs:element name="note" type="xs:string" minOccurs="0"
+                            nillable="true"/>
+                <xs:any namespace="##other" processContents="skip"
+                        minOccurs="0"/>
+              </xs:sequence>
+              <xs:attribute name="id" type="xs:string"/>
+            </xs:complexType>
+          </xs:element>'''))
+
+    def errors(self, doc):
+        doc = f'<order xmlns="{tns}"\n' \
+            ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n' \
+            f'{doc}\n</order>'
+        return self.v.validate(io.BytesIO(doc.encode()))
+
+    def test_000_valid(self):
+        errs = self.errors('<item qty="1">a</item>\n<item qty="2">b</item>\n'
+                           '<note xsi:nil="true"/>\n'
+                           '<x:ext xmlns:x="urn:x"><x:y>z</x:y></x:ext>')
+        self.assertEqual([], [str(e) for e in errs])
+
+    def test_001_content_model(self):
+        errs = self.errors('<item qty="1"/>\n<note/>\n<item qty="2"/>')
+        self.assertEqual(1, len(errs))
+        self.assertEqual(5, errs[0].line)
+        self.assertEqual('/order/item', errs[0].path)
+        self.assertIn('Element "item" not allowed', errs[0].message)
+
+        errs = self.errors('')
+        self.assertIn('Missing child element, expected one of:'
+                      f' {{{tns}}}item', errs[0].message)
+
+    def test_002_attributes(self):
+        errs = self.errors('<item>a</item>\n<item qty="1" size="2"/>')
+        self.assertEqual([(3, 'Missing required attribute "qty"'),
+                          (4, 'Attribute "size" not allowed')],
+                         [(e.line, e.message) for e in errs])
+
+    def test_003_text(self):
+        errs = self.errors('<item qty="1">a</item>oops\n<note>b</note>')
+        self.assertEqual(['Text not allowed, element-only content'],
+                         [e.message for e in errs])
+        errs = self.errors('<item qty="1">a<b/></item>')
+        self.assertIn('text-only content', errs[0].message)
+
+    def test_004_nil(self):
+        errs = self.errors('<item qty="1"/><note xsi:nil="true">x</note>')
+        self.assertEqual(['Text not allowed, the element is nil'],
+                         [e.message for e in errs])
+
+    def test_005_root(self):
+        errs = self.v.validate(io.BytesIO(b'<order/>'))
+        self.assertIn('No declaration for root element', errs[0].message)
+
+    def test_006_codes(self):
+        errs = self.errors('<item>a</item>\n<item qty="1" size="2"/>oops')
+        self.assertEqual(['cvc-complex-type.4', 'cvc-complex-type.3.2.2',
+                          'cvc-complex-type.2.3'], [e.code for e in errs])
+        self.assertEqual({'line': 3, 'column': None, 'path': '/order/item',
+                          'code': 'cvc-complex-type.4',
+                          'message': 'Missing required attribute "qty"'},
+                         errs[0].dictify())
+
+    def test_007_values(self):
+        errs = self.errors('<item qty="many">a</item>')
+        self.assertEqual([('cvc-datatype-valid.1.2.1',
+                           'Attribute "qty": "many" is not a valid decimal')],
+                         [(e.code, e.message) for e in errs])
+
+        v = Validator(schema('''
+          <xs:element name="size" default="3">
+            <xs:simpleType>
+              <xs:restriction base="xs:int">
+                <xs:maxInclusive value="5"/>
+              </xs:restriction>
+            </xs:simpleType>
+          </xs:element>'''))
+        self.assertEqual([], v.validate(io.BytesIO(
+            f'<size xmlns="{tns}"/>'.encode())))
+        doc = f'<size xmlns="{tns}"> 6 </size>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual(['cvc-maxInclusive-valid'], [e.code for e in errs])
+
+    def test_008_xsi_type(self):
+        v = Validator(schema('''
+          <xs:complexType name="Base"/>
+          <xs:complexType name="Ext">
+            <xs:complexContent>
+              <xs:extension base="Base">
+                <xs:attribute name="a"/>
+              </xs:extension>
+            </xs:complexContent>
+          </xs:complexType>
+          <xs:complexType name="Other"/>
+          <xs:element name="list">
+            <xs:complexType><xs:sequence>
+              <xs:element name="x" type="Base" maxOccurs="unbounded"/>
+              <xs:element name="y" type="Base" block="extension"
+                          minOccurs="0"/>
+            </xs:sequence></xs:complexType>
+          </xs:element>'''))
+        doc = f'<list xmlns="{tns}" xmlns:t="{tns}"\n' \
+            ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n' \
+            '<x xsi:type="t:Ext" a="1"/>\n<x xsi:type="t:Other"/>\n' \
+            '<y xsi:type="t:Ext"/>\n</list>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual([(4, 'cvc-elt.4.3'), (5, 'cvc-elt.4.3')],
+                         [(e.line, e.code) for e in errs])
+        self.assertIn('not derived from "Base"', errs[0].message)
+        self.assertIn('blocked', errs[1].message)
+
+    def test_009_ids(self):
+        v = Validator(schema('''
+          <xs:element name="list">
+            <xs:complexType><xs:sequence>
+              <xs:element name="x" maxOccurs="unbounded">
+                <xs:complexType>
+                  <xs:attribute name="id" type="xs:ID"/>
+                  <xs:attribute name="ref" type="xs:IDREF"/>
+                  <xs:attribute name="refs" type="xs:IDREFS"/>
+                </xs:complexType>
+              </xs:element>
+              <xs:element name="y" type="xs:ID" minOccurs="0"/>
+            </xs:sequence></xs:complexType>
+          </xs:element>'''))
+        doc = f'<list xmlns="{tns}">\n<x ref="b" refs=" a  c"/>\n' \
+            '<x id=" a "/>\n<x id="a" ref="d"/>\n<y>b</y>\n</list>'
+        errs = v.validate(io.BytesIO(doc.encode()))
+        self.assertEqual([(4, 'cvc-id.2'), (2, 'cvc-id.1'), (4, 'cvc-id.1')],
+                         [(e.line, e.code) for e in errs])
+        self.assertIn('"a", already found at line 3', errs[0].message)
+        self.assertIn('"c"', errs[1].message)
+        self.assertIn('"d"', errs[2].message)
+
+#-------------------------------------------------------------------------------
+
+class ErrorBufferTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.v = Validator(schema('''
+          <xs:element name="list">
+            <xs:complexType><xs:sequence>
+              <xs:element name="x" maxOccurs="unbounded">
+                <xs:complexType/>
+              </xs:element>
+            </xs:sequence></xs:complexType>
+          </xs:element>'''))
+        # One error per x, and the document isn't closed: reading it through
+        # the end is a syntax error
+        cls.doc = (f'<list xmlns="{tns}">\n' + '<x a="1"/>\n'*10).encode()
+
+    def test_000_limit(self):
+        doc = self.doc + b'</list>'
+        errs = self.v.collect(io.BytesIO(doc), 3)
+        self.assertEqual((10, 3), (errs.count, len(errs.errors)))
+        self.assertEqual(3, len(errs))
+        self.assertEqual(len(errs), len(list(errs)))
+        self.assertTrue(errs.truncated())
+        self.assertFalse(errs.stopped)
+        errs = self.v.collect(io.BytesIO(doc))
+        self.assertEqual((10, 10), (errs.count, len(errs.errors)))
+        self.assertFalse(errs.truncated())
+
+    def test_001_stop(self):
+        # The syntax error at the end is never reached
+        errs = self.v.collect(io.BytesIO(self.doc), 2, True)
+        self.assertEqual([2, 3], [e.line for e in errs])
+        self.assertTrue(errs.stopped)
+        self.assertFalse(self.v.is_valid(io.BytesIO(self.doc)))
+        with self.assertRaises(et.XMLSyntaxError):
+            self.v.collect(io.BytesIO(self.doc))
+
+    def test_002_bad_limit(self):
+        with self.assertRaises(RuntimeError):
+            ErrorBuffer(0)
+
+    def test_003_lxml(self):
+        s = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+            '<xs:element name="list"><xs:complexType><xs:sequence>' \
+            '<xs:element name="x" maxOccurs="unbounded"/>' \
+            '</xs:sequence></xs:complexType></xs:element></xs:schema>'
+        xsd = et.XMLSchema(et.fromstring(s))
+        doc = b'<list>\n<x/>\n<y/>\n<x/>\n</list>'
+        errs = validate.collect(xsd, io.BytesIO(doc))
+        self.assertEqual(1, errs.count)
+        self.assertEqual((3, 'cvc-complex-type.2.4'),
+                         (errs.errors[0].line, errs.errors[0].code))
+
+#-------------------------------------------------------------------------------
+
+class SamplesTest(unittest.TestCase):
+
+    def test_000_bpmn(self):
+        v = Validator(build_schema('samples/bpmn/xsd/BPMN20.xsd'))
+        for name in ['EmailVoting2', 'CorrelationExampleSeller']:
+            errs = v.validate(f'samples/bpmn/xml/{name}.bpmn')
+            self.assertEqual([], [str(e) for e in errs])
+
+    def test_001_collada(self):
+        v = Validator(build_schema(
+            'samples/collada/xsd/collada_schema_1_4_1.xsd'))
+        errs = v.validate('samples/collada/xml/untitled.dae')
+        self.assertEqual([], [str(e) for e in errs])
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,8 +1,9 @@
 # xsd.py - python module for XML Schema
 
-"""\ Given an XML Schema, build the trees of substitution groups. This is
-another case of building a tree from individual edges, without prior knowledge
-of the tree's root.
+"""\
+Given an XML Schema, build the trees of substitution groups. This is another
+case of building a tree from individual edges, without prior knowledge of the
+tree's root.
 
 """
 
@@ -10,7 +11,8 @@ import sys
 import lxml.etree as et
 from lxml import objectify
 
-from x4b.tree import TreeSet 
+from x4b.tree import TreeSet, PackedForest, post_order
+from facets import to_bool
 
 #-------------------------------------------------------------------------------
 
@@ -21,53 +23,157 @@ def tag(nd):
 
 class SubstitutionGroups:
     """This class represents the set of "substitution group" trees in a schema.
+
+    The transitive closure of each head is computed once: the frozenset of
+    the names of the elements that can take its place, the head itself
+    included. Abstract elements are left out (their own members are not),
+    block="substitution" (or "#all", or blockDefault) on a head keeps only
+    the head.
+
+    The trees are queried in a PackedForest. The TreeSet they were built in,
+    'ts', isn't pickled: it's None in a model loaded from the cache.
     """
     def __init__(self, xsd_root):
         self.xsd_root = xsd_root
-        self.ts = TreeSet()
-        
+        self.abstract = set()
+        self.blocked = set()
+
+        block_default = xsd_root.attrib.get('blockDefault', '')
+        edges = []
         for nd in self.xsd_root:
+            if tag(nd) == 'element' and 'name' in nd.attrib:
+                name = nd.attrib['name']
+                if to_bool(nd.attrib.get('abstract')):
+                    self.abstract.add(name)
+                block = nd.attrib.get('block', block_default).split()
+                if 'substitution' in block or '#all' in block:
+                    self.blocked.add(name)
             if 'substitutionGroup' in nd.attrib:
                 head = nd.attrib['substitutionGroup']
                 member = nd.attrib['name']
-                self.ts.add_edge(head, member)
-                
+                edges.append((head, member))
+        self.ts = TreeSet.from_edges(edges)
+
+        # Head => frozenset of the elements that can take its place
+        self.closure = {}
+
+        # Node => its substitutable descendants, until its parent is done
+        below = {}
+        for nd in post_order(self.ts.roots):
+            arr = set()
+            for k in nd.kids:
+                if k.payload not in self.abstract:
+                    arr.add(k.payload)
+                arr |= below.pop(k)
+            below[nd] = arr
+            if len(nd.kids) > 0:
+                s = set() if nd.payload in self.blocked else set(arr)
+                if nd.payload not in self.abstract:
+                    s.add(nd.payload)
+                self.closure[nd.payload] = frozenset(s)
+
+        self.forest = PackedForest(self.ts.pack())
+        self.forest.build_index()
+
+    def __getstate__(self):
+        # The lxml tree and the Nodes are only needed while building, don't
+        # pickle them
+        d = self.__dict__.copy()
+        d['xsd_root'] = None
+        d['ts'] = None
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self.forest.build_index()
+
     def member_of(self, member, head):
-        return self.ts.child_of(member, head)
+        return self.forest.child_of(member, head)
+
+    def is_substitutable(self, member, head):
+        """True if 'member' can appear where 'head' is expected, O(1)."""
+        s = self.closure.get(head)
+        if s is not None:
+            return member in s
+        return member == head and head not in self.abstract
 
     def heads(self):
-        return self.ts.parents()
+        return list(self.closure.keys())
 
     def members(self):
-        return self.ts.children()
+        """Return the dictionary of (head, frozenset of members)."""
+        return self.closure
 
     def __str__(self):
-        return str(self.ts) 
+        return str(self.forest)
     
 #-------------------------------------------------------------------------------
 
 class TypeDerivations:
     """This class represents the set of "type derivation" trees in a schema.
+
+    Extensions and restrictions, of complex types (complex or simple content)
+    and of simple types. The trees are numbered once, in a PackedForest: T is
+    derived from B if and only if B's pre-order and post-order numbers
+    enclose T's. As in SubstitutionGroups, 'ts' isn't pickled.
     """
     def __init__(self, xsd_root):
         self.xsd_root = xsd_root
-        self.ts = TreeSet()
-        
+
+        edges = []
         for nd in self.xsd_root:
+            if 'name' not in nd.attrib:
+                continue
+            base_type = None
             if tag(nd) == 'complexType':
-                type_name = nd.attrib['name']
-                if tag(nd[0]) == 'complexContent' and \
-                   tag(nd[0][0]) == 'extension':
-                    k = nd[0][0]
-                    base_type = k.attrib['base']
-                    self.ts.add_edge(base_type, type_name)
+                for k in nd:
+                    if tag(k) in ['complexContent', 'simpleContent']:
+                        for d in k:
+                            if tag(d) in ['extension', 'restriction']:
+                                base_type = d.attrib.get('base')
+            elif tag(nd) == 'simpleType':
+                for k in nd:
+                    if tag(k) == 'restriction':
+                        base_type = k.attrib.get('base')
+            if base_type is not None:
+                edges.append((base_type, nd.attrib['name']))
+        self.ts = TreeSet.from_edges(edges)
+        self.forest = PackedForest(self.ts.pack())
+        self.forest.build_index()
+
+    def __getstate__(self):
+        # The lxml tree and the Nodes are only needed while building, don't
+        # pickle them
+        d = self.__dict__.copy()
+        d['xsd_root'] = None
+        d['ts'] = None
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self.forest.build_index()
+
+    def is_derived(self, type_name, base_type):
+        """True if 'type_name' is 'base_type' or derived from it, O(1)."""
+        if type_name == base_type:
+            return True
+        f = self.forest
+        i = f.at.get(type_name)
+        b = f.at.get(base_type)
+        if i is None or b is None:
+            return False
+        return f.pre[b] < f.pre[i] and f.post[i] < f.post[b]
+
+    def ancestors(self, type_name):
+        """Return the tuple of the base types of 'type_name', base first."""
+        return tuple(reversed(self.forest.ancestry(type_name)))
 
     def __str__(self):
-        return str(self.ts) 
+        return str(self.forest)
 
     def traverse(self):
         # This returns an array of payloads
-        return self.ts.traverse()
+        return self.forest.traverse()
 
 class XMLSchema:
     def __init__(self, filepath):